@@ -0,0 +1 @@
+# Admin diagnostics module
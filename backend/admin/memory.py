@@ -0,0 +1,345 @@
+"""
+Memory diagnostics with tracemalloc.
+
+Tracing is off until an admin starts it (``POST /admin/memory/start``).
+While it is on, every allocation records ``frames`` stack frames, which
+costs CPU and memory in proportion to the number of live allocations, so
+it is meant to run for minutes at a time: it stops by itself after
+MEMORY_TRACE_MAX_SECONDS. Snapshots are kept in memory (the newest
+MEMORY_MAX_SNAPSHOTS) and compared by source line, file, module
+(``analysis.services.gemini``) or package (``analysis.services``, ``auth``,
+``httpx``). Everything here is per worker process.
+"""
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import get_settings
+
+settings = get_settings()
+
+GROUP_BY = ("lineno", "filename", "module", "package")
+
+# The backend's own modules are named relative to this directory
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def _import_roots() -> List[str]:
+    """Directories modules are imported from, longest first."""
+    roots = {APP_DIR} | {os.path.abspath(path) for path in sys.path if path}
+    return sorted(roots, key=len, reverse=True)
+
+
+def module_name(filename: str, roots: Optional[Iterable[str]] = None) -> str:
+    """
+    Dotted module name of a source file (e.g. ``analysis.services.gemini``).
+
+    Files outside every import root keep their path.
+    """
+    if filename.startswith("<"):
+        return filename
+    path = os.path.abspath(filename)
+    for root in roots if roots is not None else _import_roots():
+        if path.startswith(root + os.sep):
+            relative, _ = os.path.splitext(os.path.relpath(path, root))
+            parts = relative.split(os.sep)
+            if parts[-1] == "__init__":
+                parts = parts[:-1]
+            return ".".join(parts) or filename
+    return filename
+
+
+def package_name(filename: str, roots: Optional[Iterable[str]] = None) -> str:
+    """Package containing a source file (the module itself for top-level modules)."""
+    module = module_name(filename, roots)
+    if module.startswith("<") or os.sep in module:
+        return module
+    parts = module.split(".")
+    is_package = os.path.basename(filename) == "__init__.py"
+    return module if is_package or len(parts) == 1 else ".".join(parts[:-1])
+
+
+def _qualified_name(cls: type) -> str:
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+class MemoryDiagnostics:
+    """
+    Start/stop tracemalloc, keep named snapshots and summarize them.
+
+    Args:
+        max_snapshots: Snapshots kept (the oldest is dropped first)
+        max_seconds: Tracing stops after this long (0 = when stopped)
+    """
+
+    def __init__(self, max_snapshots: int = 5, max_seconds: float = 900.0):
+        self.max_snapshots = max(max_snapshots, 1)
+        self.max_seconds = max_seconds
+        self.started_at: Optional[float] = None
+        self._timer: Optional[threading.Timer] = None
+        self._snapshots: "OrderedDict[str, Tuple[str, tracemalloc.Snapshot]]" = OrderedDict()
+
+    @property
+    def tracing(self) -> bool:
+        """Whether tracemalloc is on (stops it first if its time is up and the timer is late)."""
+        if (
+            tracemalloc.is_tracing() and self.started_at is not None and self.max_seconds
+            and time.monotonic() - self.started_at > self.max_seconds
+        ):
+            self.stop()
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1) -> dict:
+        """
+        Start tracing allocations.
+
+        With ``max_seconds`` set, a timer thread stops tracing when the time
+        is up, even if nothing reads the status in between.
+
+        Args:
+            frames: Stack frames stored per allocation (1 is cheapest;
+                more are needed for tracebacks)
+
+        Returns:
+            Status after starting
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(max(frames, 1))
+            self.started_at = time.monotonic()
+            if self.max_seconds:
+                self._timer = threading.Timer(self.max_seconds, self.stop)
+                self._timer.daemon = True
+                self._timer.start()
+        return self.status()
+
+    def stop(self) -> dict:
+        """Stop tracing and drop the snapshots (they cannot be compared to new ones)."""
+        timer, self._timer = self._timer, None
+        if timer is not None and timer is not threading.current_thread():
+            timer.cancel()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.started_at = None
+        self._snapshots.clear()
+        return self.status()
+
+    def status(self) -> dict:
+        """Tracing state, traced and process memory, stored snapshots."""
+        tracing = self.tracing
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        elapsed = time.monotonic() - self.started_at if tracing and self.started_at is not None else None
+        return {
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracing else None,
+            "seconds_tracing": round(elapsed, 1) if elapsed is not None else None,
+            "stops_in_seconds": (
+                round(max(self.max_seconds - elapsed, 0), 1) if elapsed is not None and self.max_seconds else None
+            ),
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory() if tracing else 0,
+            "rss_bytes": rss_bytes(),
+            "snapshots": [
+                {"name": name, "taken_at": taken_at} for name, (taken_at, _) in self._snapshots.items()
+            ],
+        }
+
+    def _take(self) -> tracemalloc.Snapshot:
+        if not self.tracing:
+            raise ValueError("Memory tracing is not running")
+        return tracemalloc.take_snapshot().filter_traces(_FILTERS)
+
+    def take_snapshot(self, name: str) -> dict:
+        """
+        Take and keep a named snapshot (replacing one with the same name).
+
+        Raises:
+            ValueError: If tracing is not running
+        """
+        snapshot = self._take()
+        self._snapshots.pop(name, None)
+        self._snapshots[name] = (datetime.now(timezone.utc).isoformat(), snapshot)
+        while len(self._snapshots) > self.max_snapshots:
+            self._snapshots.popitem(last=False)
+        return {"name": name, "traced_bytes": sum(stat.size for stat in snapshot.statistics("filename"))}
+
+    def delete_snapshot(self, name: str) -> None:
+        """
+        Forget a snapshot.
+
+        Raises:
+            KeyError: If there is no such snapshot
+        """
+        del self._snapshots[name]
+
+    def _snapshot(self, name: Optional[str]) -> tracemalloc.Snapshot:
+        """A stored snapshot, or a fresh (unstored) one when ``name`` is None."""
+        if name is None:
+            return self._take()
+        if name not in self._snapshots:
+            raise KeyError(name)
+        return self._snapshots[name][1]
+
+    def top(self, name: Optional[str] = None, group_by: str = "lineno", limit: int = 20) -> List[dict]:
+        """
+        Largest allocation sites.
+
+        Args:
+            name: Snapshot to read (None: take a fresh one)
+            group_by: lineno, filename, module or package
+            limit: Entries returned
+
+        Returns:
+            Entries with 'site', 'size_bytes' and 'count', largest first
+
+        Raises:
+            ValueError: If tracing is off (fresh snapshot) or group_by is unknown
+            KeyError: If there is no such snapshot
+        """
+        snapshot = self._snapshot(name)
+        if group_by in ("module", "package"):
+            sizes, counts = Counter(), Counter()
+            group = _grouper(group_by)
+            for stat in snapshot.statistics("filename"):
+                site = group(stat.traceback[0].filename)
+                sizes[site] += stat.size
+                counts[site] += stat.count
+            return [
+                {"site": site, "size_bytes": size, "count": counts[site]}
+                for site, size in sizes.most_common(limit)
+            ]
+        if group_by not in GROUP_BY:
+            raise ValueError(f"Unknown grouping: {group_by}")
+        return [
+            {"site": _site(stat.traceback, group_by), "size_bytes": stat.size, "count": stat.count}
+            for stat in snapshot.statistics(group_by)[:limit]
+        ]
+
+    def diff(
+        self,
+        base: str,
+        target: Optional[str] = None,
+        group_by: str = "package",
+        limit: int = 20
+    ) -> List[dict]:
+        """
+        Growth between two snapshots.
+
+        Args:
+            base: Earlier snapshot
+            target: Later snapshot (None: take a fresh one)
+            group_by: lineno, filename, module or package
+            limit: Entries returned
+
+        Returns:
+            Entries with 'site', 'size_bytes', 'size_diff_bytes', 'count'
+            and 'count_diff', largest absolute size change first
+
+        Raises:
+            ValueError: If tracing is off (fresh snapshot) or group_by is unknown
+            KeyError: If a snapshot does not exist
+        """
+        earlier = self._snapshot(base)
+        later = self._snapshot(target)
+        if group_by in ("module", "package"):
+            totals: Dict[str, List[int]] = {}
+            group = _grouper(group_by)
+            for stat in later.compare_to(earlier, "filename"):
+                entry = totals.setdefault(group(stat.traceback[0].filename), [0, 0, 0, 0])
+                entry[0] += stat.size
+                entry[1] += stat.size_diff
+                entry[2] += stat.count
+                entry[3] += stat.count_diff
+            ranked = sorted(totals.items(), key=lambda item: abs(item[1][1]), reverse=True)
+            return [
+                {"site": site, "size_bytes": size, "size_diff_bytes": size_diff, "count": count, "count_diff": count_diff}
+                for site, (size, size_diff, count, count_diff) in ranked[:limit]
+            ]
+        if group_by not in GROUP_BY:
+            raise ValueError(f"Unknown grouping: {group_by}")
+        return [
+            {
+                "site": _site(stat.traceback, group_by),
+                "size_bytes": stat.size,
+                "size_diff_bytes": stat.size_diff,
+                "count": stat.count,
+                "count_diff": stat.count_diff,
+            }
+            for stat in later.compare_to(earlier, group_by)[:limit]
+        ]
+
+
+def _grouper(group_by: str):
+    """Cached filename -> module/package mapping for one summary."""
+    roots = _import_roots()
+    name = module_name if group_by == "module" else package_name
+    cache: Dict[str, str] = {}
+
+    def group(filename: str) -> str:
+        if filename not in cache:
+            cache[filename] = name(filename, roots)
+        return cache[filename]
+
+    return group
+
+
+def _site(traceback: tracemalloc.Traceback, group_by: str) -> str:
+    frame = traceback[0]
+    if group_by == "lineno":
+        return f"{frame.filename}:{frame.lineno}"
+    return frame.filename
+
+
+def object_counts(key_types: Iterable[str], limit: int = 20) -> dict:
+    """
+    Live objects tracked by the garbage collector, by type.
+
+    Walks every tracked object once (tens of milliseconds on a large heap).
+    Strings and other atomic objects are not tracked; use tracemalloc for them.
+
+    Args:
+        key_types: Fully qualified type names always reported
+            (e.g. ``httpx.Response``)
+        limit: Most common types reported
+
+    Returns:
+        {"total": ..., "key_types": {name: count}, "top": [{"type", "count"}]}
+    """
+    counts = Counter(_qualified_name(type(obj)) for obj in gc.get_objects())
+    return {
+        "total": sum(counts.values()),
+        "key_types": {name: counts.get(name, 0) for name in key_types},
+        "top": [{"type": name, "count": count} for name, count in counts.most_common(limit)],
+    }
+
+
+def rss_bytes() -> Optional[int]:
+    """Resident set size of this process, where the platform reports it."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # Peak, not current, outside Linux (bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+# Singleton instance
+memory_diagnostics = MemoryDiagnostics(settings.memory_max_snapshots, settings.memory_trace_max_seconds)
@@ -0,0 +1,195 @@
+"""
+Admin-only diagnostics routes (users listed in ADMIN_USERS).
+"""
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from admin.memory import memory_diagnostics, object_counts
+from auth.middleware import get_admin_user
+from auth.models import User
+from config import get_settings
+from profiling import call_tree, collapsed_stacks, get_profile_store
+
+settings = get_settings()
+
+PROFILE_FORMATS = ("tree", "collapsed", "raw")
+GROUP_BY_PATTERN = "^(lineno|filename|module|package)$"
+SNAPSHOT_NAME_PATTERN = "^[A-Za-z0-9_.-]{1,64}$"
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@router.get("/profiles")
+async def list_profiles(admin: User = Depends(get_admin_user)):
+    """
+    Stored request profiles, newest first.
+    
+    Profiles are recorded for admin requests sent with ``X-Profile: 1``.
+    
+    Returns:
+        Profile metadata (path, status, duration, sample counts)
+    """
+    return get_profile_store().list()
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    format: str = Query("tree", pattern="^(tree|collapsed|raw)$", description="tree, collapsed or raw"),
+    admin: User = Depends(get_admin_user)
+):
+    """
+    Download one profile.
+    
+    Args:
+        profile_id: Id from the X-Profile-Id response header or the list
+        format: ``tree`` (call tree JSON), ``collapsed`` (folded stacks for
+            flamegraph.pl or speedscope) or ``raw`` (stored JSON)
+        admin: Authenticated admin user
+        
+    Raises:
+        HTTPException: 404 if there is no such profile
+    """
+    profile = get_profile_store().load(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    
+    if format == "collapsed":
+        return PlainTextResponse(
+            collapsed_stacks(profile["stacks"]),
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'}
+        )
+    if format == "tree":
+        stacks = profile.pop("stacks")
+        return {**profile, "tree": call_tree(stacks)}
+    return profile
+
+
+def _memory_error(exc: Exception) -> HTTPException:
+    """Map MemoryDiagnostics errors to HTTP errors."""
+    if isinstance(exc, KeyError):
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Snapshot not found: {exc.args[0]}")
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+
+
+@router.get("/memory")
+async def memory_status(admin: User = Depends(get_admin_user)):
+    """
+    Memory tracing state of this worker.
+    
+    Returns:
+        Whether tracemalloc is on, traced and peak bytes, tracemalloc's own
+        overhead, process RSS and the stored snapshots
+    """
+    return memory_diagnostics.status()
+
+
+@router.post("/memory/start")
+async def start_memory_trace(
+    frames: int = Query(None, ge=1, le=64, description="Stack frames kept per allocation"),
+    admin: User = Depends(get_admin_user)
+):
+    """
+    Start tracemalloc in this worker.
+    
+    Allocations are slower while tracing; it stops by itself after
+    MEMORY_TRACE_MAX_SECONDS. Starting while already tracing is a no-op.
+    
+    Args:
+        frames: Stack frames per allocation (default MEMORY_TRACE_FRAMES)
+        admin: Authenticated admin user
+    """
+    return memory_diagnostics.start(frames or settings.memory_trace_frames)
+
+
+@router.post("/memory/stop")
+async def stop_memory_trace(admin: User = Depends(get_admin_user)):
+    """Stop tracemalloc and drop the stored snapshots."""
+    return memory_diagnostics.stop()
+
+
+@router.post("/memory/snapshots", status_code=status.HTTP_201_CREATED)
+def take_memory_snapshot(
+    name: str = Query(..., pattern=SNAPSHOT_NAME_PATTERN),
+    admin: User = Depends(get_admin_user)
+):
+    """
+    Take a named snapshot (the oldest is dropped past MEMORY_MAX_SNAPSHOTS).
+    
+    Raises:
+        HTTPException: 409 if tracing is not running
+    """
+    try:
+        return memory_diagnostics.take_snapshot(name)
+    except ValueError as e:
+        raise _memory_error(e)
+
+
+@router.delete("/memory/snapshots/{name}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_memory_snapshot(name: str, admin: User = Depends(get_admin_user)):
+    """
+    Forget a snapshot.
+    
+    Raises:
+        HTTPException: 404 if there is no such snapshot
+    """
+    try:
+        memory_diagnostics.delete_snapshot(name)
+    except KeyError as e:
+        raise _memory_error(e)
+
+
+@router.get("/memory/top")
+def memory_top(
+    snapshot: Optional[str] = Query(None, description="Stored snapshot (default: take one now)"),
+    group_by: str = Query("lineno", pattern=GROUP_BY_PATTERN),
+    limit: int = Query(20, ge=1, le=500),
+    admin: User = Depends(get_admin_user)
+):
+    """
+    Largest allocation sites, by source line, file, module or package.
+    
+    Raises:
+        HTTPException: 404 for an unknown snapshot, 409 if tracing is not running
+    """
+    try:
+        return memory_diagnostics.top(snapshot, group_by, limit)
+    except (KeyError, ValueError) as e:
+        raise _memory_error(e)
+
+
+@router.get("/memory/diff")
+def memory_diff(
+    base: str = Query(..., description="Earlier snapshot"),
+    target: Optional[str] = Query(None, description="Later snapshot (default: take one now)"),
+    group_by: str = Query("package", pattern=GROUP_BY_PATTERN),
+    limit: int = Query(20, ge=1, le=500),
+    admin: User = Depends(get_admin_user)
+):
+    """
+    Memory growth between two snapshots, largest change first.
+    
+    Grouped by package (``analysis.services``, ``auth``, ``httpx``) by default.
+    
+    Raises:
+        HTTPException: 404 for an unknown snapshot, 409 if tracing is not running
+    """
+    try:
+        return memory_diagnostics.diff(base, target, group_by, limit)
+    except (KeyError, ValueError) as e:
+        raise _memory_error(e)
+
+
+@router.get("/memory/objects")
+def memory_objects(
+    limit: int = Query(20, ge=1, le=500),
+    admin: User = Depends(get_admin_user)
+):
+    """
+    Live object counts by type (works without tracing).
+    
+    Returns:
+        Total tracked objects, counts for MEMORY_KEY_TYPES and the most
+        common types
+    """
+    return object_counts(settings.memory_key_types, limit)
@@ -0,0 +1,453 @@
+"""
+Cold-tier archival of old analysis history.
+
+Rows older than a cutoff are streamed out of ``analysis_logs`` (ordered by
+user and time, ``yield_per`` batches) into compressed files laid out as
+
+    <archive dir>/month=YYYY-MM/user_id=<id>/part-<first id>-<last id>.<ext>
+
+one file per user and month. Gzip-compressed NDJSON is the default and
+works without extra dependencies; Parquet (zstd) needs the optional
+``pyarrow`` package. Files are written under a temporary name and renamed once
+complete, and rows are only deleted after every file of the run is in
+place. Rows whose id is already in a part file of their user and month
+are not written again (they are still deleted), so re-running after an
+interrupted run or a copy-only run (``delete=False``) never duplicates
+rows in the archive.
+
+``iter_archived_rows`` scans the archive directly (pruning by month and
+user directory) for history exports; nothing is loaded back into the
+database.
+"""
+import base64
+import gzip
+import json
+import os
+from datetime import date, datetime, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from loguru import logger
+from sqlalchemy.orm import Session
+from auth.models import AnalysisLog
+from analysis.export import log_query, log_row
+from analysis.texts import delete_unreferenced_texts
+from partitions import add_months, month_start
+
+# input_text is the full text (resolved from the texts table)
+ARCHIVE_COLUMNS = [
+    "id", "user_id", "created_at", "category", "confidence_score", "tone", "model", "summary",
+    "input_text", "text_fingerprint", "label_set", "score_label_ids", "score_values",
+]
+BINARY_COLUMNS = ("score_label_ids", "score_values")
+
+ARCHIVE_FORMATS = {"parquet": ".parquet", "ndjson.gz": ".ndjson.gz"}
+
+# Rows buffered per Parquet row group / NDJSON write
+ROW_GROUP_SIZE = 10000
+
+
+def _utc(value: datetime) -> datetime:
+    """Timezone-aware UTC datetime (naive values are taken as UTC)."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def month_key(created_at: datetime) -> str:
+    """Archive month of a row, e.g. '2024-07'."""
+    created_at = _utc(created_at)
+    return f"{created_at.year:04d}-{created_at.month:02d}"
+
+
+def part_directory(root: str, month: str, user_id: int) -> str:
+    """Directory holding one user's archived rows for one month."""
+    return os.path.join(root, f"month={month}", f"user_id={user_id}")
+
+
+def archive_schema():
+    """Arrow schema of archived rows."""
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("category", pa.string()),
+        ("confidence_score", pa.float64()),
+        ("tone", pa.string()),
+        ("model", pa.string()),
+        ("summary", pa.string()),
+        ("input_text", pa.string()),
+        ("text_fingerprint", pa.int64()),
+        ("label_set", pa.string()),
+        ("score_label_ids", pa.binary()),
+        ("score_values", pa.binary()),
+    ])
+
+
+class _ParquetPart:
+    """Parquet file written one row group at a time."""
+
+    def __init__(self, path: str):
+        import pyarrow.parquet as pq
+
+        self.schema = archive_schema()
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, rows: List[Dict[str, object]]) -> None:
+        import pyarrow as pa
+
+        columns = {name: [row[name] for row in rows] for name in ARCHIVE_COLUMNS}
+        self.writer.write_table(pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class _NdjsonGzPart:
+    """gzip-compressed newline-delimited JSON file."""
+
+    def __init__(self, path: str):
+        self.file = gzip.open(path, "wt", encoding="utf-8")
+
+    def write(self, rows: List[Dict[str, object]]) -> None:
+        lines = []
+        for row in rows:
+            row = dict(row)
+            row["created_at"] = _utc(row["created_at"]).isoformat()
+            for column in BINARY_COLUMNS:
+                if row[column] is not None:
+                    row[column] = base64.b64encode(row[column]).decode("ascii")
+            lines.append(json.dumps(row, ensure_ascii=False) + "\n")
+        self.file.write("".join(lines))
+
+    def close(self) -> None:
+        self.file.close()
+
+
+_PART_WRITERS = {"parquet": _ParquetPart, "ndjson.gz": _NdjsonGzPart}
+
+
+class ArchivedGroup:
+    """
+    Rows of one user and month: those written to one archive file (``path``
+    is None if every row was already archived) and those skipped because an
+    earlier run archived them. The created_at and id bounds cover both.
+    """
+
+    def __init__(self, user_id: int, month: str, path: Optional[str]):
+        self.user_id = user_id
+        self.month = month
+        self.path = path
+        self.first_id: Optional[int] = None
+        self.last_id: Optional[int] = None
+        self.min_created_at: Optional[datetime] = None
+        self.max_created_at: Optional[datetime] = None
+        self.max_id: Optional[int] = None
+        self.rows = 0
+        self.already_archived = 0
+
+    def _extend(self, row: Dict[str, object]) -> None:
+        if self.min_created_at is None:
+            self.min_created_at = row["created_at"]
+        self.max_created_at = row["created_at"]
+        self.max_id = row["id"] if self.max_id is None else max(self.max_id, row["id"])
+
+    def add(self, row: Dict[str, object]) -> None:
+        if self.first_id is None:
+            self.first_id = row["id"]
+        self.last_id = row["id"]
+        self.rows += 1
+        self._extend(row)
+
+    def skip(self, row: Dict[str, object]) -> None:
+        self.already_archived += 1
+        self._extend(row)
+
+
+def archived_ids(directory: str) -> Set[int]:
+    """Ids of the rows in the part files of one user/month directory."""
+    ids: Set[int] = set()
+    if not os.path.isdir(directory):
+        return ids
+    for name in os.listdir(directory):
+        if not (name.startswith("part-") and name.endswith(tuple(ARCHIVE_FORMATS.values()))):
+            continue
+        path = os.path.join(directory, name)
+        if path.endswith(".parquet"):
+            rows = _read_parquet(path, ["id"], ROW_GROUP_SIZE)
+        else:
+            rows = _read_ndjson_gz(path, ["id"])
+        ids.update(row["id"] for row in rows)
+    return ids
+
+
+class ArchiveWriter:
+    """
+    Writes rows sorted by (user_id, created_at) into per-user, per-month files.
+
+    Rows already present in that user and month's part files are skipped.
+
+    Args:
+        root: Archive directory
+        format: Key of ARCHIVE_FORMATS
+        row_group_size: Rows buffered before a write
+    """
+
+    def __init__(self, root: str, format: str = "ndjson.gz", row_group_size: int = ROW_GROUP_SIZE):
+        if format not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unknown archive format: {format}")
+        if format == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise RuntimeError("Parquet archives require the optional 'pyarrow' package")
+        self.root = root
+        self.format = format
+        self.row_group_size = row_group_size
+        self.groups: List[ArchivedGroup] = []
+        self._group: Optional[ArchivedGroup] = None
+        self._part = None
+        self._temp_path: Optional[str] = None
+        self._buffer: List[Dict[str, object]] = []
+        self._archived_ids: Set[int] = set()
+
+    def write(self, row: Dict[str, object]) -> None:
+        """Append one row, starting a new file when the user or month changes."""
+        month = month_key(row["created_at"])
+        group = self._group
+        if group is None or group.user_id != row["user_id"] or group.month != month:
+            self._finish_group()
+            directory = part_directory(self.root, month, row["user_id"])
+            group = self._group = ArchivedGroup(row["user_id"], month, directory)
+            self._archived_ids = archived_ids(directory)
+
+        if row["id"] in self._archived_ids:
+            group.skip(row)
+            return
+        if self._part is None:
+            os.makedirs(group.path, exist_ok=True)
+            self._temp_path = os.path.join(group.path, f".part-{row['id']}.tmp")
+            self._part = _PART_WRITERS[self.format](self._temp_path)
+        group.add(row)
+        self._buffer.append(row)
+        if len(self._buffer) >= self.row_group_size:
+            self._part.write(self._buffer)
+            self._buffer = []
+
+    def _finish_group(self) -> None:
+        group = self._group
+        if group is None:
+            return
+        self._archived_ids = set()
+        if self._part is None:
+            # Nothing new: every row is in an existing file
+            group.path = None
+            self.groups.append(group)
+            self._group = None
+            return
+        if self._buffer:
+            self._part.write(self._buffer)
+            self._buffer = []
+        self._part.close()
+
+        name = f"part-{group.first_id:012d}-{group.last_id:012d}{ARCHIVE_FORMATS[self.format]}"
+        group.path = os.path.join(group.path, name)
+        os.replace(self._temp_path, group.path)
+        self.groups.append(group)
+        self._group = self._part = self._temp_path = None
+
+    def close(self) -> List[ArchivedGroup]:
+        """Finish the last file; returns every group written."""
+        self._finish_group()
+        return self.groups
+
+    def abort(self) -> None:
+        """Discard the file being written."""
+        if self._part is not None:
+            self._part.close()
+            os.remove(self._temp_path)
+        self._group = self._part = self._temp_path = None
+        self._buffer = []
+        self._archived_ids = set()
+
+
+def archive_logs(
+    db: Session,
+    root: str,
+    before: datetime,
+    format: str = "ndjson.gz",
+    batch_size: int = 1000,
+    delete: bool = True,
+    user_id: Optional[int] = None
+) -> Dict[str, object]:
+    """
+    Move analysis logs created before ``before`` into the archive.
+
+    Args:
+        db: Database session
+        root: Archive directory
+        before: Cutoff; rows created earlier are archived
+        format: Key of ARCHIVE_FORMATS
+        batch_size: Rows fetched per round trip
+        delete: Remove archived rows from the database (rows kept are
+            skipped by later runs, not archived twice)
+        user_id: Restrict to one user's history
+
+    Returns:
+        Summary with 'files', 'rows' (newly written), 'already_archived',
+        'deleted' and 'texts_deleted' counts
+
+    Raises:
+        ValueError: If the format is unknown
+        RuntimeError: If Parquet is requested without pyarrow installed
+    """
+    writer = ArchiveWriter(root, format)
+    query = log_query(db, ARCHIVE_COLUMNS).filter(AnalysisLog.created_at < before)
+    if user_id is not None:
+        query = query.filter(AnalysisLog.user_id == user_id)
+    query = query.order_by(AnalysisLog.user_id, AnalysisLog.created_at, AnalysisLog.id)
+
+    try:
+        for row in query.yield_per(batch_size):
+            writer.write(log_row(ARCHIVE_COLUMNS, row))
+    except BaseException:
+        writer.abort()
+        raise
+    groups = writer.close()
+    db.rollback()  # end the read transaction before deleting
+
+    deleted = 0
+    if delete:
+        for group in groups:
+            # Bounded by what was archived, so rows written since are kept
+            deleted += db.query(AnalysisLog).filter(
+                AnalysisLog.user_id == group.user_id,
+                AnalysisLog.created_at >= group.min_created_at,
+                AnalysisLog.created_at <= group.max_created_at,
+                AnalysisLog.created_at < before,
+                AnalysisLog.id <= group.max_id
+            ).delete(synchronize_session=False)
+            db.commit()
+
+    # Archived files carry the full texts; drop the ones nothing references now
+    texts_deleted = delete_unreferenced_texts(db) if deleted else 0
+
+    files = sum(1 for group in groups if group.path is not None)
+    rows = sum(group.rows for group in groups)
+    already_archived = sum(group.already_archived for group in groups)
+    logger.info(
+        f"Archived {rows} analysis logs into {files} files under {root} "
+        f"({already_archived} already archived, deleted {deleted})"
+    )
+    return {
+        "files": files,
+        "rows": rows,
+        "already_archived": already_archived,
+        "deleted": deleted,
+        "texts_deleted": texts_deleted,
+    }
+
+
+def _partition_value(name: str, key: str) -> Optional[str]:
+    prefix = f"{key}="
+    return name[len(prefix):] if name.startswith(prefix) else None
+
+
+def archived_parts(
+    root: str,
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> List[Tuple[str, int, str]]:
+    """
+    Archive files that may hold matching rows, pruned by directory name.
+
+    Returns:
+        (month, user id, path) tuples ordered by month, user and id range
+    """
+    if not os.path.isdir(root):
+        return []
+    first_month = month_key(since) if since is not None else None
+    last_month = month_key(until) if until is not None else None
+
+    parts = []
+    for month_dir in sorted(os.listdir(root)):
+        month = _partition_value(month_dir, "month")
+        if month is None:
+            continue
+        if (first_month and month < first_month) or (last_month and month > last_month):
+            continue
+        for user_dir in os.listdir(os.path.join(root, month_dir)):
+            value = _partition_value(user_dir, "user_id")
+            if value is None or (user_id is not None and value != str(user_id)):
+                continue
+            directory = os.path.join(root, month_dir, user_dir)
+            for name in sorted(os.listdir(directory)):
+                if name.startswith("part-") and name.endswith(tuple(ARCHIVE_FORMATS.values())):
+                    parts.append((month, int(value), os.path.join(directory, name)))
+    return sorted(parts)
+
+
+def _read_parquet(path: str, columns: Sequence[str], batch_size: int) -> Iterator[Dict[str, object]]:
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=list(columns)):
+        yield from batch.to_pylist()
+
+
+def _read_ndjson_gz(path: str, columns: Sequence[str]) -> Iterator[Dict[str, object]]:
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            row = json.loads(line)
+            row["created_at"] = datetime.fromisoformat(row["created_at"])
+            for column in BINARY_COLUMNS:
+                if row.get(column) is not None:
+                    row[column] = base64.b64decode(row[column])
+            yield {column: row.get(column) for column in columns}
+
+
+def iter_archived_rows(
+    root: str,
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    columns: Sequence[str] = ARCHIVE_COLUMNS,
+    batch_size: int = 1000
+) -> Iterator[Dict[str, object]]:
+    """
+    Stream archived rows without loading them into the database.
+
+    Args:
+        root: Archive directory
+        user_id: Restrict to one user's history
+        since: Only rows created at or after this time
+        until: Only rows created before this time
+        columns: Columns to return (Parquet reads only these)
+        batch_size: Rows decoded at a time from Parquet files
+
+    Yields:
+        One dictionary per row, ordered by month, user and id
+    """
+    since = _utc(since) if since is not None else None
+    until = _utc(until) if until is not None else None
+    read_columns = list(columns) if "created_at" in columns else [*columns, "created_at"]
+
+    for _, _, path in archived_parts(root, user_id, since, until):
+        if path.endswith(".parquet"):
+            rows = _read_parquet(path, read_columns, batch_size)
+        else:
+            rows = _read_ndjson_gz(path, read_columns)
+        for row in rows:
+            created_at = _utc(row["created_at"])
+            if (since is not None and created_at < since) or (until is not None and created_at >= until):
+                continue
+            if "created_at" not in columns:
+                row.pop("created_at")
+            yield row
+
+
+def archive_cutoff(months: int, today: Optional[date] = None) -> datetime:
+    """Start of the month ``months`` months before the current one (UTC)."""
+    month = add_months(month_start(today or datetime.now(timezone.utc).date()), -months)
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
@@ -0,0 +1,140 @@
+"""
+Micro-batching of concurrent upstream calls.
+
+Calls that can share one upstream request (same batch key, e.g. the same
+candidate labels) are held for up to ``window`` seconds, or until
+``max_size`` of them are waiting, and then sent together. Each caller awaits
+its own future and gets back its own result or exception.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+from loguru import logger
+import metrics
+
+# send(key, items) -> one result or Exception per item, in order
+SendBatch = Callable[[Hashable, List[Any]], Awaitable[List[Any]]]
+
+
+class _PendingBatch:
+    """Items collected for one key that have not been sent yet."""
+
+    __slots__ = ("items", "futures", "timer", "opened")
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.futures: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.opened = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Groups concurrent submissions per key into batched upstream calls.
+
+    Args:
+        send: Coroutine function sending one batch; returns a result or an
+            Exception instance per item, in the order of the items
+        window: Seconds the first item of a batch waits for company
+        max_size: Items that make a batch full (it is sent at once)
+    """
+
+    def __init__(self, send: SendBatch, window: float, max_size: int):
+        self.send = send
+        self.window = window
+        self.max_size = max(max_size, 1)
+        self._pending: Dict[Hashable, _PendingBatch] = {}
+        self._tasks = set()
+        self.batches = 0
+        self.items = 0
+        self.full_batches = 0
+        self.failed_batches = 0
+        self.batch_sizes = metrics.Histogram()
+        self.wait_seconds = metrics.Histogram()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether calls are held at all (a zero window or size of 1 sends them alone)."""
+        return self.window > 0 and self.max_size > 1
+
+    async def submit(self, key: Hashable, item: Any) -> Any:
+        """
+        Add an item to the batch for ``key`` and wait for its result.
+
+        Args:
+            key: Items with equal keys may be sent together
+            item: Payload passed to ``send``
+
+        Returns:
+            The item's result
+
+        Raises:
+            Exception: The item's error, or the batch's if the whole call failed
+        """
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = _PendingBatch()
+            self._pending[key] = batch
+            batch.timer = loop.call_later(self.window, self._flush, key, batch)
+
+        future = loop.create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        if len(batch.items) >= self.max_size:
+            self.full_batches += 1
+            self._flush(key, batch)
+        return await future
+
+    def _flush(self, key: Hashable, batch: _PendingBatch) -> None:
+        """Stop collecting for ``batch`` and send it in the background."""
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+        if batch.timer is not None:
+            batch.timer.cancel()
+            batch.timer = None
+        task = asyncio.ensure_future(self._send(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, key: Hashable, batch: _PendingBatch) -> None:
+        # Callers that gave up (cancelled, timed out) are left out
+        live = [(item, future) for item, future in zip(batch.items, batch.futures) if not future.done()]
+        if not live:
+            return
+        self.wait_seconds.observe(time.perf_counter() - batch.opened)
+        self.batches += 1
+        self.items += len(live)
+        self.batch_sizes.observe(len(live))
+
+        try:
+            results = await self.send(key, [item for item, _ in live])
+            if len(results) != len(live):
+                raise Exception(f"Batch returned {len(results)} results for {len(live)} items")
+        except Exception as e:
+            self.failed_batches += 1
+            logger.warning(f"Batched call of {len(live)} items failed: {e}")
+            results = [e] * len(live)
+
+        for (_, future), result in zip(live, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        """Batch counts, sizes and fill rate for the metrics endpoint."""
+        return {
+            "enabled": self.enabled,
+            "window_ms": round(self.window * 1000, 3),
+            "max_size": self.max_size,
+            "batches": self.batches,
+            "items": self.items,
+            "full_batches": self.full_batches,
+            "failed_batches": self.failed_batches,
+            "fill_rate": round(self.items / (self.batches * self.max_size), 4) if self.batches else 0.0,
+            "batch_size": self.batch_sizes.snapshot(),
+            "wait_seconds": self.wait_seconds.snapshot(),
+        }
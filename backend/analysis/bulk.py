@@ -0,0 +1,365 @@
+"""
+Bulk ingestion of JSONL/CSV files.
+
+Uploaded files are parsed incrementally, one line (or CSV record) at a time,
+and items flow through a bounded queue into a fixed number of workers that
+call the orchestrator. Results are streamed back as NDJSON as soon as each
+item completes (optionally in input order) and the corresponding analysis
+logs are written in batches. A bad line or a failed analysis produces an
+error record for that item only; the rest of the file keeps going.
+
+Input formats:
+    JSONL: one object per line with ``text`` and optional ``id``,
+        ``candidate_labels`` (list of strings) and ``latency_class``
+    CSV: header row with a ``text`` column and optional ``id``,
+        ``candidate_labels`` (separated by ``;``) and ``latency_class`` columns
+"""
+import asyncio
+import codecs
+import csv
+import json
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from loguru import logger
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from auth.models import AnalysisLog
+from analysis.schemas import AnalyzeRequest, AnalyzeResponse
+from analysis.similarity import is_reusable, labels_signature, to_signed64
+from analysis.score_vectors import encode_log_scores
+from analysis.texts import store_texts
+
+BULK_FORMATS = ("jsonl", "csv")
+
+# Bytes read from the upload per iteration
+READ_SIZE = 64 * 1024
+# Longest accepted line; longer lines are reported as errors and skipped
+MAX_LINE_BYTES = 1024 * 1024
+CSV_LABEL_SEPARATOR = ";"
+
+# An item is either a parsed record or the error that prevented parsing it
+Item = Tuple[int, Union[dict, Exception]]
+
+
+async def iter_lines(read: Callable[[int], Awaitable[bytes]]) -> AsyncIterator[Union[str, Exception]]:
+    """
+    Split an async byte source into text lines without buffering it whole.
+
+    Args:
+        read: Coroutine function returning up to n bytes (b"" at end)
+
+    Yields:
+        Lines without the trailing newline, or a ValueError for a line
+        exceeding MAX_LINE_BYTES
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    oversized = False
+    while True:
+        chunk = await read(READ_SIZE)
+        pending += decoder.decode(chunk, final=not chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if oversized:
+                oversized = False
+                yield ValueError("Line too long")
+                continue
+            yield line.rstrip("\r")
+        if len(pending) > MAX_LINE_BYTES:
+            # Drop the rest of this line as it arrives
+            pending = ""
+            oversized = True
+        if not chunk:
+            break
+    if oversized:
+        yield ValueError("Line too long")
+    elif pending.strip():
+        yield pending.rstrip("\r")
+
+
+async def iter_jsonl_items(read: Callable[[int], Awaitable[bytes]]) -> AsyncIterator[Item]:
+    """Parse JSONL records, skipping blank lines."""
+    index = 0
+    async for line in iter_lines(read):
+        if isinstance(line, str) and not line.strip():
+            continue
+        if isinstance(line, Exception):
+            yield index, line
+        else:
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("Expected a JSON object")
+                yield index, record
+            except ValueError as e:
+                yield index, ValueError(f"Invalid JSON: {e}")
+        index += 1
+
+
+async def iter_csv_items(read: Callable[[int], Awaitable[bytes]]) -> AsyncIterator[Item]:
+    """Parse CSV records (quoted fields may span lines) using the header row."""
+    header: Optional[List[str]] = None
+    record_lines: List[str] = []
+    index = 0
+    async for line in iter_lines(read):
+        if isinstance(line, Exception):
+            record_lines = []
+            if header is not None:
+                yield index, line
+                index += 1
+            continue
+
+        record_lines.append(line)
+        text = "\n".join(record_lines)
+        # An odd number of quotes means a quoted field continues on the next line
+        if text.count('"') % 2:
+            continue
+        record_lines = []
+        if not text.strip():
+            continue
+
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+
+        record = dict(zip(header, values))
+        labels = record.get("candidate_labels")
+        if labels is not None:
+            labels = [label.strip() for label in labels.split(CSV_LABEL_SEPARATOR) if label.strip()]
+            record["candidate_labels"] = labels or None
+        yield index, record
+        index += 1
+
+    if record_lines:
+        yield index, ValueError("Unterminated quoted field")
+
+
+ITEM_PARSERS = {
+    "jsonl": iter_jsonl_items,
+    "csv": iter_csv_items,
+}
+
+
+def parse_item(record: dict) -> AnalyzeRequest:
+    """
+    Validate one input record.
+
+    Raises:
+        ValueError: If the record is not a valid analysis request
+    """
+    fields = {"text": record.get("text")}
+    for name in ("candidate_labels", "latency_class"):
+        if record.get(name) not in (None, ""):
+            fields[name] = record[name]
+    try:
+        return AnalyzeRequest(**fields)
+    except ValidationError as e:
+        errors = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+        raise ValueError(errors)
+
+
+class BulkIngestion:
+    """
+    Runs one uploaded file through the orchestrator.
+
+    Args:
+        db: Database session used for the batched log writes
+        user_id: Owner of the analysis logs
+        analyze: Orchestrator analyze coroutine function
+        concurrency: Items analyzed at the same time
+        log_batch_size: Analysis logs written per commit
+        ordered: Emit results in input order instead of completion order
+        max_items: Items processed before the rest of the file is ignored
+        reorder_window: In ordered mode, items taken from the file but not
+            yet emitted (default: 4 x concurrency); workers wait for a slow
+            item instead of buffering everything behind it
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        user_id: int,
+        analyze: Callable[..., Awaitable[dict]],
+        concurrency: int = 8,
+        log_batch_size: int = 200,
+        ordered: bool = False,
+        max_items: int = 100000,
+        reorder_window: Optional[int] = None
+    ):
+        self.db = db
+        self.user_id = user_id
+        self.analyze = analyze
+        self.concurrency = max(1, concurrency)
+        self.log_batch_size = max(1, log_batch_size)
+        self.ordered = ordered
+        self.max_items = max_items
+        self.reorder_window = max(reorder_window or self.concurrency * 4, self.concurrency)
+        self.succeeded = 0
+        self.failed = 0
+        self.logged = 0
+        self.log_failures = 0
+        self._pending_logs: List[Tuple[AnalysisLog, Optional[dict], str]] = []
+        # The Session is not thread-safe: one batch write at a time
+        self._write_lock = threading.Lock()
+
+    async def _process(self, index: int, item: Union[dict, Exception]) -> Tuple[dict, Optional[tuple]]:
+        """Analyze one item; failures become error records without a log."""
+        item_id = item.get("id") if isinstance(item, dict) else None
+        try:
+            if isinstance(item, Exception):
+                raise item
+            request = parse_item(item)
+            result = await self.analyze(request.text, request.candidate_labels, latency_class=request.latency_class)
+        except Exception as e:
+            return {"index": index, "id": item_id, "status": "error", "error": str(e)}, None
+
+        log = AnalysisLog(
+            user_id=self.user_id,
+            category=result["category"],
+            confidence_score=result["score"],
+            summary=result["summary"],
+            tone=result["tone"],
+            model=result.get("model"),
+            text_fingerprint=to_signed64(result.get("fingerprint")) if is_reusable(result) else None,
+            label_set=labels_signature(request.candidate_labels, request.latency_class),
+        )
+        record = {
+            "index": index,
+            "id": item_id,
+            "status": "ok",
+            "result": AnalyzeResponse(**result).model_dump(),
+        }
+        # Scores and texts are stored when the batch is written
+        return record, (log, result.get("scores"), request.text)
+
+    def _flush_logs(self) -> None:
+        """
+        Write buffered analysis logs in a single transaction.
+
+        Blocks on the pool checkout and commit, so ``run`` calls it with
+        ``asyncio.to_thread``.
+        """
+        with self._write_lock:
+            self._write_batch()
+
+    def _write_batch(self) -> None:
+        if not self._pending_logs:
+            return
+        batch, self._pending_logs = self._pending_logs, []
+        try:
+            hashes = store_texts(self.db, [text for _, _, text in batch])
+            for (log, scores, _), digest in zip(batch, hashes):
+                log.text_hash = digest
+                for column, value in encode_log_scores(self.db, scores).items():
+                    setattr(log, column, value)
+            self.db.add_all([log for log, _, _ in batch])
+            self.db.commit()
+            self.logged += len(batch)
+        except Exception as e:
+            self.db.rollback()
+            self.log_failures += len(batch)
+            logger.error(f"Bulk log write failed for {len(batch)} rows: {str(e)}")
+
+    async def run(self, items: AsyncIterator[Item]) -> AsyncIterator[bytes]:
+        """
+        Process items and stream NDJSON result lines.
+
+        The last line is a summary record with ``"status": "complete"``.
+
+        Args:
+            items: Parsed input items (see ITEM_PARSERS)
+
+        Yields:
+            Encoded NDJSON lines
+        """
+        started = time.perf_counter()
+        jobs: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        results: asyncio.Queue = asyncio.Queue()
+        total = 0
+        truncated = False
+        stream_error: Optional[str] = None
+        # Ordered mode: a slot per item between leaving the queue and being emitted
+        window = asyncio.Semaphore(self.reorder_window) if self.ordered else None
+
+        async def produce():
+            nonlocal total, truncated, stream_error
+            try:
+                async for item in items:
+                    if total >= self.max_items:
+                        truncated = True
+                        break
+                    await jobs.put(item)
+                    total += 1
+            except Exception as e:
+                stream_error = str(e)
+                logger.error(f"Bulk upload read failed: {stream_error}")
+            finally:
+                for _ in range(self.concurrency):
+                    await jobs.put(None)
+
+        async def work():
+            while True:
+                if window is not None:
+                    await window.acquire()
+                job = await jobs.get()
+                if job is None:
+                    if window is not None:
+                        window.release()
+                    break
+                await results.put(await self._process(*job))
+            await results.put(None)
+
+        tasks = [asyncio.create_task(produce())]
+        tasks += [asyncio.create_task(work()) for _ in range(self.concurrency)]
+        reorder: Dict[int, dict] = {}
+        next_index = 0
+        running = self.concurrency
+
+        try:
+            while running:
+                outcome = await results.get()
+                if outcome is None:
+                    running -= 1
+                    continue
+
+                record, pending = outcome
+                if pending is None:
+                    self.failed += 1
+                else:
+                    self.succeeded += 1
+                    self._pending_logs.append(pending)
+                    if len(self._pending_logs) >= self.log_batch_size:
+                        await asyncio.to_thread(self._flush_logs)
+
+                if not self.ordered:
+                    yield (json.dumps(record) + "\n").encode("utf-8")
+                    continue
+                reorder[record["index"]] = record
+                while next_index in reorder:
+                    yield (json.dumps(reorder.pop(next_index)) + "\n").encode("utf-8")
+                    next_index += 1
+                    window.release()
+
+            await asyncio.to_thread(self._flush_logs)
+            summary = {
+                "status": "complete",
+                "total": total,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "logged": self.logged,
+                "log_failures": self.log_failures,
+                "truncated": truncated,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+            if stream_error is not None:
+                summary["error"] = stream_error
+            logger.info(f"Bulk ingestion finished: {summary}")
+            yield (json.dumps(summary) + "\n").encode("utf-8")
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Keep what completed if the client went away mid-stream
+            if self._pending_logs:
+                await asyncio.to_thread(self._flush_logs)
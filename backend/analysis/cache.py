@@ -0,0 +1,282 @@
+"""
+Persistent analysis result cache shared by all worker processes on a node.
+
+Results are keyed by a hash of the input text, candidate labels, the
+model versions that produced them and the latency class (which selects the
+Gemini tier). The default backend is a SQLite database
+in WAL mode, which allows concurrent readers alongside a writer across
+processes; other backends (e.g. a network cache) can be added by
+implementing ``AnalysisCache`` and registering them in ``CACHE_BACKENDS``.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, List, Optional
+from loguru import logger
+import metrics
+from config import get_settings
+
+# Bump when the cached result format changes
+CACHE_FORMAT_VERSION = 1
+
+
+def cache_key(text: str, candidate_labels: List[str], model_versions: Dict[str, str]) -> str:
+    """
+    Build a cache key for an analysis request.
+
+    Args:
+        text: Input text
+        candidate_labels: Classification labels (order-insensitive)
+        model_versions: Names/versions of the models producing the result
+
+    Returns:
+        Hex digest identifying the request
+    """
+    material = json.dumps(
+        {
+            "v": CACHE_FORMAT_VERSION,
+            "labels": sorted(candidate_labels),
+            "models": model_versions,
+        },
+        sort_keys=True
+    )
+    digest = hashlib.sha256(material.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AnalysisCache(ABC):
+    """Interface for analysis result caches."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.errors = 0
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached result for ``key``, or None."""
+
+    @abstractmethod
+    def set(self, key: str, value: dict) -> None:
+        """Store a result under ``key``."""
+
+    async def aget(self, key: str) -> Optional[dict]:
+        """Look up a result without blocking the event loop."""
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: dict) -> None:
+        """Store a result without blocking the event loop."""
+        await asyncio.to_thread(self.set, key, value)
+
+    def stats(self) -> dict:
+        """Counters for the metrics endpoint."""
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "errors": self.errors,
+        }
+
+
+class NullAnalysisCache(AnalysisCache):
+    """Cache that stores nothing."""
+
+    def get(self, key: str) -> Optional[dict]:
+        self.misses += 1
+        return None
+
+    async def aget(self, key: str) -> Optional[dict]:
+        return self.get(key)
+
+    def set(self, key: str, value: dict) -> None:
+        pass
+
+    async def aset(self, key: str, value: dict) -> None:
+        pass
+
+
+class SQLiteAnalysisCache(AnalysisCache):
+    """
+    On-disk cache backed by SQLite in WAL mode.
+
+    Safe for concurrent use from many threads (one connection per thread)
+    and processes (WAL plus a busy timeout). Size is bounded by evicting the
+    least recently used entries once the stored bytes exceed ``max_bytes``.
+    """
+
+    # Access times are refreshed at most this often to keep hits read-only
+    TOUCH_INTERVAL = 60.0
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: int = 7 * 24 * 3600,
+        evict_every: int = 64
+    ):
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.evict_every = evict_every
+        self.evictions = 0
+        self._local = threading.local()
+        self._sets_since_evict = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_cache_accessed_at ON analysis_cache(accessed_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, created_at, accessed_at FROM analysis_cache WHERE key = ?",
+                (key,)
+            ).fetchone()
+
+            now = time.time()
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                self.misses += 1
+                return None
+
+            if now - row[2] > self.TOUCH_INTERVAL:
+                conn.execute("UPDATE analysis_cache SET accessed_at = ? WHERE key = ?", (now, key))
+
+            self.hits += 1
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            self.errors += 1
+            logger.warning(f"Analysis cache read failed: {e}")
+            return None
+
+    def set(self, key: str, value: dict) -> None:
+        payload = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        now = time.time()
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now)
+            )
+            self.sets += 1
+            self._sets_since_evict += 1
+            if self._sets_since_evict >= self.evict_every:
+                self._sets_since_evict = 0
+                self.evict()
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Analysis cache write failed: {e}")
+
+    def evict(self) -> int:
+        """
+        Drop expired entries, then least recently used ones until the cache
+        is back under 90% of ``max_bytes``.
+
+        Returns:
+            Number of entries removed
+        """
+        conn = self._connection()
+        removed = 0
+        if self.ttl_seconds:
+            removed += conn.execute(
+                "DELETE FROM analysis_cache WHERE created_at < ?",
+                (time.time() - self.ttl_seconds,)
+            ).rowcount
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM analysis_cache").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        if total > self.max_bytes:
+            freed = 0
+            doomed = []
+            for key, size in conn.execute("SELECT key, size FROM analysis_cache ORDER BY accessed_at"):
+                if total - freed <= target:
+                    break
+                doomed.append((key,))
+                freed += size
+            conn.executemany("DELETE FROM analysis_cache WHERE key = ?", doomed)
+            removed += len(doomed)
+
+        self.evictions += removed
+        return removed
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["evictions"] = self.evictions
+        try:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analysis_cache"
+            ).fetchone()
+            stats.update({"entries": entries, "bytes": size, "max_bytes": self.max_bytes})
+        except sqlite3.Error:
+            pass
+        return stats
+
+
+def _create_sqlite_cache(settings) -> AnalysisCache:
+    return SQLiteAnalysisCache(
+        path=settings.analysis_cache_path,
+        max_bytes=settings.analysis_cache_max_bytes,
+        ttl_seconds=settings.analysis_cache_ttl
+    )
+
+
+CACHE_BACKENDS = {
+    "sqlite": _create_sqlite_cache,
+    "none": lambda settings: NullAnalysisCache(),
+}
+
+
+@lru_cache()
+def get_analysis_cache() -> AnalysisCache:
+    """
+    Get the process-wide analysis cache for the configured backend.
+
+    Falls back to no caching if the backend cannot be opened (e.g. on a
+    read-only file system).
+    """
+    settings = get_settings()
+    factory = CACHE_BACKENDS.get(settings.analysis_cache_backend)
+    if factory is None:
+        raise ValueError(f"Unknown analysis cache backend: {settings.analysis_cache_backend}")
+
+    try:
+        cache = factory(settings)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Analysis cache disabled: {e}")
+        cache = NullAnalysisCache()
+
+    metrics.register("analysis_cache", cache.stats)
+    return cache
@@ -0,0 +1,242 @@
+"""
+Constant-memory export of analysis history.
+
+Rows are read from ``analysis_logs`` through a server-side cursor in
+``yield_per`` batches (plain column tuples, no ORM objects) and serialized
+incrementally as NDJSON, CSV or Parquet. Only one batch and one output chunk
+are held in memory at a time, regardless of export size.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from auth.models import AnalysisLog, StoredText
+from analysis.texts import resolve_input_text
+
+EXPORT_COLUMNS = ["id", "user_id", "created_at", "category", "confidence_score", "tone", "model", "summary", "input_text"]
+
+# Bytes buffered before a chunk is yielded to the response/file
+CHUNK_SIZE = 64 * 1024
+
+
+def log_query(db: Session, columns: List[str]):
+    """
+    Query selecting ``columns`` of analysis_logs as plain tuples.
+
+    ``input_text`` is selected as the legacy column plus the compressed text
+    from ``texts`` (outer join); ``log_row`` turns a result row into a dict.
+    """
+    selected = []
+    for column in columns:
+        if column == "input_text":
+            selected += [AnalysisLog.input_text, StoredText.codec, StoredText.content]
+        else:
+            selected.append(getattr(AnalysisLog, column))
+    query = db.query(*selected)
+    if "input_text" in columns:
+        query = query.outerjoin(StoredText, StoredText.hash == AnalysisLog.text_hash)
+    return query
+
+
+def log_row(columns: List[str], row) -> Dict[str, object]:
+    """Dictionary for one row of ``log_query(db, columns)``, with texts decompressed."""
+    values = iter(row)
+    result = {}
+    for column in columns:
+        if column == "input_text":
+            result[column] = resolve_input_text(next(values), next(values), next(values))
+        else:
+            result[column] = next(values)
+    return result
+
+
+def iter_log_rows(
+    db: Session,
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = 1000
+) -> Iterator[Dict[str, object]]:
+    """
+    Stream analysis log rows in id order.
+
+    Args:
+        db: Database session
+        user_id: Restrict to one user's history
+        since: Only rows created at or after this time
+        until: Only rows created before this time
+        batch_size: Rows fetched per round trip
+
+    Yields:
+        One dictionary per row with EXPORT_COLUMNS keys
+    """
+    query = log_query(db, EXPORT_COLUMNS)
+    if user_id is not None:
+        query = query.filter(AnalysisLog.user_id == user_id)
+    if since is not None:
+        query = query.filter(AnalysisLog.created_at >= since)
+    if until is not None:
+        query = query.filter(AnalysisLog.created_at < until)
+
+    for row in query.order_by(AnalysisLog.id).yield_per(batch_size):
+        yield log_row(EXPORT_COLUMNS, row)
+
+
+def iter_history_rows(
+    db: Session,
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = 1000,
+    archive_dir: Optional[str] = None
+) -> Iterator[Dict[str, object]]:
+    """
+    Stream archived rows (see analysis.archive) followed by database rows.
+
+    Archived rows predate everything still in the database, so the combined
+    stream stays in chronological order. Rows that are in both (archived
+    without deleting them) are only yielded from the archive; only archived
+    ids at or above the lowest id still in the database are remembered for
+    that. Arguments match ``iter_log_rows``; without ``archive_dir`` only
+    the database is read.
+    """
+    archived = set()
+    if archive_dir:
+        from analysis.archive import iter_archived_rows
+
+        lowest = db.query(func.min(AnalysisLog.id))
+        if user_id is not None:
+            lowest = lowest.filter(AnalysisLog.user_id == user_id)
+        lowest_id = lowest.scalar()
+        for row in iter_archived_rows(
+            archive_dir, user_id=user_id, since=since, until=until, columns=EXPORT_COLUMNS, batch_size=batch_size
+        ):
+            if lowest_id is not None and row["id"] >= lowest_id:
+                archived.add(row["id"])
+            yield row
+    for row in iter_log_rows(db, user_id=user_id, since=since, until=until, batch_size=batch_size):
+        if row["id"] not in archived:
+            yield row
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def ndjson_chunks(rows: Iterator[Dict[str, object]]) -> Iterator[bytes]:
+    """Serialize rows as newline-delimited JSON."""
+    buffer: List[str] = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, default=_json_default, ensure_ascii=False) + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def csv_chunks(rows: Iterator[Dict[str, object]]) -> Iterator[bytes]:
+    """Serialize rows as CSV with a header line."""
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        if isinstance(row.get("created_at"), datetime):
+            row = {**row, "created_at": row["created_at"].isoformat()}
+        writer.writerow(row)
+        if out.tell() >= CHUNK_SIZE:
+            yield out.getvalue().encode("utf-8")
+            out.seek(0)
+            out.truncate()
+    if out.tell():
+        yield out.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only stream whose contents are drained after each row group."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parquet_schema():
+    """Arrow schema for exported rows."""
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("category", pa.string()),
+        ("confidence_score", pa.float64()),
+        ("tone", pa.string()),
+        ("model", pa.string()),
+        ("summary", pa.string()),
+        ("input_text", pa.string()),
+    ])
+
+
+def parquet_chunks(rows: Iterator[Dict[str, object]], row_group_size: int = 10000) -> Iterator[bytes]:
+    """
+    Serialize rows as Parquet, one row group per ``row_group_size`` rows.
+
+    Requires the optional ``pyarrow`` package.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires the optional 'pyarrow' package")
+
+    schema = parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+
+    def flush(batch: List[Dict[str, object]]) -> bytes:
+        columns = {name: [row[name] for row in batch] for name in EXPORT_COLUMNS}
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema), row_group_size=row_group_size)
+        return sink.drain()
+
+    batch: List[Dict[str, object]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= row_group_size:
+            yield flush(batch)
+            batch = []
+    if batch:
+        yield flush(batch)
+
+    writer.close()
+    yield sink.drain()
+
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", ndjson_chunks),
+    "csv": ("text/csv", csv_chunks),
+    "parquet": ("application/vnd.apache.parquet", parquet_chunks),
+}
@@ -0,0 +1,88 @@
+"""
+Per-text label score storage for zero-shot classification reuse.
+
+With single-label zero-shot classification the Inference API returns a
+softmax over each label's entailment logit. Scores for any subset of labels
+therefore follow from stored log-scores by renormalizing, and scores from a
+request that shares one "anchor" label with the stored set can be merged onto
+the same scale. Log-scores are kept per text (and model) in the analysis
+cache backend so every worker process can reuse them.
+"""
+import hashlib
+import math
+from typing import Dict, List, Optional
+from analysis.cache import AnalysisCache
+
+# Floor for probabilities before taking logs
+MIN_SCORE = 1e-12
+
+
+def merge_scores(known: Dict[str, float], upstream: Dict[str, float], anchor: Optional[str] = None) -> Dict[str, float]:
+    """
+    Merge upstream probabilities into stored log-scores.
+
+    Args:
+        known: Stored log-scores for the text (label -> log-score)
+        upstream: Probabilities from the API (label -> score)
+        anchor: Label present in both, used to align the two scales
+
+    Returns:
+        Combined log-scores sharing a single scale
+    """
+    if anchor is None or anchor not in upstream or anchor not in known:
+        known = {}
+        offset = 0.0
+    else:
+        offset = known[anchor] - math.log(max(upstream[anchor], MIN_SCORE))
+
+    merged = dict(known)
+    for label, score in upstream.items():
+        if label not in merged:
+            merged[label] = math.log(max(score, MIN_SCORE)) + offset
+
+    # Keep values bounded; only differences matter
+    peak = max(merged.values())
+    return {label: value - peak for label, value in merged.items()}
+
+
+def distribution(log_scores: Dict[str, float], labels: List[str]) -> Dict[str, float]:
+    """
+    Probability of each requested label, renormalized over ``labels``.
+
+    Args:
+        log_scores: Stored log-scores covering every label in ``labels``
+        labels: Requested candidate labels
+
+    Returns:
+        label -> probability, summing to 1
+    """
+    peak = max(log_scores[label] for label in labels)
+    weights = {label: math.exp(log_scores[label] - peak) for label in labels}
+    total = sum(weights.values())
+    return {label: weight / total for label, weight in weights.items()}
+
+
+class LabelScoreStore:
+    """Stores per-text label log-scores in an AnalysisCache backend."""
+
+    def __init__(self, cache: AnalysisCache, model: str):
+        self.cache = cache
+        self.model = model
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.sha256(self.model.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return f"labels:{digest.hexdigest()}"
+
+    def get(self, text: str) -> Dict[str, float]:
+        """Stored log-scores for a text (empty if none)."""
+        return self.cache.get(self._key(text)) or {}
+
+    async def aget(self, text: str) -> Dict[str, float]:
+        """Stored log-scores for a text without blocking the event loop."""
+        return await self.cache.aget(self._key(text)) or {}
+
+    async def aset(self, text: str, log_scores: Dict[str, float]) -> None:
+        """Store log-scores for a text without blocking the event loop."""
+        await self.cache.aset(self._key(text), log_scores)
@@ -2,62 +2,380 @@
 Orchestrator for coordinating Hugging Face and Gemini services.
 Manages the complete analysis workflow.
 """
-from typing import Dict
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Optional
 from loguru import logger
+import metrics
+import timing
+from config import get_settings
+from analysis.cache import AnalysisCache, cache_key, get_analysis_cache
+from analysis.scheduler import FairScheduler, get_scheduler
+from analysis.similarity import NearDuplicateIndex, fingerprint, get_near_duplicate_index, is_reusable, labels_signature
 from analysis.services.huggingface import huggingface_service
 from analysis.services.gemini import gemini_service
+from analysis.services.model_router import DEFAULT_LATENCY_CLASS
+from analysis.services.extractive import extractive_service
+
+settings = get_settings()
+
+# Latency class served by the local extractive summarizer instead of Gemini
+LOCAL_LATENCY_CLASS = "instant"
+
+# Category of a degraded result whose classification missed the deadline
+UNKNOWN_CATEGORY = "unknown"
+
+DEADLINE_STAGES = ("queue", "classify", "summarize")
+
+# Called with a stage name and its partial result as each stage completes
+StageCallback = Callable[[str, Dict[str, Any]], None]
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before ``stage`` completed."""
+    
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class SummaryFallback:
+    """
+    Tracks Gemini failures and decides when to use the local summarizer.
+    
+    After ``failure_threshold`` consecutive failures or timeouts, Gemini is
+    skipped for ``cooldown`` seconds; the next call after that is a trial.
+    """
+    
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.fallbacks = 0
+        self.timeouts = 0
+        self.errors = 0
+    
+    def is_open(self) -> bool:
+        """Whether Gemini is currently being skipped."""
+        return time.monotonic() < self.open_until
+    
+    def record_success(self) -> None:
+        """Reset the failure streak after a successful Gemini call."""
+        self.consecutive_failures = 0
+    
+    def record_failure(self, timed_out: bool) -> None:
+        """Count a failed or timed-out Gemini call."""
+        if timed_out:
+            self.timeouts += 1
+        else:
+            self.errors += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + self.cooldown
+    
+    def stats(self) -> dict:
+        """Counters for the metrics endpoint."""
+        return {
+            "fallbacks": self.fallbacks,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "consecutive_failures": self.consecutive_failures,
+            "open": self.is_open(),
+        }
+
+
+class DeadlineStats:
+    """Counts degraded results per stage that missed the deadline."""
+    
+    def __init__(self):
+        self.requests = 0
+        self.exceeded = {stage: 0 for stage in DEADLINE_STAGES}
+    
+    def stats(self) -> dict:
+        """Counters for the metrics endpoint."""
+        return {"requests": self.requests, "exceeded": dict(self.exceeded)}
 
 
 class AnalysisOrchestrator:
     """Orchestrates the analysis workflow between HF and Gemini."""
     
-    async def analyze(self, text: str, candidate_labels: list) -> Dict[str, any]:
+    def __init__(
+        self,
+        cache: Optional[AnalysisCache] = None,
+        near_duplicates: Optional[NearDuplicateIndex] = None,
+        fallback: Optional[SummaryFallback] = None,
+        scheduler: Optional[FairScheduler] = None
+    ):
+        self._cache = cache
+        self._near_duplicates = near_duplicates
+        self._scheduler = scheduler
+        self.fallback = fallback or SummaryFallback(
+            failure_threshold=settings.summary_fallback_failures,
+            cooldown=settings.summary_fallback_cooldown
+        )
+        self.deadlines = DeadlineStats()
+    
+    @property
+    def cache(self) -> AnalysisCache:
+        """Result cache, opened on first use."""
+        if self._cache is None:
+            self._cache = get_analysis_cache()
+        return self._cache
+    
+    @property
+    def near_duplicates(self) -> Optional[NearDuplicateIndex]:
+        """Near-duplicate index, or None when disabled."""
+        if self._near_duplicates is None and settings.near_duplicate_enabled:
+            self._near_duplicates = get_near_duplicate_index()
+        return self._near_duplicates
+    
+    @property
+    def scheduler(self) -> Optional[FairScheduler]:
+        """Per-user upstream scheduler, or None when disabled."""
+        if self._scheduler is None and settings.scheduler_enabled:
+            self._scheduler = get_scheduler()
+        return self._scheduler
+    
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        """Seconds left for upstream work before ``deadline`` (None without one)."""
+        if deadline is None:
+            return None
+        return deadline - time.monotonic() - settings.deadline_reserve_ms / 1000
+    
+    async def _before_deadline(self, deadline: Optional[float], stage: str, awaitable: Awaitable[Any]) -> Any:
+        """
+        Await ``awaitable``, cancelling it when the deadline passes.
+        
+        Raises:
+            DeadlineExceeded: If it did not complete in time
+        """
+        remaining = self._remaining(deadline)
+        if remaining is None:
+            return await awaitable
+        if remaining <= 0:
+            awaitable.close()
+            raise DeadlineExceeded(stage)
+        try:
+            return await asyncio.wait_for(awaitable, timeout=remaining)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(stage)
+    
+    @asynccontextmanager
+    async def _upstream_slot(self, user_id: Optional[Hashable], deadline: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold a scheduler slot for ``user_id`` (no-op without a user or scheduler)."""
+        scheduler = self.scheduler if user_id is not None else None
+        if scheduler is None:
+            yield
+            return
+        
+        with timing.stage("queue"):
+            waited = await self._before_deadline(deadline, "queue", scheduler.acquire(user_id))
+        if waited > 0.1:
+            logger.info(f"Upstream slot for user {user_id} after {waited:.3f}s in queue")
+        try:
+            yield
+        finally:
+            scheduler.release(user_id)
+    
+    def _model_versions(self, latency_class: Optional[str] = None) -> Dict[str, str]:
+        """
+        Models whose output makes up a result; part of the cache key.
+        
+        The latency class stands in for the Gemini tier it routes to, so a
+        quality request is never answered with a fast-tier summary.
+        """
+        return {
+            "classifier": settings.huggingface_model,
+            "generator": getattr(gemini_service, "model_name", "unknown"),
+            "latency_class": latency_class or DEFAULT_LATENCY_CLASS,
+        }
+    
+    async def _summarize(
+        self,
+        text: str,
+        category: str,
+        latency_class: Optional[str],
+        packed: bool = False,
+        deadline: Optional[float] = None
+    ) -> Dict[str, str]:
+        """
+        Summary and tone from Gemini, or from the local summarizer for the
+        instant latency class and when Gemini is slow or failing.
+        
+        With ``packed``, the Gemini call may share a prompt with concurrent
+        packed calls.
+        
+        Raises:
+            DeadlineExceeded: If Gemini did not answer before ``deadline``
+                (this does not count as a Gemini failure)
+        """
+        if latency_class == LOCAL_LATENCY_CLASS:
+            return await extractive_service.analyze(text, category)
+        generate = gemini_service.analyze_packed if packed else gemini_service.analyze
+        if not settings.summary_fallback_enabled:
+            return await self._before_deadline(deadline, "summarize", generate(text, category, latency_class=latency_class))
+        
+        if not self.fallback.is_open():
+            remaining = self._remaining(deadline)
+            # Running out of the client's time is not a Gemini failure
+            deadline_bound = remaining is not None and remaining < settings.summary_fallback_timeout
+            try:
+                result = await asyncio.wait_for(
+                    generate(text, category, latency_class=latency_class),
+                    timeout=max(remaining, 0) if deadline_bound else settings.summary_fallback_timeout
+                )
+                self.fallback.record_success()
+                return result
+            except asyncio.TimeoutError:
+                if deadline_bound:
+                    raise DeadlineExceeded("summarize")
+                self.fallback.record_failure(timed_out=True)
+                logger.warning(f"Gemini timed out after {settings.summary_fallback_timeout}s, using local summary")
+            except Exception as e:
+                self.fallback.record_failure(timed_out=False)
+                logger.warning(f"Gemini failed ({str(e)}), using local summary")
+        
+        self.fallback.fallbacks += 1
+        return await extractive_service.analyze(text, category)
+    
+    async def analyze(
+        self,
+        text: str,
+        candidate_labels: list,
+        latency_class: Optional[str] = None,
+        user_id: Optional[Hashable] = None,
+        packed: bool = False,
+        deadline: Optional[float] = None,
+        on_stage: Optional[StageCallback] = None
+    ) -> Dict[str, any]:
         """
         Perform complete analysis workflow.
         
         Workflow:
-        1. Classify text using Hugging Face
-        2. Send category + text to Gemini for summary and tone
-        3. Aggregate results
+        0. Return a cached result for identical input, or reuse the result
+           of a near-identical text (marked ``near_duplicate``)
+        1. Wait for a fair share of upstream capacity (per ``user_id``),
+           then classify text using Hugging Face
+        2. Send category + text to Gemini for summary and tone (local
+           extractive summary for the instant class or as a fallback)
+        3. Aggregate results, store them in the cache and index them
+        
+        With a ``deadline``, each stage only gets the time left before it;
+        a stage still running then is cancelled and a degraded result is
+        returned instead (``degraded``, with ``deadline_exceeded`` naming
+        the stage): the classification if it completed (else category
+        "unknown" with score 0) and a local extractive summary and tone.
         
         Args:
             text: Text to analyze
             candidate_labels: Categories for classification
+            latency_class: fast, standard or quality (Gemini model routing)
+                or instant (local extractive summary)
+            user_id: Requesting user, for fair scheduling of upstream calls
+                (None bypasses the scheduler)
+            packed: Allow packing the Gemini call with concurrent packed
+                calls into one prompt (bulk workloads)
+            deadline: time.monotonic() value by which a result is due
+            on_stage: Called with ``("classify", {"category", "score"})``
+                and ``("summarize", {"summary", "tone", "model"})`` as the
+                upstream stages complete (not for cached or degraded parts)
             
         Returns:
-            Dictionary with category, score, summary, and tone
+            Dictionary with category, score, summary, tone, the Gemini model
+            that produced the summary, the full label
+            score distribution (if available) and the text fingerprint
+            (None when near-duplicate reuse is disabled)
             
         Raises:
             Exception: If any step fails
         """
         logger.info("Starting analysis orchestration")
         
+        key = cache_key(text, candidate_labels, self._model_versions(latency_class))
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            logger.info("Analysis served from cache")
+            return cached
+        
+        index = self.near_duplicates
+        text_fp = fingerprint(text) if index is not None else None
+        label_set = labels_signature(candidate_labels, latency_class)
+        if text_fp is not None:
+            match = index.lookup(text_fp, label_set)
+            if match is not None:
+                reused, score = match
+                logger.info(f"Reusing near-duplicate analysis (similarity {score:.3f})")
+                return {**reused, "near_duplicate": True, "similarity": score, "fingerprint": text_fp}
+        
+        if deadline is not None:
+            self.deadlines.requests += 1
+        classification_result = None
+        degraded_stage = None
         try:
-            # Step 1: Classify with Hugging Face
-            logger.info("Step 1: Classifying with Hugging Face")
-            classification_result = await huggingface_service.classify(text, candidate_labels)
-            
-            category = classification_result["category"]
-            score = classification_result["score"]
-            
-            logger.info(f"Classification complete: {category} ({score:.3f})")
-            
-            # Step 2: Analyze with Gemini
-            logger.info("Step 2: Analyzing with Gemini")
-            gemini_result = await gemini_service.analyze(text, category)
+            try:
+                # Upstream calls wait for a fair share of capacity
+                async with self._upstream_slot(user_id, deadline):
+                    # Step 1: Classify with Hugging Face
+                    logger.info("Step 1: Classifying with Hugging Face")
+                    with timing.stage("classify"):
+                        classification_result = await self._before_deadline(
+                            deadline, "classify", huggingface_service.classify(text, candidate_labels)
+                        )
+                    
+                    category = classification_result["category"]
+                    score = classification_result["score"]
+                    
+                    logger.info(f"Classification complete: {category} ({score:.3f})")
+                    if on_stage is not None:
+                        on_stage("classify", {"category": category, "score": score})
+                    
+                    # Step 2: Analyze with Gemini
+                    logger.info("Step 2: Analyzing with Gemini")
+                    with timing.stage("summarize"):
+                        gemini_result = await self._summarize(
+                            text, category, latency_class, packed=packed, deadline=deadline
+                        )
+                    if on_stage is not None:
+                        on_stage("summarize", {field: gemini_result.get(field) for field in ("summary", "tone", "model")})
+            except DeadlineExceeded as e:
+                # Partial result: what completed, plus a local summary and tone
+                degraded_stage = e.stage
+                self.deadlines.exceeded[e.stage] += 1
+                logger.warning(f"{e}, returning a degraded result")
+                if classification_result is None:
+                    classification_result = {"category": UNKNOWN_CATEGORY, "score": 0.0}
+                category = classification_result["category"]
+                score = classification_result["score"]
+                gemini_result = await extractive_service.analyze(text, category)
             
             summary = gemini_result["summary"]
             tone = gemini_result["tone"]
             
-            logger.info(f"Gemini analysis complete: tone={tone}")
+            logger.info(f"Gemini analysis complete: tone={tone}, model={gemini_result.get('model')}")
             
             # Step 3: Aggregate results
             result = {
                 "category": category,
                 "score": score,
                 "summary": summary,
-                "tone": tone
+                "tone": tone,
+                "model": gemini_result.get("model"),
+                "scores": classification_result.get("scores")
             }
+            if degraded_stage is not None:
+                result["degraded"] = True
+                result["deadline_exceeded"] = degraded_stage
+            
+            reusable = is_reusable(result)
+            if text_fp is not None and reusable:
+                index.add(text_fp, label_set, dict(result))
+            # Partial results must not be fingerprinted for later reuse
+            result["fingerprint"] = text_fp if degraded_stage is None else None
+            if reusable:
+                await self.cache.aset(key, result)
             
             logger.info("Analysis orchestration complete")
             return result
@@ -69,3 +387,5 @@ class AnalysisOrchestrator:
 
 # Singleton instance
 orchestrator = AnalysisOrchestrator()
+metrics.register("summary_fallback", orchestrator.fallback.stats)
+metrics.register("deadlines", orchestrator.deadlines.stats)
@@ -2,21 +2,73 @@
 Analysis routes for text analysis endpoint.
 Protected by JWT authentication.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import threading
+import time
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, UploadFile, WebSocket, status
+from fastapi.responses import StreamingResponse
+from functools import partial
+from typing import Optional
 from sqlalchemy.orm import Session
 from loguru import logger
+from config import get_settings
 from database import get_db
 from auth.models import User, AnalysisLog
+from auth.api_keys import api_key_cache, is_api_key
 from auth.middleware import get_current_user
 from analysis.schemas import AnalyzeRequest, AnalyzeResponse
 from analysis.orchestrator import orchestrator
+from analysis.similarity import is_reusable, labels_signature, to_signed64
+from analysis.score_vectors import encode_log_scores
+from analysis.texts import store_text
+from analysis.export import EXPORT_FORMATS, iter_history_rows
+from analysis.bulk import ITEM_PARSERS, BulkIngestion
+from analysis.sessions import AnalysisSession, authenticate_socket, token_expiry
+
+settings = get_settings()
 
 router = APIRouter(prefix="/analyze", tags=["Analysis"])
 
 
+def log_analysis(db: Session, user_id: int, request: AnalyzeRequest, result: dict) -> int:
+    """
+    Write the analysis log (history entry) for one analysis.
+    
+    Blocks on the pool checkout and commit, so async callers run it with
+    ``asyncio.to_thread``. The connection is back in the pool on return.
+    
+    Returns:
+        Id of the new log row
+    """
+    analysis_log = AnalysisLog(
+        user_id=user_id,
+        text_hash=store_text(db, request.text),
+        category=result["category"],
+        confidence_score=result["score"],
+        summary=result["summary"],
+        tone=result["tone"],
+        model=result.get("model"),
+        # Only results the near-duplicate index may serve again (see rebuild)
+        text_fingerprint=to_signed64(result.get("fingerprint")) if is_reusable(result) else None,
+        label_set=labels_signature(request.candidate_labels, request.latency_class),
+        **encode_log_scores(db, result.get("scores"))
+    )
+    
+    db.add(analysis_log)
+    try:
+        db.flush()
+        log_id = analysis_log.id
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return log_id
+
+
 @router.post("", response_model=AnalyzeResponse)
 async def analyze_text(
     request: AnalyzeRequest,
+    x_deadline_ms: Optional[int] = Header(None, ge=1, le=600000, description="Client deadline in milliseconds"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -29,8 +81,13 @@ async def analyze_text(
     3. Returns aggregated results
     4. Logs analysis to database
     
+    With a deadline (``deadline_ms`` or the X-Deadline-Ms header), stages
+    that have not finished when it passes are cancelled and a partial
+    result marked ``degraded`` is returned instead of an error.
+    
     Args:
         request: Analysis request with text and optional candidate labels
+        x_deadline_ms: Deadline header, used when the body has none
         current_user: Authenticated user (injected by middleware)
         db: Database session
         
@@ -42,27 +99,22 @@ async def analyze_text(
     """
     try:
         logger.info(f"Analysis request from user {current_user.username}")
+        deadline_ms = request.deadline_ms or x_deadline_ms
+        deadline = time.monotonic() + deadline_ms / 1000 if deadline_ms else None
         
         # Perform analysis
         result = await orchestrator.analyze(
             text=request.text,
-            candidate_labels=request.candidate_labels
-        )
-        
-        # Log analysis to database
-        analysis_log = AnalysisLog(
+            candidate_labels=request.candidate_labels,
+            latency_class=request.latency_class,
             user_id=current_user.id,
-            input_text=request.text[:1000],  # Store first 1000 chars
-            category=result["category"],
-            confidence_score=result["score"],
-            summary=result["summary"],
-            tone=result["tone"]
+            deadline=deadline
         )
         
-        db.add(analysis_log)
-        db.commit()
+        # Log analysis to database
+        log_id = await asyncio.to_thread(log_analysis, db, current_user.id, request, result)
         
-        logger.info(f"Analysis complete and logged (ID: {analysis_log.id})")
+        logger.info(f"Analysis complete and logged (ID: {log_id})")
         
         return AnalyzeResponse(**result)
         
@@ -72,3 +124,148 @@ async def analyze_text(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Analysis failed: {str(e)}"
         )
+
+
+@router.websocket("/ws")
+async def analysis_session(websocket: WebSocket, db: Session = Depends(get_db)):
+    """
+    Interactive analysis session over a WebSocket.
+    
+    The client authenticates once (handshake headers or a first
+    ``{"type": "auth", "token": ...}`` message), then sends analyze
+    messages tagged with an ``id``. Analyses run concurrently; stage events
+    and results are pushed as they complete and ``{"type": "cancel"}``
+    stops one in flight. The session is closed once a JWT expires or an
+    API key is revoked. See analysis/sessions.py for the message formats.
+    
+    Args:
+        websocket: Incoming connection
+        db: Database session for authentication and the analysis logs
+            (no connection is held between writes)
+    """
+    await websocket.accept()
+    authenticated = await authenticate_socket(websocket, db, settings.websocket_auth_timeout)
+    if authenticated is None:
+        return
+    
+    user, token = authenticated
+    user_id = user.id
+    db_lock = threading.Lock()
+    
+    def write_log(request: AnalyzeRequest, result: dict) -> int:
+        # Concurrent analyses share this Session: one write at a time
+        with db_lock:
+            return log_analysis(db, user_id, request, result)
+    
+    def key_still_valid() -> bool:
+        # Picks up revocations through the cache's sync, like every request
+        with db_lock:
+            try:
+                return api_key_cache.resolve(db, token) is not None
+            finally:
+                db.close()
+    
+    logger.info(f"Analysis session opened by user {user.username}")
+    await websocket.send_json({"type": "ready", "user": user.username})
+    session = AnalysisSession(
+        websocket,
+        analyze=partial(orchestrator.analyze, user_id=user_id),
+        log=write_log,
+        max_inflight=settings.websocket_max_inflight,
+        expires_at=token_expiry(token),
+        check_credentials=key_still_valid if is_api_key(token) else None,
+        recheck_interval=settings.api_key_revocation_sync
+    )
+    await session.run()
+    logger.info(f"Analysis session of user {user_id} closed")
+
+
+@router.post("/bulk")
+async def analyze_bulk(
+    file: UploadFile = File(..., description="JSONL or CSV file of texts"),
+    format: Optional[str] = Query(None, pattern="^(jsonl|csv)$"),
+    ordered: bool = Query(False, description="Emit results in input order"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Analyze every text in an uploaded JSONL or CSV file.
+    
+    The file is parsed line by line and items are analyzed with bounded
+    concurrency. Each result (or per-item error) is streamed back as an
+    NDJSON line as soon as it completes, followed by a summary line.
+    Analysis logs are written in batches.
+    
+    Args:
+        file: Uploaded file (JSONL objects or CSV with a ``text`` column)
+        format: jsonl or csv (default: inferred from the file name)
+        ordered: Emit results in input order instead of completion order
+        current_user: Authenticated user (injected by middleware)
+        db: Database session
+        
+    Returns:
+        Streaming NDJSON response
+    """
+    if format is None:
+        format = "csv" if (file.filename or "").lower().endswith(".csv") else "jsonl"
+    
+    logger.info(f"Bulk {format} upload '{file.filename}' from user {current_user.username}")
+    
+    ingestion = BulkIngestion(
+        db,
+        user_id=current_user.id,
+        analyze=partial(orchestrator.analyze, user_id=current_user.id, packed=True),
+        concurrency=settings.bulk_concurrency,
+        log_batch_size=settings.bulk_log_batch_size,
+        ordered=ordered,
+        max_items=settings.bulk_max_items
+    )
+    items = ITEM_PARSERS[format](file.read)
+    return StreamingResponse(ingestion.run(items), media_type="application/x-ndjson")
+
+
+@router.get("/history/export")
+async def export_history(
+    format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$"),
+    include_archived: bool = Query(False),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Export the current user's full analysis history.
+    
+    Rows are streamed from the database in batches and serialized
+    incrementally, so memory use does not grow with history size.
+    
+    Args:
+        format: ndjson, csv or parquet (parquet needs pyarrow installed)
+        include_archived: Also read rows moved to the cold-tier archive
+        current_user: Authenticated user (injected by middleware)
+        db: Database session
+        
+    Returns:
+        Streaming response with the exported rows
+        
+    Raises:
+        HTTPException: If the requested format is unavailable
+    """
+    media_type, serializer = EXPORT_FORMATS[format]
+    if format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail="Parquet export is not available on this server"
+            )
+    
+    logger.info(f"History export ({format}) for user {current_user.username}")
+    
+    # The session stays open until the response has been sent
+    archive_dir = settings.archive_dir if include_archived else None
+    chunks = serializer(iter_history_rows(db, user_id=current_user.id, archive_dir=archive_dir))
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="analysis-history.{format}"'}
+    )
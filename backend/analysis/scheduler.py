@@ -0,0 +1,188 @@
+"""
+Weighted fair scheduling of upstream analysis capacity across users.
+
+At most ``capacity`` analyses call Hugging Face/Gemini at once per worker.
+When all slots are busy, requests wait in a queue ordered by start-time fair
+queueing (SFQ): each request is tagged with a virtual start time
+
+    start = max(virtual_time, previous finish tag of the same user)
+    finish = start + 1 / weight
+
+and a freed slot goes to the waiting request with the smallest start tag.
+A user with weight 2 therefore gets twice the dispatch rate of a user with
+weight 1 while both are backlogged, and one user's burst cannot delay other
+users by more than about one request each.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Dict, Hashable, List, Optional, Tuple
+import metrics
+from config import get_settings
+
+
+class UserQueueStats:
+    """Queue counters for one user."""
+
+    def __init__(self):
+        self.queued = 0
+        self.in_flight = 0
+        self.dispatched = 0
+        self.wait_seconds = metrics.Histogram(window=256)
+
+    def snapshot(self, weight: float) -> dict:
+        return {
+            "weight": weight,
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "dispatched": self.dispatched,
+            "wait_seconds": self.wait_seconds.snapshot(),
+        }
+
+
+class FairScheduler:
+    """
+    Bounded-concurrency scheduler with per-user weighted fair queueing.
+
+    Args:
+        capacity: Analyses allowed to run upstream calls at the same time
+        weight_for: Returns the weight of a user (default: 1 for everyone)
+    """
+
+    def __init__(self, capacity: int, weight_for: Optional[Callable[[Hashable], float]] = None):
+        self.capacity = max(1, capacity)
+        self.weight_for = weight_for or (lambda user: 1.0)
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        self._last_finish: Dict[Hashable, float] = {}
+        # (start tag, sequence, user, future, enqueued at)
+        self._heap: List[Tuple[float, int, Hashable, asyncio.Future, float]] = []
+        self._sequence = itertools.count()
+        self._users: Dict[Hashable, UserQueueStats] = {}
+
+    def _stats(self, user: Hashable) -> UserQueueStats:
+        stats = self._users.get(user)
+        if stats is None:
+            stats = self._users[user] = UserQueueStats()
+        return stats
+
+    def _start_tag(self, user: Hashable) -> float:
+        weight = max(float(self.weight_for(user)), 1e-6)
+        start = max(self._virtual_time, self._last_finish.get(user, 0.0))
+        self._last_finish[user] = start + 1.0 / weight
+        return start
+
+    def _drop_cancelled(self) -> None:
+        """Forget waiters that gave up. Only called when no live waiter can exist."""
+        for _, _, user, _, _ in self._heap:
+            self._users[user].queued -= 1
+        self._heap.clear()
+
+    async def acquire(self, user: Hashable) -> float:
+        """
+        Wait for an upstream slot.
+
+        Args:
+            user: Key the request is queued under (the user id)
+
+        Returns:
+            Seconds spent waiting
+        """
+        stats = self._stats(user)
+        start = self._start_tag(user)
+
+        # Waiters are only left queued while every slot is busy, so anything
+        # still in the heap here was cancelled
+        if self._in_flight < self.capacity:
+            self._drop_cancelled()
+            self._in_flight += 1
+            self._virtual_time = start
+            stats.in_flight += 1
+            stats.dispatched += 1
+            stats.wait_seconds.observe(0.0)
+            return 0.0
+
+        future = asyncio.get_running_loop().create_future()
+        enqueued = time.perf_counter()
+        heapq.heappush(self._heap, (start, next(self._sequence), user, future, enqueued))
+        stats.queued += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled
+                self.release(user)
+            raise
+        return time.perf_counter() - enqueued
+
+    def release(self, user: Hashable) -> None:
+        """Give a slot back, handing it to the next waiter in fair order."""
+        self._stats(user).in_flight -= 1
+        while self._heap:
+            start, _, next_user, future, enqueued = heapq.heappop(self._heap)
+            stats = self._users[next_user]
+            stats.queued -= 1
+            if future.done():
+                continue
+            self._virtual_time = start
+            stats.in_flight += 1
+            stats.dispatched += 1
+            stats.wait_seconds.observe(time.perf_counter() - enqueued)
+            future.set_result(None)
+            return
+        self._in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, user: Hashable) -> AsyncIterator[float]:
+        """Hold an upstream slot for the duration of the block; yields the wait time."""
+        waited = await self.acquire(user)
+        try:
+            yield waited
+        finally:
+            self.release(user)
+
+    def stats(self) -> dict:
+        """Overall and per-user queue metrics for the metrics endpoint."""
+        return {
+            "capacity": self.capacity,
+            "in_flight": self._in_flight,
+            "queued": sum(stats.queued for stats in self._users.values()),
+            "users": {
+                str(user): stats.snapshot(self.weight_for(user))
+                for user, stats in self._users.items()
+            },
+        }
+
+
+def weight_resolver(settings) -> Callable[[Hashable], float]:
+    """
+    Build the user -> weight lookup from settings.
+
+    A weight in SCHEDULER_USER_WEIGHTS wins; otherwise the user's plan from
+    SCHEDULER_USER_PLANS is looked up in SCHEDULER_PLAN_WEIGHTS; otherwise
+    SCHEDULER_DEFAULT_WEIGHT applies.
+    """
+    user_weights = {str(user): float(weight) for user, weight in settings.scheduler_user_weights.items()}
+    user_plans = {str(user): plan for user, plan in settings.scheduler_user_plans.items()}
+    plan_weights = {plan: float(weight) for plan, weight in settings.scheduler_plan_weights.items()}
+    default = float(settings.scheduler_default_weight)
+
+    def weight_for(user: Hashable) -> float:
+        key = str(user)
+        if key in user_weights:
+            return user_weights[key]
+        return plan_weights.get(user_plans.get(key), default)
+
+    return weight_for
+
+
+@lru_cache()
+def get_scheduler() -> FairScheduler:
+    """Get the process-wide upstream scheduler."""
+    settings = get_settings()
+    scheduler = FairScheduler(settings.scheduler_concurrency, weight_resolver(settings))
+    metrics.register("scheduler", scheduler.stats)
+    return scheduler
@@ -12,6 +12,18 @@ class AnalyzeRequest(BaseModel):
         default=["technology", "politics", "sports", "entertainment", "business", "health", "science"],
         description="Categories for zero-shot classification"
     )
+    latency_class: Optional[str] = Field(
+        default=None,
+        pattern="^(instant|fast|standard|quality)$",
+        description="Latency class: instant (local summary), fast, standard (default) or quality"
+    )
+    deadline_ms: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=600000,
+        description="Milliseconds the client will wait; stages still running then are cancelled "
+                    "and a degraded result is returned (overrides the X-Deadline-Ms header)"
+    )
 
 
 class AnalyzeResponse(BaseModel):
@@ -20,6 +32,13 @@ class AnalyzeResponse(BaseModel):
     score: float = Field(..., description="Confidence score (0-1)")
     summary: str = Field(..., description="Summary generated by Gemini")
     tone: str = Field(..., description="Detected tone: positive, neutral, or negative")
+    model: Optional[str] = Field(None, description="Gemini model that produced the summary")
+    near_duplicate: bool = Field(False, description="Result reused from a near-identical text")
+    similarity: Optional[float] = Field(None, description="Fingerprint similarity to the reused text (0-1)")
+    degraded: bool = Field(False, description="Partial result returned because the deadline passed")
+    deadline_exceeded: Optional[str] = Field(
+        None, description="Stage the deadline passed in: queue, classify or summarize"
+    )
     
     class Config:
         json_schema_extra = {
@@ -0,0 +1,204 @@
+"""
+Compact storage of classification score distributions.
+
+Each analysis log stores its per-label scores as two packed arrays: int32 ids
+into the ``label_vocabulary`` table and float16 scores in the same order.
+Decoding is vectorized with NumPy: the blobs of many rows are concatenated
+and scattered into a dense (rows x labels) matrix in one pass, so analytic
+queries never parse rows one by one.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from auth.models import AnalysisLog, LabelVocabulary
+
+LABEL_ID_DTYPE = "<i4"
+SCORE_DTYPE = "<f2"
+MAX_LABEL_LENGTH = 100
+
+
+class LabelVocabularyCache:
+    """In-process cache of label -> label_vocabulary id."""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def ids_for(self, db: Session, labels: List[str]) -> List[int]:
+        """
+        Resolve vocabulary ids, inserting labels that are not known yet.
+
+        Args:
+            db: Database session
+            labels: Labels to resolve
+
+        Returns:
+            Ids in the same order as ``labels``
+        """
+        missing = [label for label in labels if label not in self._ids]
+        if missing:
+            found = db.query(LabelVocabulary).filter(LabelVocabulary.label.in_(missing)).all()
+            with self._lock:
+                self._ids.update({entry.label: entry.id for entry in found})
+
+            for label in missing:
+                if label in self._ids:
+                    continue
+                try:
+                    with db.begin_nested():
+                        entry = LabelVocabulary(label=label)
+                        db.add(entry)
+                        db.flush()
+                except IntegrityError:
+                    # Inserted concurrently by another worker
+                    entry = db.query(LabelVocabulary).filter(LabelVocabulary.label == label).one()
+                with self._lock:
+                    self._ids[label] = entry.id
+
+        return [self._ids[label] for label in labels]
+
+    def clear(self) -> None:
+        """Forget cached ids (e.g. after the database was recreated)."""
+        with self._lock:
+            self._ids.clear()
+
+
+label_vocabulary = LabelVocabularyCache()
+
+
+def pack_scores(label_ids: List[int], scores: List[float]) -> Tuple[bytes, bytes]:
+    """
+    Pack a score distribution.
+
+    Returns:
+        (label id blob, score blob)
+    """
+    import numpy as np
+
+    return (
+        np.asarray(label_ids, dtype=LABEL_ID_DTYPE).tobytes(),
+        np.asarray(scores, dtype=SCORE_DTYPE).tobytes(),
+    )
+
+
+def unpack_scores(label_ids_blob: bytes, scores_blob: bytes):
+    """
+    Unpack one row's score distribution.
+
+    Returns:
+        (int32 label id array, float32 score array)
+    """
+    import numpy as np
+
+    return (
+        np.frombuffer(label_ids_blob, dtype=LABEL_ID_DTYPE),
+        np.frombuffer(scores_blob, dtype=SCORE_DTYPE).astype(np.float32),
+    )
+
+
+def encode_log_scores(db: Session, scores: Optional[Dict[str, float]]) -> Dict[str, Optional[bytes]]:
+    """
+    Build the AnalysisLog column values for a score distribution.
+
+    Args:
+        db: Database session (used to resolve vocabulary ids)
+        scores: label -> probability, or None
+
+    Returns:
+        Keyword arguments for AnalysisLog (both None if nothing to store)
+    """
+    if not scores or any(len(label) > MAX_LABEL_LENGTH for label in scores):
+        return {"score_label_ids": None, "score_values": None}
+
+    labels = list(scores)
+    ids_blob, values_blob = pack_scores(label_vocabulary.ids_for(db, labels), [scores[label] for label in labels])
+    return {"score_label_ids": ids_blob, "score_values": values_blob}
+
+
+def decode_score_matrix(
+    label_id_blobs: List[Optional[bytes]],
+    score_blobs: List[Optional[bytes]],
+    label_ids: Optional[Iterable[int]] = None
+):
+    """
+    Decode many rows' packed scores into a dense matrix in one vectorized pass.
+
+    Args:
+        label_id_blobs: Per-row label id blobs (None for rows without scores)
+        score_blobs: Per-row score blobs aligned with ``label_id_blobs``
+        label_ids: Vocabulary ids to use as columns (default: all that occur)
+
+    Returns:
+        (sorted int32 column ids, float32 matrix of shape rows x columns with
+        NaN where a row did not score a label)
+    """
+    import numpy as np
+
+    id_blobs = [blob or b"" for blob in label_id_blobs]
+    value_blobs = [blob or b"" for blob in score_blobs]
+    itemsize = np.dtype(LABEL_ID_DTYPE).itemsize
+    lengths = np.fromiter((len(blob) // itemsize for blob in id_blobs), dtype=np.int64, count=len(id_blobs))
+
+    ids = np.frombuffer(b"".join(id_blobs), dtype=LABEL_ID_DTYPE)
+    values = np.frombuffer(b"".join(value_blobs), dtype=SCORE_DTYPE).astype(np.float32)
+    rows = np.repeat(np.arange(len(id_blobs)), lengths)
+
+    if label_ids is None:
+        columns = np.unique(ids)
+    else:
+        columns = np.unique(np.asarray(list(label_ids), dtype=np.int32))
+
+    matrix = np.full((len(id_blobs), len(columns)), np.nan, dtype=np.float32)
+    if len(columns) and len(ids):
+        positions = np.searchsorted(columns, ids)
+        clipped = np.minimum(positions, len(columns) - 1)
+        valid = columns[clipped] == ids
+        matrix[rows[valid], clipped[valid]] = values[valid]
+
+    return columns, matrix
+
+
+def load_score_matrix(
+    db: Session,
+    user_id: Optional[int] = None,
+    labels: Optional[List[str]] = None,
+    batch_size: int = 10000
+):
+    """
+    Load the score matrix for analysis logs without materializing ORM objects.
+
+    Args:
+        db: Database session
+        user_id: Restrict to one user's logs
+        labels: Restrict columns to these labels (default: all that occur)
+        batch_size: Rows fetched per round trip
+
+    Returns:
+        (int64 log id array, column label names, float32 matrix)
+    """
+    import numpy as np
+
+    query = db.query(AnalysisLog.id, AnalysisLog.score_label_ids, AnalysisLog.score_values).filter(
+        AnalysisLog.score_label_ids.isnot(None)
+    )
+    if user_id is not None:
+        query = query.filter(AnalysisLog.user_id == user_id)
+
+    log_ids, id_blobs, value_blobs = [], [], []
+    for log_id, ids_blob, values_blob in query.order_by(AnalysisLog.id).yield_per(batch_size):
+        log_ids.append(log_id)
+        id_blobs.append(ids_blob)
+        value_blobs.append(values_blob)
+
+    column_filter = None
+    if labels is not None:
+        column_filter = [
+            entry.id for entry in db.query(LabelVocabulary).filter(LabelVocabulary.label.in_(labels))
+        ]
+
+    columns, matrix = decode_score_matrix(id_blobs, value_blobs, column_filter)
+    names = dict(
+        db.query(LabelVocabulary.id, LabelVocabulary.label).filter(LabelVocabulary.id.in_(columns.tolist()))
+    )
+    return np.asarray(log_ids, dtype=np.int64), [names[int(i)] for i in columns], matrix
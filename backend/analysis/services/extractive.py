@@ -0,0 +1,177 @@
+"""
+Local extractive summarization and keyword tone detection.
+
+A CPU-only alternative to Gemini with the same ``summary``/``tone`` output.
+Sentences are ranked with LexRank: TF-IDF sentence vectors (NumPy), a cosine
+similarity graph thresholded at ``SIMILARITY_THRESHOLD``, and PageRank-style
+power iteration. The top sentences are returned in their original order.
+A typical article takes a few milliseconds; no network calls are made.
+"""
+import re
+from typing import Dict, List, Optional
+from loguru import logger
+
+MODEL_NAME = "local-lexrank"
+
+SIMILARITY_THRESHOLD = 0.1
+DAMPING = 0.85
+MAX_ITERATIONS = 100
+TOLERANCE = 1e-6
+# Longer texts are ranked over their leading sentences only
+MAX_SENTENCES = 400
+SUMMARY_SENTENCES = 3
+SUMMARY_MAX_WORDS = 150
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])["\')\]]*\s+|\n\s*\n')
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these they this those
+through to too under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves also said says may might must shall
+""".split())
+
+POSITIVE_KEYWORDS = ['good', 'great', 'excellent', 'positive', 'success', 'improve', 'benefit',
+                     'optimistic', 'growth', 'strong', 'high', 'gains', 'profit']
+NEGATIVE_KEYWORDS = ['bad', 'poor', 'negative', 'fail', 'problem', 'issue', 'concern',
+                     'decline', 'loss', 'weak', 'crisis', 'risk']
+
+
+def detect_tone(text: str) -> str:
+    """
+    Keyword-based tone detection.
+
+    Args:
+        text: Text to analyze
+
+    Returns:
+        Detected tone: positive, neutral, or negative
+    """
+    text_lower = text.lower()
+
+    positive_count = sum(1 for word in POSITIVE_KEYWORDS if word in text_lower)
+    negative_count = sum(1 for word in NEGATIVE_KEYWORDS if word in text_lower)
+
+    if positive_count > negative_count:
+        return "positive"
+    elif negative_count > positive_count:
+        return "negative"
+    else:
+        return "neutral"
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences on terminal punctuation and blank lines."""
+    sentences = (" ".join(part.split()) for part in _SENTENCE_RE.split(text))
+    return [sentence for sentence in sentences if sentence]
+
+
+def lexrank_scores(sentences: List[str]):
+    """
+    Centrality score of each sentence.
+
+    Args:
+        sentences: Sentences to rank
+
+    Returns:
+        float64 array of scores summing to 1 (aligned with ``sentences``)
+    """
+    import numpy as np
+
+    count = len(sentences)
+    vocab: Dict[str, int] = {}
+    rows: List[int] = []
+    columns: List[int] = []
+    for row, sentence in enumerate(sentences):
+        for word in _WORD_RE.findall(sentence.lower()):
+            if word not in STOPWORDS:
+                rows.append(row)
+                columns.append(vocab.setdefault(word, len(vocab)))
+
+    if not vocab:
+        return np.full(count, 1.0 / count)
+
+    # Term counts per sentence in one bincount over flattened indices
+    flat = np.asarray(rows, dtype=np.int64) * len(vocab) + np.asarray(columns, dtype=np.int64)
+    tf = np.bincount(flat, minlength=count * len(vocab)).reshape(count, len(vocab)).astype(np.float32)
+
+    document_frequency = np.count_nonzero(tf, axis=0)
+    idf = np.log(count / document_frequency, dtype=np.float32) + 1.0
+    vectors = tf * idf
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.where(norms == 0, 1.0, norms)
+
+    adjacency = (vectors @ vectors.T >= SIMILARITY_THRESHOLD).astype(np.float64)
+    np.fill_diagonal(adjacency, 1.0)
+    transition = adjacency / adjacency.sum(axis=1, keepdims=True)
+
+    scores = np.full(count, 1.0 / count)
+    teleport = (1.0 - DAMPING) / count
+    for _ in range(MAX_ITERATIONS):
+        updated = teleport + DAMPING * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < TOLERANCE:
+            scores = updated
+            break
+        scores = updated
+    return scores
+
+
+def summarize(text: str, sentence_count: int = SUMMARY_SENTENCES, max_words: int = SUMMARY_MAX_WORDS) -> str:
+    """
+    Extractive summary of a text.
+
+    Args:
+        text: Text to summarize
+        sentence_count: Sentences to keep
+        max_words: Word limit for the summary
+
+    Returns:
+        The most central sentences in their original order
+    """
+    import numpy as np
+
+    sentences = split_sentences(text)[:MAX_SENTENCES]
+    if len(sentences) > sentence_count:
+        scores = lexrank_scores(sentences)
+        # Stable sort keeps earlier sentences first on ties
+        top = np.argsort(-scores, kind="stable")[:sentence_count]
+        sentences = [sentences[i] for i in sorted(top)]
+
+    words = " ".join(sentences).split()
+    if len(words) > max_words:
+        return " ".join(words[:max_words]) + "..."
+    return " ".join(words)
+
+
+class ExtractiveService:
+    """Local summary and tone analysis with the GeminiService interface."""
+
+    model_name = MODEL_NAME
+
+    async def analyze(self, text: str, category: str, latency_class: Optional[str] = None) -> Dict[str, str]:
+        """
+        Summarize text and detect its tone locally.
+
+        Args:
+            text: Text to analyze
+            category: Predicted category (unused; kept for interface parity)
+            latency_class: Ignored; local analysis is always fast
+
+        Returns:
+            Dictionary with 'summary', 'tone' and 'model' keys
+        """
+        result = {
+            "summary": summarize(text),
+            "tone": detect_tone(text),
+            "model": MODEL_NAME,
+        }
+        logger.info(f"Local analysis complete: tone={result['tone']}")
+        return result
+
+
+# Singleton instance
+extractive_service = ExtractiveService()
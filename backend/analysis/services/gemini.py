@@ -5,31 +5,123 @@ Uses prompt engineering to generate structured responses.
 NOTE: Currently using mock implementation due to Gemini API model access issues.
 The real implementation is ready and can be activated once API access is resolved.
 """
-import google.generativeai as genai
-from typing import Dict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from loguru import logger
+import metrics
 from config import get_settings
+from analysis.batching import MicroBatcher
+from analysis.services.model_router import DEFAULT_LATENCY_CLASS, ModelRouter
+from analysis.services.extractive import detect_tone
+import asyncio
 import re
+import time
 
 settings = get_settings()
 
-# Configure Gemini API
-genai.configure(api_key=settings.gemini_api_key)
-
 # Mock mode flag - set to False when Gemini API access is resolved
 # NOTE: Using production model
 USE_MOCK = False
 
+_genai_configured = False
+
+# Rough token estimate for packing (no tokenizer call per text)
+CHARS_PER_TOKEN = 4
+# Estimated tokens of the packed prompt's instructions
+PACK_PROMPT_TOKENS = 200
+# Estimated tokens per packed document besides its text: delimiter and
+# category line, plus room for its summary and tone in the response
+PACK_DOCUMENT_TOKENS = 30 + 250
+
+_PACKED_SECTION_RE = re.compile(r'^\s*#{2,}\s*DOCUMENT\s+(\d+)\b.*$', re.IGNORECASE | re.MULTILINE)
+
+
+def _load_genai():
+    """
+    Import and configure the Gemini SDK on first use.
+    
+    google.generativeai is the most expensive import in the app, so it is
+    kept off the cold-start path until a request actually needs Gemini.
+    """
+    global _genai_configured
+    import google.generativeai as genai
+    
+    if not _genai_configured:
+        configure_kwargs = {"api_key": settings.gemini_api_key}
+        if settings.gemini_transport:
+            configure_kwargs["transport"] = settings.gemini_transport
+        if settings.gemini_api_endpoint:
+            configure_kwargs["client_options"] = {"api_endpoint": settings.gemini_api_endpoint}
+        genai.configure(**configure_kwargs)
+        _genai_configured = True
+    
+    return genai
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def pack_documents(token_counts: Sequence[int], token_budget: int, max_documents: int) -> List[List[int]]:
+    """
+    Group documents into packs that fit one prompt.
+
+    Documents are packed in order; a pack is closed when the next document
+    would push its estimate (instructions, texts and expected output) over
+    ``token_budget`` or when it holds ``max_documents``. A document that
+    does not fit even alone gets a pack of its own.
+
+    Args:
+        token_counts: Estimated tokens of each document's text
+        token_budget: Largest estimated size of one packed call
+        max_documents: Most documents in one pack
+
+    Returns:
+        Lists of document indexes, one per pack
+    """
+    packs: List[List[int]] = []
+    current: List[int] = []
+    used = PACK_PROMPT_TOKENS
+    for index, tokens in enumerate(token_counts):
+        cost = tokens + PACK_DOCUMENT_TOKENS
+        if current and (used + cost > token_budget or len(current) >= max_documents):
+            packs.append(current)
+            current, used = [], PACK_PROMPT_TOKENS
+        current.append(index)
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
 
 class GeminiService:
     """Service for Gemini API text analysis."""
     
-    def __init__(self):
-        if not USE_MOCK:
-            model_name = 'gemini-2.5-flash'
-            logger.info(f"Initializing Gemini Service with model: {model_name}")
-            self.model = genai.GenerativeModel(model_name)
+    def __init__(self, router: Optional[ModelRouter] = None):
+        self.router = router or ModelRouter.from_settings(settings)
+        self.model_name = self.router.version()
         self.timeout = settings.gemini_timeout
+        self._models = {}
+        self.packed_calls = 0
+        self.packed_documents = 0
+        self.pack_parse_fallbacks = 0
+        # Concurrent packed requests (bulk uploads) are collected into packs
+        self.packer = MicroBatcher(
+            self._send_packs,
+            window=settings.gemini_pack_window_ms / 1000,
+            max_size=settings.gemini_pack_max_documents
+        )
+        metrics.register("gemini_models", self.router.stats)
+        metrics.register("gemini_packing", self.packing_stats)
+    
+    def get_model(self, model_name: str):
+        """Gemini GenerativeModel for ``model_name``, built on first use."""
+        model = self._models.get(model_name)
+        if model is None:
+            genai = _load_genai()
+            logger.info(f"Initializing Gemini model: {model_name}")
+            model = self._models[model_name] = genai.GenerativeModel(model_name)
+        return model
     
     def _build_prompt(self, text: str, category: str) -> str:
         """
@@ -59,16 +151,50 @@ Be precise and follow the format exactly."""
         
         return prompt
     
-    async def analyze(self, text: str, category: str) -> Dict[str, str]:
+    def _build_packed_prompt(self, documents: Sequence[Tuple[str, str]]) -> str:
+        """
+        Build one prompt analyzing several documents.
+        
+        Args:
+            documents: (text, category) pairs
+            
+        Returns:
+            Prompt asking for a numbered SUMMARY/TONE block per document
+        """
+        sections = "\n\n".join(
+            f'=== DOCUMENT {number} (categorized as "{category}") ===\n{text}'
+            for number, (text, category) in enumerate(documents, start=1)
+        )
+        return f"""You are an expert text analyst. Analyze each of the {len(documents)} documents below independently.
+
+For every document:
+1. Provide a concise summary (2-3 sentences, max 150 words)
+2. Detect the overall tone: positive, neutral, or negative
+
+{sections}
+
+Respond with one block per document, in order, in this exact format:
+### DOCUMENT [number]
+SUMMARY: [your summary here]
+TONE: [positive/neutral/negative]
+
+Write a block for every document from 1 to {len(documents)} and nothing else."""
+    
+    async def analyze(self, text: str, category: str, latency_class: Optional[str] = None) -> Dict[str, str]:
         """
         Generate summary and detect tone using Gemini API.
         
+        The model is chosen per request by the router from the input length,
+        the latency class and the models' observed latency.
+        
         Args:
             text: Text to analyze
             category: Predicted category from classification
+            latency_class: fast, standard (default) or quality
             
         Returns:
-            Dictionary with 'summary' and 'tone' keys
+            Dictionary with 'summary', 'tone' and 'model' (the model that
+            served the request) keys
             
         Raises:
             Exception: If API call fails or response is malformed
@@ -76,13 +202,15 @@ Be precise and follow the format exactly."""
         if USE_MOCK:
             return self._mock_analyze(text, category)
         
+        tier = self.router.route(len(text), latency_class)
+        started = time.perf_counter()
         try:
-            logger.info(f"Calling Gemini API for analysis")
+            logger.info(f"Calling Gemini API for analysis (model: {tier.model})")
             
             prompt = self._build_prompt(text, category)
             
-            # Generate content
-            response = self.model.generate_content(prompt)
+            # Generate content (the SDK call blocks, so keep it off the event loop)
+            response = await asyncio.to_thread(self.get_model(tier.model).generate_content, prompt)
             
             if not response or not response.text:
                 raise Exception("Empty response from Gemini API")
@@ -90,25 +218,12 @@ Be precise and follow the format exactly."""
             result_text = response.text.strip()
             logger.debug(f"Gemini response: {result_text}")
             
-            # Parse response
-            summary_match = re.search(r'SUMMARY:\s*(.+?)(?=TONE:|$)', result_text, re.DOTALL | re.IGNORECASE)
-            tone_match = re.search(r'TONE:\s*(positive|neutral|negative)', result_text, re.IGNORECASE)
-            
-            if not summary_match or not tone_match:
-                logger.warning("Failed to parse Gemini response, using fallback")
-                # Fallback: use entire response as summary and detect tone from keywords
-                summary = result_text[:500]
-                tone = self._detect_tone_fallback(result_text)
-            else:
-                summary = summary_match.group(1).strip()
-                tone = tone_match.group(1).lower()
+            result = self._parse_response(result_text)
+            result["model"] = tier.model
             
-            logger.info(f"Analysis complete: tone={tone}")
+            logger.info(f"Analysis complete: tone={result['tone']}")
             
-            return {
-                "summary": summary,
-                "tone": tone
-            }
+            return result
             
         except Exception as e:
             logger.error(f"Gemini API error: {str(e)}")
@@ -118,6 +233,206 @@ Be precise and follow the format exactly."""
                 raise Exception("Invalid Gemini API key")
             
             raise Exception(f"Gemini API error: {str(e)}")
+        finally:
+            self.router.observe(tier.model, time.perf_counter() - started)
+    
+    async def analyze_packed(self, text: str, category: str, latency_class: Optional[str] = None) -> Dict[str, str]:
+        """
+        Like ``analyze``, but the call may be packed with concurrent ones.
+        
+        Requests arriving within GEMINI_PACK_WINDOW_MS of each other with
+        the same latency class are analyzed by ``analyze_many``. Intended
+        for bulk workloads, where throughput matters more than latency.
+        
+        Args:
+            text: Text to analyze
+            category: Predicted category from classification
+            latency_class: fast, standard (default) or quality
+            
+        Returns:
+            Dictionary with 'summary', 'tone' and 'model' keys
+            
+        Raises:
+            Exception: If API call fails or response is malformed
+        """
+        if not settings.gemini_packing_enabled or not self.packer.enabled:
+            return await self.analyze(text, category, latency_class=latency_class)
+        return await self.packer.submit(latency_class or DEFAULT_LATENCY_CLASS, (text, category))
+    
+    async def _send_packs(self, latency_class: str, documents: List[Tuple[str, str]]) -> List[Any]:
+        """Packer callback: analyze the collected documents together."""
+        return await self.analyze_many(documents, latency_class=latency_class)
+    
+    async def analyze_many(
+        self,
+        documents: Sequence[Tuple[str, str]],
+        latency_class: Optional[str] = None
+    ) -> List[Any]:
+        """
+        Analyze several documents with as few Gemini calls as possible.
+        
+        Documents routed to the same model and no longer than
+        GEMINI_PACK_MAX_CHARS are packed into shared prompts within
+        GEMINI_PACK_TOKEN_BUDGET; the others get a call each. A document
+        whose block is missing or malformed in a packed response is
+        analyzed again on its own.
+        
+        Args:
+            documents: (text, category) pairs
+            latency_class: fast, standard (default) or quality
+            
+        Returns:
+            One result (as returned by ``analyze``) or Exception per
+            document, in order
+        """
+        results: List[Any] = [None] * len(documents)
+        
+        async def single(index: int) -> None:
+            text, category = documents[index]
+            try:
+                results[index] = await self.analyze(text, category, latency_class=latency_class)
+            except Exception as e:
+                results[index] = e
+        
+        if USE_MOCK:
+            await asyncio.gather(*(single(index) for index in range(len(documents))))
+            return results
+        
+        by_model: Dict[str, List[int]] = {}
+        alone: List[int] = []
+        for index, (text, _) in enumerate(documents):
+            if len(text) > settings.gemini_pack_max_chars:
+                alone.append(index)
+            else:
+                by_model.setdefault(self.router.route(len(text), latency_class).model, []).append(index)
+        
+        async def packed(model_name: str, members: List[int]) -> None:
+            try:
+                parsed = await self._analyze_pack(model_name, [documents[index] for index in members])
+            except Exception as e:
+                for index in members:
+                    results[index] = e
+                return
+            retries = []
+            for index, result in zip(members, parsed):
+                if result is None:
+                    retries.append(single(index))
+                else:
+                    results[index] = result
+            if retries:
+                self.pack_parse_fallbacks += len(retries)
+                logger.warning(f"{len(retries)} of {len(members)} packed results unparseable, analyzing them separately")
+                await asyncio.gather(*retries)
+        
+        calls = [single(index) for index in alone]
+        for model_name, indexes in by_model.items():
+            packs = pack_documents(
+                [estimate_tokens(documents[index][0]) for index in indexes],
+                settings.gemini_pack_token_budget,
+                settings.gemini_pack_max_documents
+            )
+            for pack in packs:
+                members = [indexes[position] for position in pack]
+                calls.append(single(members[0]) if len(members) == 1 else packed(model_name, members))
+        
+        await asyncio.gather(*calls)
+        return results
+    
+    async def _analyze_pack(self, model_name: str, documents: Sequence[Tuple[str, str]]) -> List[Optional[Dict[str, str]]]:
+        """
+        Analyze several documents in one call to ``model_name``.
+        
+        Packed calls are not reported to the router: their latency covers
+        several documents and would make the model look slow.
+        
+        Returns:
+            Result per document, or None where the response could not be parsed
+            
+        Raises:
+            Exception: If the API call fails
+        """
+        logger.info(f"Calling Gemini API for {len(documents)} packed documents (model: {model_name})")
+        self.packed_calls += 1
+        self.packed_documents += len(documents)
+        try:
+            prompt = self._build_packed_prompt(documents)
+            response = await asyncio.to_thread(self.get_model(model_name).generate_content, prompt)
+            if not response or not response.text:
+                raise Exception("Empty response from Gemini API")
+            parsed = self._parse_packed_response(response.text.strip(), len(documents))
+        except Exception as e:
+            logger.error(f"Gemini API error: {str(e)}")
+            if "API_KEY" in str(e).upper():
+                raise Exception("Invalid Gemini API key")
+            raise Exception(f"Gemini API error: {str(e)}")
+        
+        return [{**result, "model": model_name} if result is not None else None for result in parsed]
+    
+    def _parse_packed_response(self, result_text: str, count: int) -> List[Optional[Dict[str, str]]]:
+        """
+        Split a packed response into per-document results.
+        
+        Args:
+            result_text: Stripped response text from Gemini
+            count: Documents in the pack
+            
+        Returns:
+            'summary'/'tone' per document, or None where its block is
+            missing or incomplete (unlike ``_parse_response``, there is no
+            lenient fallback: another document's text must not leak in)
+        """
+        results: List[Optional[Dict[str, str]]] = [None] * count
+        headers = list(_PACKED_SECTION_RE.finditer(result_text))
+        for position, header in enumerate(headers):
+            number = int(header.group(1))
+            if not 1 <= number <= count or results[number - 1] is not None:
+                continue
+            end = headers[position + 1].start() if position + 1 < len(headers) else len(result_text)
+            block = result_text[header.end():end]
+            summary_match = re.search(r'SUMMARY:\s*(.+?)(?=TONE:|$)', block, re.DOTALL | re.IGNORECASE)
+            tone_match = re.search(r'TONE:\s*(positive|neutral|negative)', block, re.IGNORECASE)
+            if summary_match and tone_match and summary_match.group(1).strip():
+                results[number - 1] = {
+                    "summary": summary_match.group(1).strip(),
+                    "tone": tone_match.group(1).lower()
+                }
+        return results
+    
+    def packing_stats(self) -> dict:
+        """Packed call counters for the metrics endpoint."""
+        return {
+            "enabled": settings.gemini_packing_enabled,
+            "calls": self.packed_calls,
+            "documents": self.packed_documents,
+            "parse_fallbacks": self.pack_parse_fallbacks,
+            "collector": self.packer.stats(),
+        }
+    
+    def _parse_response(self, result_text: str) -> Dict[str, str]:
+        """
+        Parse a SUMMARY/TONE formatted Gemini response.
+        
+        Args:
+            result_text: Stripped response text from Gemini
+            
+        Returns:
+            Dictionary with 'summary' and 'tone' keys
+        """
+        summary_match = re.search(r'SUMMARY:\s*(.+?)(?=TONE:|$)', result_text, re.DOTALL | re.IGNORECASE)
+        tone_match = re.search(r'TONE:\s*(positive|neutral|negative)', result_text, re.IGNORECASE)
+        
+        if not summary_match or not tone_match:
+            logger.warning("Failed to parse Gemini response, using fallback")
+            # Fallback: use entire response as summary and detect tone from keywords
+            return {
+                "summary": result_text[:500],
+                "tone": self._detect_tone_fallback(result_text)
+            }
+        
+        return {
+            "summary": summary_match.group(1).strip(),
+            "tone": tone_match.group(1).lower()
+        }
     
     def _mock_analyze(self, text: str, category: str) -> Dict[str, str]:
         """
@@ -146,7 +461,8 @@ Be precise and follow the format exactly."""
         
         return {
             "summary": summary,
-            "tone": tone
+            "tone": tone,
+            "model": "mock"
         }
     
     def _detect_tone_fallback(self, text: str) -> str:
@@ -159,22 +475,7 @@ Be precise and follow the format exactly."""
         Returns:
             Detected tone: positive, neutral, or negative
         """
-        text_lower = text.lower()
-        
-        positive_keywords = ['good', 'great', 'excellent', 'positive', 'success', 'improve', 'benefit', 
-                           'optimistic', 'growth', 'strong', 'high', 'gains', 'profit']
-        negative_keywords = ['bad', 'poor', 'negative', 'fail', 'problem', 'issue', 'concern',
-                           'decline', 'loss', 'weak', 'crisis', 'risk']
-        
-        positive_count = sum(1 for word in positive_keywords if word in text_lower)
-        negative_count = sum(1 for word in negative_keywords if word in text_lower)
-        
-        if positive_count > negative_count:
-            return "positive"
-        elif negative_count > positive_count:
-            return "negative"
-        else:
-            return "neutral"
+        return detect_tone(text)
 
 
 # Singleton instance
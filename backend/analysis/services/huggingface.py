@@ -3,12 +3,21 @@ Hugging Face Zero-Shot Classification service.
 Integrates with facebook/bart-large-mnli model via Inference API.
 """
 import httpx
-from typing import Dict, List, Optional
+import time
+from typing import Any, Dict, List, Optional, Tuple
 from loguru import logger
+import metrics
 from config import get_settings
+from analysis.batching import MicroBatcher
+from analysis.cache import get_analysis_cache
+from analysis.label_scores import LabelScoreStore, distribution, merge_scores
 
 settings = get_settings()
 
+# Small request used to load the model and keep it loaded
+WARMUP_TEXT = "The new smartphone features a faster processor and a longer battery life."
+WARMUP_LABELS = ["technology", "sports"]
+
 
 class HuggingFaceService:
     """Service for Hugging Face zero-shot classification."""
@@ -19,17 +28,156 @@ class HuggingFaceService:
             "Authorization": f"Bearer {settings.huggingface_api_token}"
         }
         self.timeout = settings.huggingface_timeout
+        self._label_scores = None
+        # Outcome of the most recent upstream calls (wall-clock seconds)
+        self.last_success: Optional[float] = None
+        self.last_failure: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_failure_loading = False
+        # Concurrent classifications with the same labels share one request
+        self.batcher = MicroBatcher(
+            self._send_batch,
+            window=settings.huggingface_batch_window_ms / 1000,
+            max_size=settings.huggingface_batch_max_size
+        )
+    
+    @property
+    def label_scores(self) -> LabelScoreStore:
+        """Per-text label score store, opened on first use."""
+        if self._label_scores is None:
+            self._label_scores = LabelScoreStore(get_analysis_cache(), settings.huggingface_model)
+        return self._label_scores
     
     async def classify(self, text: str, candidate_labels: List[str]) -> Dict[str, any]:
         """
         Classify text using zero-shot classification.
         
+        Per-label scores from earlier calls for the same text are reused:
+        only labels that were never scored for this text are sent upstream
+        (plus one already-scored anchor label to align the scales), and a
+        request whose labels were all scored before makes no API call.
+        
         Args:
             text: Text to classify
             candidate_labels: List of possible categories
             
         Returns:
-            Dictionary with 'category' and 'score' keys
+            Dictionary with 'category', 'score' and 'scores' (probability
+            of every candidate label)
+            
+        Raises:
+            Exception: If API call fails or returns invalid response
+        """
+        labels = list(dict.fromkeys(candidate_labels))
+        known = await self.label_scores.aget(text)
+        missing = [label for label in labels if label not in known]
+        
+        if missing:
+            anchor = max(known, key=known.get) if known else None
+            request_labels = missing + [anchor] if anchor else missing
+            if known:
+                logger.info(f"Reusing {len(labels) - len(missing)} stored label scores, requesting {len(missing)}")
+            
+            result = await self._classify_upstream(text, request_labels)
+            
+            if "labels" not in result or "scores" not in result:
+                category = result["label"]
+                score = result["score"]
+                logger.info(f"Classification result: {category} (score: {score:.3f})")
+                return {"category": category, "score": float(score)}
+            
+            upstream = {label: float(score) for label, score in zip(result["labels"], result["scores"])}
+            known = merge_scores(known, upstream, anchor)
+            await self.label_scores.aset(text, known)
+        else:
+            logger.info("Classification served from stored label scores")
+        
+        scores = distribution(known, labels)
+        category = max(labels, key=scores.get)
+        
+        logger.info(f"Classification result: {category} (score: {scores[category]:.3f})")
+        
+        return {
+            "category": category,
+            "score": scores[category],
+            "scores": scores
+        }
+    
+    def seconds_since_success(self) -> Optional[float]:
+        """Seconds since the last successful upstream call, or None if there was none."""
+        if self.last_success is None:
+            return None
+        return time.time() - self.last_success
+    
+    def warmth(self, warm_window: float) -> Dict[str, any]:
+        """
+        Upstream model state from recent calls (makes no request).
+        
+        Args:
+            warm_window: Seconds a successful call keeps the model counted as warm
+            
+        Returns:
+            Dictionary with 'state' (warm, cold, loading, failing or unknown),
+            'seconds_since_success' and 'last_error'
+        """
+        since = self.seconds_since_success()
+        failed_last = self.last_failure is not None and (
+            self.last_success is None or self.last_failure > self.last_success
+        )
+        if failed_last:
+            state = "loading" if self.last_failure_loading else "failing"
+        elif since is None:
+            state = "unknown"
+        elif since <= warm_window:
+            state = "warm"
+        else:
+            state = "cold"
+        
+        return {
+            "state": state,
+            "seconds_since_success": round(since, 1) if since is not None else None,
+            "last_error": self.last_error if failed_last else None,
+        }
+    
+    async def warm_up(self) -> None:
+        """
+        Send a small classification that waits for the model to load.
+        
+        Raises:
+            Exception: If the model could not be reached or loaded
+        """
+        await self._request(WARMUP_TEXT, WARMUP_LABELS, wait_for_model=True)
+    
+    def _record_failure(self, error: str, loading: bool = False) -> None:
+        """Remember a failed upstream call for warmth reporting."""
+        self.last_failure = time.time()
+        self.last_error = error
+        self.last_failure_loading = loading
+    
+    async def _classify_upstream(self, text: str, candidate_labels: List[str]) -> Dict[str, any]:
+        """Score one text upstream, through the micro-batcher when it is enabled."""
+        if self.batcher.enabled:
+            return await self.batcher.submit(tuple(candidate_labels), text)
+        return await self._request(text, candidate_labels)
+    
+    async def _send_batch(self, labels: Tuple[str, ...], texts: List[str]) -> List[Any]:
+        """Batcher callback: one request for all texts (a lone text is sent as before)."""
+        if len(texts) == 1:
+            return [await self._request(texts[0], list(labels))]
+        return await self._request_batch(texts, list(labels))
+    
+    async def _request(self, text: str, candidate_labels: List[str], wait_for_model: bool = False) -> Dict[str, any]:
+        """
+        Call the zero-shot classification endpoint.
+        
+        Args:
+            text: Text to classify
+            candidate_labels: Labels to score
+            wait_for_model: Block until a cold model has loaded instead of
+                failing with 503
+            
+        Returns:
+            Parsed response with 'labels'/'scores' (or 'label'/'score')
             
         Raises:
             Exception: If API call fails or returns invalid response
@@ -40,10 +188,63 @@ class HuggingFaceService:
                 "candidate_labels": candidate_labels
             }
         }
+        if wait_for_model:
+            payload["options"] = {"wait_for_model": True}
+        
+        result = await self._post(payload)
+        
+        # Handle different response formats
+        if isinstance(result, list):
+            result = result[0]
+        
+        if not _valid_result(result):
+            raise Exception(f"Invalid response format from Hugging Face API: {result}")
         
+        self.last_success = time.time()
+        return result
+    
+    async def _request_batch(self, texts: List[str], candidate_labels: List[str]) -> List[Any]:
+        """
+        Classify several texts against the same labels in one call.
+        
+        Args:
+            texts: Texts to classify
+            candidate_labels: Labels to score
+            
+        Returns:
+            One parsed result per text, or an Exception for a text whose
+            result is malformed
+            
+        Raises:
+            Exception: If the API call fails or does not return one result per text
+        """
+        result = await self._post({
+            "inputs": texts,
+            "parameters": {
+                "candidate_labels": candidate_labels
+            }
+        })
+        
+        if not isinstance(result, list) or len(result) != len(texts):
+            raise Exception(f"Expected {len(texts)} results from Hugging Face API, got: {str(result)[:200]}")
+        
+        self.last_success = time.time()
+        return [
+            item if _valid_result(item) else Exception(f"Invalid response format from Hugging Face API: {item}")
+            for item in result
+        ]
+    
+    async def _post(self, payload: Dict[str, any]) -> Any:
+        """
+        Send a payload to the endpoint and return the decoded JSON body.
+        
+        Raises:
+            Exception: If the call fails or returns an error status
+        """
         try:
             async with httpx.AsyncClient() as client:
-                logger.info(f"Calling Hugging Face API for classification")
+                batch_size = len(payload["inputs"]) if isinstance(payload["inputs"], list) else 1
+                logger.info(f"Calling Hugging Face API for classification ({batch_size} text(s))")
                 logger.info(f"API URL: {self.api_url}")
                 logger.info(f"Token: {self.headers['Authorization'][:15]}...")
                 
@@ -56,45 +257,30 @@ class HuggingFaceService:
                 
                 # Check for errors
                 if response.status_code == 503:
+                    self._record_failure("model loading", loading=True)
                     raise Exception("Hugging Face model is loading. Please try again in a few moments.")
                 
                 if response.status_code == 401:
+                    self._record_failure("invalid token")
                     raise Exception("Invalid Hugging Face API token")
                 
                 if response.status_code != 200:
+                    self._record_failure(f"HTTP {response.status_code}")
                     logger.error(f"HF API error: {response.status_code} - {response.text}")
                     raise Exception(f"Hugging Face API error: {response.status_code} at {self.api_url}")
                 
                 result = response.json()
                 logger.info(f"HF API Response: {result}")
-                
-                # Handle different response formats
-                if isinstance(result, list):
-                    result = result[0]
-                
-                # Extract top prediction
-                if "labels" in result and "scores" in result:
-                    category = result["labels"][0]
-                    score = result["scores"][0]
-                elif "label" in result and "score" in result:
-                    category = result["label"]
-                    score = result["score"]
-                else:
-                    raise Exception(f"Invalid response format from Hugging Face API: {result}")
-                
-                logger.info(f"Classification result: {category} (score: {score:.3f})")
-                
-                return {
-                    "category": category,
-                    "score": float(score)
-                }
+                return result
                 
         except httpx.TimeoutException:
             logger.error("Hugging Face API timeout")
+            self._record_failure("timeout")
             raise Exception("Hugging Face API request timed out")
         
         except httpx.RequestError as e:
             logger.error(f"Hugging Face API request error: {str(e)}")
+            self._record_failure("network error")
             raise Exception(f"Network error connecting to Hugging Face: {str(e)}")
         
         except Exception as e:
@@ -102,5 +288,13 @@ class HuggingFaceService:
             raise
 
 
+def _valid_result(result: Any) -> bool:
+    """Whether a response item has 'labels'/'scores' or 'label'/'score'."""
+    return isinstance(result, dict) and (
+        ("labels" in result and "scores" in result) or ("label" in result and "score" in result)
+    )
+
+
 # Singleton instance
 huggingface_service = HuggingFaceService()
+metrics.register("huggingface_batching", huggingface_service.batcher.stats)
@@ -0,0 +1,168 @@
+"""
+Latency-aware routing of Gemini requests across model tiers.
+
+Tiers are ordered from cheapest/fastest to most capable; each serves inputs
+up to ``max_chars`` characters. A request goes to:
+
+1. the first tier that fits the input ("fast"/"standard" latency classes),
+   or the last tier that fits it ("quality");
+2. unless that model's observed latency exceeds the latency class budget,
+   in which case the first fitting tier within budget (or not measured yet)
+   is used, or the fitting tier with the lowest observed latency if all
+   are over budget.
+
+Observed latency is an exponentially weighted moving average per model,
+updated after every call (including failures, which usually mean timeouts).
+A model that is being routed around still gets every ``probe_every``-th
+request so its latency estimate can recover.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional
+import metrics
+
+LATENCY_CLASSES = ("fast", "standard", "quality")
+DEFAULT_LATENCY_CLASS = "standard"
+
+
+class ModelTier:
+    """
+    One routing tier.
+
+    Args:
+        name: Tier name used in logs and metrics
+        model: Gemini model name
+        max_chars: Longest input served by this tier (None = unlimited)
+    """
+
+    def __init__(self, name: str, model: str, max_chars: Optional[int] = None):
+        self.name = name
+        self.model = model
+        self.max_chars = max_chars
+
+    def fits(self, text_length: int) -> bool:
+        """Whether this tier serves inputs of ``text_length`` characters."""
+        return self.max_chars is None or text_length <= self.max_chars
+
+    def __repr__(self) -> str:
+        return f"ModelTier({self.name!r}, {self.model!r}, max_chars={self.max_chars})"
+
+
+class ModelRouter:
+    """
+    Chooses a Gemini model per request.
+
+    Args:
+        tiers: Tiers ordered from fastest to most capable
+        budgets: Latency class -> seconds; a model slower than the budget is
+            routed around (0 or missing = no budget)
+        smoothing: EWMA weight of the newest observation
+        probe_every: Requests a slow model is skipped before it is tried again
+    """
+
+    def __init__(
+        self,
+        tiers: Iterable[ModelTier],
+        budgets: Optional[Dict[str, float]] = None,
+        smoothing: float = 0.2,
+        probe_every: int = 20
+    ):
+        self.tiers: List[ModelTier] = list(tiers)
+        if not self.tiers:
+            raise ValueError("At least one model tier is required")
+        self.budgets = dict(budgets or {})
+        self.smoothing = smoothing
+        self.probe_every = probe_every
+        self._skipped: Dict[str, int] = {}
+        self._latency: Dict[str, float] = {}
+        self._histograms: Dict[str, metrics.Histogram] = {}
+        self._routed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings) -> "ModelRouter":
+        """Build a router from GEMINI_MODEL_TIERS and GEMINI_LATENCY_BUDGETS."""
+        tiers = [
+            ModelTier(tier.get("name", tier["model"]), tier["model"], tier.get("max_chars"))
+            for tier in settings.gemini_model_tiers
+        ]
+        return cls(tiers, settings.gemini_latency_budgets)
+
+    def version(self) -> str:
+        """Identifies the routing table (used in cache keys)."""
+        return ",".join(f"{tier.model}<={tier.max_chars or '*'}" for tier in self.tiers)
+
+    def observed_latency(self, model: str) -> Optional[float]:
+        """Smoothed latency of a model in seconds, or None if never called."""
+        return self._latency.get(model)
+
+    def route(self, text_length: int, latency_class: Optional[str] = None) -> ModelTier:
+        """
+        Pick the tier for a request.
+
+        Args:
+            text_length: Input length in characters
+            latency_class: fast, standard (default) or quality
+
+        Returns:
+            Selected tier
+
+        Raises:
+            ValueError: If the latency class is unknown
+        """
+        latency_class = latency_class or DEFAULT_LATENCY_CLASS
+        if latency_class not in LATENCY_CLASSES:
+            raise ValueError(f"Unknown latency class: {latency_class}")
+
+        fitting = [tier for tier in self.tiers if tier.fits(text_length)] or [self.tiers[-1]]
+        chosen = fitting[-1] if latency_class == "quality" else fitting[0]
+
+        budget = self.budgets.get(latency_class) or 0
+        observed = self._latency.get(chosen.model)
+        if budget and observed is not None and observed > budget and len(fitting) > 1 and not self._probe(chosen.model):
+            within_budget = [
+                tier for tier in fitting
+                if self._latency.get(tier.model) is None or self._latency[tier.model] <= budget
+            ]
+            if within_budget:
+                chosen = within_budget[0]
+            else:
+                chosen = min(fitting, key=lambda tier: self._latency[tier.model])
+
+        with self._lock:
+            self._routed[chosen.model] = self._routed.get(chosen.model, 0) + 1
+        return chosen
+
+    def _probe(self, model: str) -> bool:
+        """Count a skip of ``model``; True when it is due for a probe request."""
+        with self._lock:
+            skipped = self._skipped.get(model, 0) + 1
+            if skipped >= self.probe_every:
+                self._skipped[model] = 0
+                return True
+            self._skipped[model] = skipped
+            return False
+
+    def observe(self, model: str, seconds: float) -> None:
+        """Record the latency of one call to ``model``."""
+        with self._lock:
+            previous = self._latency.get(model)
+            self._latency[model] = seconds if previous is None else (
+                self.smoothing * seconds + (1 - self.smoothing) * previous
+            )
+            histogram = self._histograms.get(model)
+            if histogram is None:
+                histogram = self._histograms[model] = metrics.Histogram()
+        histogram.observe(seconds)
+
+    def stats(self) -> dict:
+        """Per-model routing counts and latencies for the metrics endpoint."""
+        return {
+            tier.model: {
+                "tier": tier.name,
+                "max_chars": tier.max_chars,
+                "routed": self._routed.get(tier.model, 0),
+                "ewma_seconds": round(self._latency[tier.model], 6) if tier.model in self._latency else None,
+                "latency_seconds": self._histograms[tier.model].snapshot() if tier.model in self._histograms else None,
+            }
+            for tier in self.tiers
+        }
@@ -0,0 +1,271 @@
+"""
+Interactive analysis sessions over a WebSocket (``/analyze/ws``).
+
+The client authenticates once per connection, either with the usual
+``Authorization: Bearer`` / ``X-API-Key`` handshake headers or, from a
+browser (which cannot set them), with a first message
+``{"type": "auth", "token": "..."}``. After ``{"type": "ready"}`` it may
+send any number of JSON messages; analyses run concurrently and every
+reply carries the request's ``id``. The credentials stay checked while the
+connection is open: when a JWT expires or an API key is revoked (or
+expires) the server sends an error and closes with 1008.
+
+Client messages:
+    ``{"type": "analyze", "id": "r1", "text": ..., "candidate_labels": ...,
+    "latency_class": ..., "deadline_ms": ...}`` (same fields as POST /analyze)
+    ``{"type": "cancel", "id": "r1"}``
+    ``{"type": "ping", "id": ...}``
+
+Server messages:
+    ``{"type": "stage", "id", "stage": "classify", "category", "score"}``
+    ``{"type": "stage", "id", "stage": "summarize", "summary", "tone", "model"}``
+    ``{"type": "result", "id", "result": {...}}`` (AnalyzeResponse)
+    ``{"type": "cancelled", "id"}``, ``{"type": "error", "id", "detail"}``,
+    ``{"type": "pong", "id"}``
+"""
+import asyncio
+import json
+import time
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+from fastapi import HTTPException, WebSocket, status
+from loguru import logger
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from auth.api_keys import is_api_key
+from auth.middleware import resolve_user
+from auth.models import User
+from auth.utils import decode_access_token
+from analysis.schemas import AnalyzeRequest, AnalyzeResponse
+
+MAX_REQUEST_ID_LENGTH = 128
+
+CREDENTIALS_LAPSED = "Credentials expired or revoked"
+
+RequestId = Union[str, int]
+
+
+def _handshake_token(websocket: WebSocket) -> Optional[str]:
+    """Credentials sent with the handshake, if any."""
+    api_key = websocket.headers.get("x-api-key")
+    if api_key:
+        return api_key
+    scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+    return credentials.strip() if scheme.lower() == "bearer" and credentials.strip() else None
+
+
+def token_expiry(token: str) -> Optional[float]:
+    """Expiry (epoch seconds) of a JWT access token; None for API keys, which are re-checked instead."""
+    if is_api_key(token):
+        return None
+    payload = decode_access_token(token) or {}
+    return float(payload["exp"]) if "exp" in payload else None
+
+
+async def authenticate_socket(
+    websocket: WebSocket, db: Session, timeout: float
+) -> Optional[Tuple[User, str]]:
+    """
+    Authenticate an accepted WebSocket from its handshake headers or first message.
+
+    On failure an error is sent and the socket is closed with 1008 (policy
+    violation).
+
+    Args:
+        websocket: Accepted connection
+        db: Database session
+        timeout: Seconds to wait for the auth message
+
+    Returns:
+        The authenticated user and the token it authenticated with, or
+        None if the connection was closed
+    """
+    token = _handshake_token(websocket)
+    try:
+        if token is None:
+            message = json.loads(await asyncio.wait_for(websocket.receive_text(), timeout))
+            if not isinstance(message, dict) or message.get("type") != "auth" or not message.get("token"):
+                raise ValueError("Expected an auth message")
+            token = str(message["token"])
+        return await resolve_user(token, db), token
+    except (asyncio.TimeoutError, ValueError, KeyError, HTTPException) as e:
+        detail = e.detail if isinstance(e, HTTPException) else "Authentication required"
+        await websocket.send_json({"type": "error", "id": None, "detail": detail})
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return None
+
+
+class AnalysisSession:
+    """
+    Multiplexes analysis requests over one authenticated WebSocket.
+
+    Replies are queued and written by a single task, so concurrent analyses
+    never interleave their sends. Once the credentials lapse (``expires_at``
+    passes or ``check_credentials`` fails) new analyses are rejected and
+    the socket is closed with 1008.
+
+    Args:
+        websocket: Authenticated connection
+        analyze: Orchestrator analyze coroutine function (bound to the user)
+        log: Writes the analysis log for a request and its result
+            (blocking; run in a worker thread)
+        max_inflight: Analyses running at once on this connection
+        expires_at: When the credentials expire (epoch seconds, e.g. the
+            JWT ``exp``), None if they do not
+        check_credentials: Whether the credentials are still valid
+            (blocking; run in a worker thread every ``recheck_interval``)
+        recheck_interval: Seconds between ``check_credentials`` calls
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        analyze: Callable[..., Awaitable[Dict[str, Any]]],
+        log: Callable[[AnalyzeRequest, Dict[str, Any]], Any],
+        max_inflight: int = 16,
+        expires_at: Optional[float] = None,
+        check_credentials: Optional[Callable[[], bool]] = None,
+        recheck_interval: float = 5.0
+    ):
+        self.websocket = websocket
+        self.analyze = analyze
+        self.log = log
+        self.max_inflight = max_inflight
+        self.expires_at = expires_at
+        self.check_credentials = check_credentials
+        self.recheck_interval = recheck_interval
+        self.lapsed = False
+        self.tasks: Dict[RequestId, asyncio.Task] = {}
+        self.outbox: asyncio.Queue = asyncio.Queue()
+
+    def _send(self, message: dict) -> None:
+        self.outbox.put_nowait(message)
+
+    def _error(self, request_id: Optional[RequestId], detail: str) -> None:
+        self._send({"type": "error", "id": request_id, "detail": detail})
+
+    async def _write(self) -> None:
+        while True:
+            message = await self.outbox.get()
+            if message is None:
+                await self.websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                return
+            await self.websocket.send_json(message)
+
+    def _expired(self) -> bool:
+        return self.lapsed or (self.expires_at is not None and time.time() >= self.expires_at)
+
+    async def _watch_credentials(self) -> None:
+        """Close the session once the credentials expire or stop being valid."""
+        while not self._expired():
+            delay = self.recheck_interval if self.check_credentials is not None else None
+            if self.expires_at is not None:
+                remaining = max(self.expires_at - time.time(), 0)
+                delay = remaining if delay is None else min(delay, remaining)
+            if delay is None:
+                return
+            await asyncio.sleep(delay)
+            if self.check_credentials is not None and not self._expired():
+                try:
+                    self.lapsed = not await asyncio.to_thread(self.check_credentials)
+                except Exception as e:
+                    logger.error(f"Session credential check failed: {str(e)}")
+        self.lapsed = True
+        for task in list(self.tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        self._error(None, CREDENTIALS_LAPSED)
+        self.outbox.put_nowait(None)
+
+    async def run(self) -> None:
+        """Serve messages until the client disconnects, then cancel what is still running."""
+        writer = asyncio.create_task(self._write())
+        watcher = asyncio.create_task(self._watch_credentials())
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("text") is None:
+                    self._error(None, "Messages must be JSON text")
+                    continue
+                self.handle(message["text"])
+        finally:
+            for task in list(self.tasks.values()):
+                task.cancel()
+            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+            watcher.cancel()
+            writer.cancel()
+            await asyncio.gather(watcher, writer, return_exceptions=True)
+
+    def handle(self, raw: str) -> None:
+        """Dispatch one client message."""
+        try:
+            message = json.loads(raw)
+            if not isinstance(message, dict):
+                raise ValueError("Expected a JSON object")
+        except ValueError:
+            self._error(None, "Invalid JSON message")
+            return
+
+        request_id = message.get("id")
+        kind = message.get("type")
+        if kind == "ping":
+            self._send({"type": "pong", "id": request_id})
+        elif kind == "analyze":
+            self._start(request_id, message)
+        elif kind == "cancel":
+            task = self.tasks.get(request_id) if isinstance(request_id, (str, int)) else None
+            if task is None:
+                self._error(request_id, "No analysis in flight with this id")
+            else:
+                task.cancel()
+        else:
+            self._error(request_id, f"Unknown message type: {kind}")
+
+    def _start(self, request_id: Any, message: dict) -> None:
+        if self._expired():
+            self._error(request_id, CREDENTIALS_LAPSED)
+            return
+        if isinstance(request_id, bool) or not isinstance(request_id, (str, int)) \
+                or len(str(request_id)) > MAX_REQUEST_ID_LENGTH:
+            self._error(None, f"Analyze messages need an id (string or integer, up to {MAX_REQUEST_ID_LENGTH} characters)")
+            return
+        if request_id in self.tasks:
+            self._error(request_id, "An analysis with this id is already in flight")
+            return
+        if len(self.tasks) >= self.max_inflight:
+            self._error(request_id, f"Too many analyses in flight (limit {self.max_inflight})")
+            return
+        fields = {name: value for name, value in message.items() if name not in ("type", "id")}
+        try:
+            request = AnalyzeRequest(**fields)
+        except ValidationError as e:
+            errors = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            self._error(request_id, errors)
+            return
+        self.tasks[request_id] = asyncio.create_task(self._analyze(request_id, request))
+
+    def _stage(self, request_id: RequestId, stage: str, data: Dict[str, Any]) -> None:
+        self._send({"type": "stage", "id": request_id, "stage": stage, **data})
+
+    async def _analyze(self, request_id: RequestId, request: AnalyzeRequest) -> None:
+        deadline = time.monotonic() + request.deadline_ms / 1000 if request.deadline_ms else None
+        try:
+            result = await self.analyze(
+                text=request.text,
+                candidate_labels=request.candidate_labels,
+                latency_class=request.latency_class,
+                deadline=deadline,
+                on_stage=partial(self._stage, request_id)
+            )
+            await asyncio.to_thread(self.log, request, result)
+            self._send({"type": "result", "id": request_id, "result": AnalyzeResponse(**result).model_dump()})
+        except asyncio.CancelledError:
+            self._send({"type": "cancelled", "id": request_id})
+            raise
+        except Exception as e:
+            logger.error(f"Session analysis {request_id!r} failed: {str(e)}")
+            self._error(request_id, f"Analysis failed: {str(e)}")
+        finally:
+            self.tasks.pop(request_id, None)
@@ -0,0 +1,293 @@
+"""
+Near-duplicate detection for analysis reuse.
+
+Texts are reduced to 64-bit SimHash fingerprints over word shingles, after
+stripping a leading byline, URL query strings (tracking parameters), case and
+punctuation.
+
+``NearDuplicateIndex`` keeps a bounded set of recent fingerprints and finds
+matches within a Hamming distance using band buckets: with d allowed bit
+differences the fingerprint is split into d + 1 bands, and any match within
+distance d must agree exactly on at least one band.
+"""
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+import metrics
+from config import get_settings
+from analysis.services.extractive import MODEL_NAME as LOCAL_MODEL_NAME
+from analysis.services.model_router import DEFAULT_LATENCY_CLASS
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 3
+# Shorter texts produce too few shingles for a meaningful fingerprint
+MIN_SHINGLES = 8
+MAX_BANDS = 16
+
+_URL_QUERY_RE = re.compile(r"(https?://[^\s?#]+)[?#]\S*")
+_BYLINE_RE = re.compile(r"^\s*by\s+[^\n]{1,80}\n", re.IGNORECASE)
+_TOKEN_RE = re.compile(r"\w+")
+
+_MIX_1 = 0xBF58476D1CE4E5B9
+_MIX_2 = 0x94D049BB133111EB
+_COMBINE = 0x9E3779B97F4A7C15
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """Lowercased word tokens with a leading byline and URL query strings removed."""
+    text = _BYLINE_RE.sub("", text, count=1)
+    return _TOKEN_RE.findall(_URL_QUERY_RE.sub(r"\1", text).lower())
+
+
+def _word_hash(word: str) -> int:
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def fingerprint(text: str) -> Optional[int]:
+    """
+    Compute the 64-bit SimHash of a text.
+
+    Word hashes are computed once per distinct word and combined into
+    shingle hashes with vectorized NumPy arithmetic, so a 50k character
+    text takes a few milliseconds.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Unsigned 64-bit fingerprint, or None if the text is too short
+    """
+    # Imported here to keep NumPy off the cold-start path
+    import numpy as np
+
+    tokens = normalize_tokens(text)
+    count = len(tokens) - SHINGLE_SIZE + 1
+    if count < MIN_SHINGLES:
+        return None
+
+    vocab: Dict[str, int] = {}
+    ids = [vocab.setdefault(token, len(vocab)) for token in tokens]
+    word_hashes = np.array([_word_hash(word) for word in vocab], dtype=np.uint64)[ids]
+
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        shingles = (shingles * np.uint64(_COMBINE)) ^ word_hashes[offset:offset + count]
+
+    # splitmix64 finalizer spreads the combined hash over all bits
+    shingles ^= shingles >> np.uint64(30)
+    shingles *= np.uint64(_MIX_1)
+    shingles ^= shingles >> np.uint64(27)
+    shingles *= np.uint64(_MIX_2)
+    shingles ^= shingles >> np.uint64(31)
+
+    bits = np.unpackbits(shingles.astype("<u8").view(np.uint8).reshape(count, 8), axis=1, bitorder="little")
+    majority = bits.sum(axis=0, dtype=np.int64) * 2 > count
+    return int.from_bytes(np.packbits(majority, bitorder="little").tobytes(), "little")
+
+
+def similarity(a: int, b: int) -> float:
+    """Fraction of matching bits between two fingerprints."""
+    return 1.0 - (a ^ b).bit_count() / FINGERPRINT_BITS
+
+
+def labels_signature(candidate_labels: List[str], latency_class: Optional[str] = None) -> str:
+    """
+    Compact, order-insensitive identifier for a label set and latency class.
+
+    Results are only reused within the same latency class, since classes
+    route to different Gemini models.
+    """
+    material = json.dumps(
+        {"labels": sorted(candidate_labels), "latency_class": latency_class or DEFAULT_LATENCY_CLASS},
+        sort_keys=True
+    ).encode("utf-8")
+    return hashlib.sha256(material).hexdigest()[:32]
+
+
+def is_reusable(result: dict) -> bool:
+    """
+    Whether a result may answer other requests (cache, near-duplicates).
+
+    Local extractive summaries are cheap to redo and must not stand in for
+    Gemini later; degraded results are partial.
+    """
+    return result.get("model") != LOCAL_MODEL_NAME and not result.get("degraded")
+
+
+def to_signed64(value: Optional[int]) -> Optional[int]:
+    """Convert an unsigned fingerprint for storage in a signed BIGINT column."""
+    if value is None:
+        return None
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def from_signed64(value: Optional[int]) -> Optional[int]:
+    """Inverse of to_signed64."""
+    if value is None:
+        return None
+    return value + (1 << 64) if value < 0 else value
+
+
+class NearDuplicateIndex:
+    """
+    Bounded in-memory index of recent fingerprints and their results.
+
+    Entries are evicted oldest-first once ``capacity`` is reached.
+    """
+
+    def __init__(self, threshold: float = 0.95, capacity: int = 10000):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.max_distance = int(round((1.0 - threshold) * FINGERPRINT_BITS, 6))
+        # Above MAX_BANDS the lookup is approximate (may miss distant matches)
+        band_count = max(1, min(self.max_distance + 1, MAX_BANDS))
+        width = FINGERPRINT_BITS // band_count
+        self._bands = [
+            (i * width, FINGERPRINT_BITS if i == band_count - 1 else (i + 1) * width)
+            for i in range(band_count)
+        ]
+        self._entries: "OrderedDict[Tuple[int, str], dict]" = OrderedDict()
+        self._buckets: List[Dict[int, set]] = [{} for _ in self._bands]
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.matches = 0
+
+    def _band_values(self, fp: int) -> List[int]:
+        return [(fp >> start) & ((1 << (end - start)) - 1) for start, end in self._bands]
+
+    def add(self, fp: int, label_set: str, result: dict) -> None:
+        """
+        Index a result.
+
+        Args:
+            fp: Text fingerprint
+            label_set: labels_signature of the request's candidate labels
+                and latency class
+            result: Analysis result to reuse for near-duplicates
+        """
+        key = (fp, label_set)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._entries[key] = result
+                return
+
+            self._entries[key] = result
+            for bucket, value in zip(self._buckets, self._band_values(fp)):
+                bucket.setdefault(value, set()).add(key)
+
+            while len(self._entries) > self.capacity:
+                old_key, _ = self._entries.popitem(last=False)
+                for bucket, value in zip(self._buckets, self._band_values(old_key[0])):
+                    members = bucket.get(value)
+                    if members is not None:
+                        members.discard(old_key)
+                        if not members:
+                            del bucket[value]
+
+    def lookup(self, fp: int, label_set: str) -> Optional[Tuple[dict, float]]:
+        """
+        Find the most similar indexed result at or above the threshold.
+
+        Returns:
+            (result, similarity) or None
+        """
+        best = None
+        with self._lock:
+            self.lookups += 1
+            candidates = set()
+            for bucket, value in zip(self._buckets, self._band_values(fp)):
+                candidates |= bucket.get(value, set())
+
+            for key in candidates:
+                if key[1] != label_set:
+                    continue
+                score = similarity(fp, key[0])
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (self._entries[key], score)
+
+            if best is not None:
+                self.matches += 1
+        return best
+
+    def rebuild(self, db, limit: int) -> int:
+        """
+        Repopulate the index from the most recent ``analysis_logs`` rows.
+
+        Args:
+            db: Database session
+            limit: Maximum number of rows to load
+
+        Returns:
+            Number of entries indexed
+        """
+        from sqlalchemy import or_
+        from auth.models import AnalysisLog
+
+        rows = (
+            db.query(AnalysisLog)
+            .filter(
+                AnalysisLog.text_fingerprint.isnot(None),
+                AnalysisLog.label_set.isnot(None),
+                # Rows logged before fingerprints were limited to reusable results
+                or_(AnalysisLog.model.is_(None), AnalysisLog.model != LOCAL_MODEL_NAME),
+            )
+            .order_by(AnalysisLog.id.desc())
+            .limit(min(limit, self.capacity))
+            .all()
+        )
+        for row in reversed(rows):
+            self.add(
+                from_signed64(row.text_fingerprint),
+                row.label_set,
+                {
+                    "category": row.category,
+                    "score": row.confidence_score,
+                    "summary": row.summary,
+                    "tone": row.tone,
+                    "model": row.model,
+                }
+            )
+        return len(rows)
+
+    def stats(self) -> dict:
+        """Counters for the metrics endpoint."""
+        return {
+            "entries": len(self._entries),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "matches": self.matches,
+        }
+
+
+@lru_cache()
+def get_near_duplicate_index() -> NearDuplicateIndex:
+    """Get the process-wide near-duplicate index."""
+    settings = get_settings()
+    index = NearDuplicateIndex(
+        threshold=settings.near_duplicate_threshold,
+        capacity=settings.near_duplicate_capacity
+    )
+    metrics.register("near_duplicates", index.stats)
+    return index
+
+
+def rebuild_near_duplicate_index() -> None:
+    """Load recent analysis logs into the index. Failures are logged, not raised."""
+    from database import SessionLocal
+
+    settings = get_settings()
+    db = SessionLocal()
+    try:
+        count = get_near_duplicate_index().rebuild(db, settings.near_duplicate_rebuild_limit)
+        logger.info(f"Near-duplicate index rebuilt with {count} entries")
+    except Exception as e:
+        logger.warning(f"Near-duplicate index rebuild failed: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,146 @@
+"""
+Content-addressed storage of analyzed input texts.
+
+Each distinct input is stored once in the ``texts`` table, keyed by the
+SHA-256 of its UTF-8 bytes and zlib-compressed (kept raw when compression
+does not help, e.g. very short texts). Analysis logs reference it through
+``text_hash``; the compressed content column is deferred, so texts are only
+fetched and decompressed when they are actually read.
+"""
+import hashlib
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import exists
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from auth.models import AnalysisLog, StoredText
+
+COMPRESSION_LEVEL = 6
+
+# Texts younger than this are never pruned (their logs may not be committed yet)
+PRUNE_GRACE = timedelta(hours=1)
+
+
+def text_hash(text: str) -> str:
+    """Content address of a text (hex SHA-256 of its UTF-8 bytes)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def compress_text(text: str) -> Tuple[str, bytes]:
+    """
+    Encode a text for storage.
+
+    Returns:
+        (codec, content) with codec 'zlib' or 'raw'
+    """
+    raw = text.encode("utf-8")
+    compressed = zlib.compress(raw, COMPRESSION_LEVEL)
+    if len(compressed) < len(raw):
+        return "zlib", compressed
+    return "raw", raw
+
+
+def decompress_text(codec: str, content: bytes) -> str:
+    """
+    Decode stored content.
+
+    Raises:
+        ValueError: If the codec is unknown
+    """
+    if codec == "zlib":
+        return zlib.decompress(content).decode("utf-8")
+    if codec == "raw":
+        return bytes(content).decode("utf-8")
+    raise ValueError(f"Unknown text codec: {codec}")
+
+
+def resolve_input_text(input_text: Optional[str], codec: Optional[str], content: Optional[bytes]) -> Optional[str]:
+    """Input text of a log row selected together with its (outer-joined) StoredText columns."""
+    if content is not None:
+        return decompress_text(codec, content)
+    return input_text
+
+
+def _insert_ignoring_duplicates(db: Session, rows: List[dict]) -> None:
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        db.execute(insert(StoredText).values(rows).on_conflict_do_nothing(index_elements=["hash"]))
+        return
+
+    known = {
+        digest for (digest,) in
+        db.query(StoredText.hash).filter(StoredText.hash.in_([row["hash"] for row in rows]))
+    }
+    for row in rows:
+        if row["hash"] in known:
+            continue
+        try:
+            with db.begin_nested():
+                db.add(StoredText(**row))
+                db.flush()
+        except IntegrityError:
+            pass  # Inserted concurrently by another worker
+
+
+def store_texts(db: Session, texts: Iterable[str]) -> List[str]:
+    """
+    Store texts that are not stored yet, in the caller's transaction.
+
+    Args:
+        db: Database session
+        texts: Texts to store (duplicates are fine)
+
+    Returns:
+        Content hashes in the same order as ``texts``
+    """
+    hashes = []
+    rows = {}
+    for text in texts:
+        digest = text_hash(text)
+        hashes.append(digest)
+        if digest not in rows:
+            codec, content = compress_text(text)
+            rows[digest] = {"hash": digest, "codec": codec, "size": len(text.encode("utf-8")), "content": content}
+
+    if rows:
+        # Sorted so concurrent batches lock rows in the same order
+        _insert_ignoring_duplicates(db, [rows[digest] for digest in sorted(rows)])
+    return hashes
+
+
+def store_text(db: Session, text: str) -> str:
+    """Store one text if needed; returns its content hash."""
+    return store_texts(db, [text])[0]
+
+
+def load_text(db: Session, digest: str) -> Optional[str]:
+    """Decompressed text for a content hash, or None if it is not stored."""
+    stored = db.get(StoredText, digest)
+    return stored.text if stored is not None else None
+
+
+def delete_unreferenced_texts(db: Session, created_before: Optional[datetime] = None) -> int:
+    """
+    Delete texts no analysis log references any more.
+
+    Logs leave through archival or partition retention, which do not touch
+    ``texts``. Only texts stored before ``created_before`` (default: now
+    minus PRUNE_GRACE) are considered, which keeps texts whose logs are
+    still being written.
+
+    Returns:
+        Number of texts deleted
+    """
+    created_before = created_before or datetime.now(timezone.utc) - PRUNE_GRACE
+    referenced = exists().where(AnalysisLog.text_hash == StoredText.hash)
+    deleted = db.query(StoredText).filter(
+        StoredText.created_at < created_before,
+        ~referenced
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
@@ -0,0 +1,81 @@
+"""
+Background warm-up and keep-alive for the Hugging Face model.
+
+The Inference API unloads idle models and answers 503 while reloading them.
+``UpstreamWarmer`` primes the model when the app starts and, whenever no
+upstream call has succeeded for ``keepalive_interval`` seconds, sends a small
+classification so real requests find the model loaded. Regular traffic
+counts as keep-alive, so busy periods add no extra calls.
+"""
+import asyncio
+from typing import Optional
+from loguru import logger
+
+
+class UpstreamWarmer:
+    """
+    Keeps an upstream model loaded.
+
+    Args:
+        service: Object with ``warm_up()`` and ``seconds_since_success()``
+            (the HuggingFaceService)
+        keepalive_interval: Longest quiet period before a keep-alive call
+            (0 = only warm up once)
+        retry_interval: Delay before retrying a failed warm-up
+    """
+
+    def __init__(self, service, keepalive_interval: float = 300.0, retry_interval: float = 30.0):
+        self.service = service
+        self.keepalive_interval = keepalive_interval
+        self.retry_interval = retry_interval
+        self.warmups = 0
+        self.failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def warm_once(self) -> bool:
+        """Send one warm-up request. Failures are logged, not raised."""
+        try:
+            await self.service.warm_up()
+            self.warmups += 1
+            logger.info("Hugging Face model warm")
+            return True
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Hugging Face warm-up failed: {str(e)}")
+            return False
+
+    async def run(self) -> None:
+        """Warm up, then keep the model loaded until cancelled."""
+        while True:
+            idle = self.service.seconds_since_success()
+            if idle is None or idle >= self.keepalive_interval:
+                if not await self.warm_once():
+                    await asyncio.sleep(self.retry_interval)
+                    continue
+                if not self.keepalive_interval:
+                    return
+                idle = 0.0
+            await asyncio.sleep(self.keepalive_interval - idle)
+
+    def start(self) -> None:
+        """Run in the background on the current event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Cancel the background task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """Counters for the metrics endpoint."""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "warmups": self.warmups,
+            "failures": self.failures,
+        }
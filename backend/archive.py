@@ -0,0 +1,59 @@
+"""
+Command-line archival of old analysis history.
+Moves analysis_logs rows older than a cutoff into compressed per-user,
+per-month files under ARCHIVE_DIR, then deletes them from the database.
+
+Usage (from the backend directory):
+    python archive.py --older-than-months 12
+    python archive.py --before 2024-01-01 --format parquet --dir /mnt/cold/analysis
+    python archive.py --older-than-months 12 --keep-rows   # copy only
+
+On PostgreSQL, run this before partition retention (partitions.py) drops
+the same months.
+"""
+import argparse
+import sys
+from datetime import datetime, timezone
+from config import get_settings
+from database import SessionLocal
+from analysis.archive import ARCHIVE_FORMATS, archive_cutoff, archive_logs
+
+
+def main() -> int:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Archive old analysis history")
+    cutoff = parser.add_mutually_exclusive_group(required=True)
+    cutoff.add_argument("--before", type=datetime.fromisoformat, help="Archive rows created before this ISO date/time")
+    cutoff.add_argument("--older-than-months", type=int, help="Archive whole months older than this many months")
+    parser.add_argument("--format", choices=sorted(ARCHIVE_FORMATS), default=settings.archive_format)
+    parser.add_argument("--dir", default=settings.archive_dir, help="Archive directory (default: ARCHIVE_DIR)")
+    parser.add_argument("--user-id", type=int, default=None, help="Only this user's history")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows fetched per round trip")
+    parser.add_argument("--keep-rows", action="store_true", help="Write the archive without deleting rows (later runs skip rows already archived)")
+    args = parser.parse_args()
+
+    if args.before is not None:
+        before = args.before if args.before.tzinfo else args.before.replace(tzinfo=timezone.utc)
+    else:
+        before = archive_cutoff(args.older_than_months)
+
+    db = SessionLocal()
+    try:
+        result = archive_logs(
+            db,
+            args.dir,
+            before,
+            format=args.format,
+            batch_size=args.batch_size,
+            delete=not args.keep_rows,
+            user_id=args.user_id
+        )
+    finally:
+        db.close()
+    print(f"Archived {result['rows']} rows before {before.isoformat()} into {result['files']} files "
+          f"({result['already_archived']} already archived); deleted {result['deleted']} rows and {result['texts_deleted']} unreferenced texts")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
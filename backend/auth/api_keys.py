@@ -0,0 +1,240 @@
+"""
+API keys for machine clients.
+
+A key looks like ``ha_<key id>_<secret>``. The key id is public and
+indexes the ``api_keys`` table; only an HMAC-SHA256 of the secret (keyed
+with a server-side pepper) is stored. HMAC is used instead of bcrypt because
+the secret is 256 random bits: it cannot be brute-forced, so a slow hash
+would only add latency to every request.
+
+Verified keys are served from an in-process cache, so the per-request cost
+is one HMAC and a constant-time comparison, without a database round trip.
+Revocations reach every worker within ``api_key_revocation_sync`` seconds:
+each worker periodically asks the database for keys revoked since its last
+check and evicts them. Cache entries also expire after ``api_key_cache_ttl``.
+"""
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+from sqlalchemy.orm import Session
+import metrics
+from config import get_settings
+from auth.models import ApiKey, User
+
+settings = get_settings()
+
+KEY_PREFIX = "ha_"
+KEY_ID_LENGTH = 12  # hex characters
+SECRET_BYTES = 32
+MAX_CACHED_KEYS = 10000
+
+
+def _pepper() -> bytes:
+    return (settings.api_key_pepper or settings.jwt_secret).encode("utf-8")
+
+
+def hash_secret(secret: str) -> str:
+    """Keyed hash of a key's secret part as stored in ``api_keys.secret_hash``."""
+    return hmac.new(_pepper(), secret.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def generate_api_key() -> Tuple[str, str, str]:
+    """
+    Create a new random key.
+
+    Returns:
+        (full key to hand to the client, key id, secret hash to store)
+    """
+    key_id = secrets.token_hex(KEY_ID_LENGTH // 2)
+    secret = secrets.token_urlsafe(SECRET_BYTES)
+    return f"{KEY_PREFIX}{key_id}_{secret}", key_id, hash_secret(secret)
+
+
+def is_api_key(token: str) -> bool:
+    """Whether a credential is an API key rather than a JWT."""
+    return token.startswith(KEY_PREFIX)
+
+
+def parse_api_key(key: str) -> Optional[Tuple[str, str]]:
+    """Split a key into (key id, secret); None if it is malformed."""
+    if not key.startswith(KEY_PREFIX):
+        return None
+    body = key[len(KEY_PREFIX):]
+    if len(body) <= KEY_ID_LENGTH + 1 or body[KEY_ID_LENGTH] != "_":
+        return None
+    return body[:KEY_ID_LENGTH], body[KEY_ID_LENGTH + 1:]
+
+
+def _epoch(value: Optional[datetime]) -> Optional[float]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class _CachedKey:
+    """What a worker remembers about one key id (user None = unknown or revoked)."""
+
+    __slots__ = ("secret_hash", "expires_at", "user", "loaded_at")
+
+    def __init__(self, secret_hash: str, expires_at: Optional[float], user: Optional[User], loaded_at: float):
+        self.secret_hash = secret_hash
+        self.expires_at = expires_at
+        self.user = user
+        self.loaded_at = loaded_at
+
+
+class ApiKeyCache:
+    """
+    Resolves API keys to users with an in-memory cache and revocation sync.
+
+    Args:
+        ttl: Seconds an entry is used before it is reloaded
+        sync_interval: Seconds between checks for newly revoked keys
+        max_entries: Entries kept (least recently used are dropped)
+    """
+
+    def __init__(self, ttl: float, sync_interval: float, max_entries: int = MAX_CACHED_KEYS):
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _CachedKey]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sync = time.monotonic()
+        self._revoked_since = datetime.now(timezone.utc)
+        self.hits = 0
+        self.loads = 0
+        self.rejected = 0
+        self.evicted_revoked = 0
+        self.verify_seconds = metrics.Histogram()
+
+    def resolve(self, db: Session, key: str) -> Optional[User]:
+        """
+        User owning a valid, unrevoked, unexpired key.
+
+        Args:
+            db: Database session (used on cache misses and revocation checks)
+            key: Full API key
+
+        Returns:
+            The (detached) user, or None if the key is not valid
+        """
+        start = time.perf_counter()
+        try:
+            parsed = parse_api_key(key)
+            if parsed is None:
+                self.rejected += 1
+                return None
+            key_id, secret = parsed
+
+            self._sync_revocations(db)
+            with self._lock:
+                entry = self._entries.get(key_id)
+                if entry is not None:
+                    self._entries.move_to_end(key_id)
+            if entry is None or time.monotonic() - entry.loaded_at > self.ttl:
+                entry = self._load(db, key_id)
+            else:
+                self.hits += 1
+
+            if entry.user is None or not hmac.compare_digest(entry.secret_hash, hash_secret(secret)):
+                self.rejected += 1
+                return None
+            if entry.expires_at is not None and time.time() >= entry.expires_at:
+                self.rejected += 1
+                return None
+            return entry.user
+        finally:
+            self.verify_seconds.observe(time.perf_counter() - start)
+
+    def peek(self, key: str) -> Optional[User]:
+        """
+        User of a key this worker has already verified, without touching the database.
+
+        Unknown keys give None, and revocations not yet synced are missed,
+        so this only suits cheap pre-checks (the request profiler); use
+        ``resolve`` to authenticate.
+        """
+        parsed = parse_api_key(key)
+        if parsed is None:
+            return None
+        key_id, secret = parsed
+        with self._lock:
+            entry = self._entries.get(key_id)
+        if entry is None or entry.user is None or time.monotonic() - entry.loaded_at > self.ttl:
+            return None
+        if not hmac.compare_digest(entry.secret_hash, hash_secret(secret)):
+            return None
+        if entry.expires_at is not None and time.time() >= entry.expires_at:
+            return None
+        return entry.user
+
+    def _load(self, db: Session, key_id: str) -> _CachedKey:
+        self.loads += 1
+        row = db.query(ApiKey).filter(ApiKey.key_id == key_id).first()
+        user = None
+        if row is not None and row.revoked_at is None:
+            user = db.get(User, row.user_id)
+            if user is not None:
+                # Shared across requests, so it must not belong to this session
+                db.expunge(user)
+        entry = _CachedKey(
+            row.secret_hash if row is not None else "",
+            _epoch(row.expires_at) if row is not None else None,
+            user,
+            time.monotonic()
+        )
+        with self._lock:
+            self._entries[key_id] = entry
+            self._entries.move_to_end(key_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _sync_revocations(self, db: Session) -> None:
+        """Evict keys revoked (by any worker) since the last check, at most once per interval."""
+        now = time.monotonic()
+        if now - self._last_sync < self.sync_interval:
+            return
+        self._last_sync = now
+        checked_at = datetime.now(timezone.utc)
+        # Overlap by one interval so revocations committed late are not missed
+        since = self._revoked_since - timedelta(seconds=self.sync_interval)
+        revoked = [key_id for (key_id,) in db.query(ApiKey.key_id).filter(ApiKey.revoked_at >= since)]
+        self._revoked_since = checked_at
+        with self._lock:
+            for key_id in revoked:
+                if self._entries.pop(key_id, None) is not None:
+                    self.evicted_revoked += 1
+
+    def invalidate(self, key_id: str) -> None:
+        """Forget a key in this worker (e.g. right after revoking it)."""
+        with self._lock:
+            self._entries.pop(key_id, None)
+
+    def clear(self) -> None:
+        """Forget every cached key."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Cache counters and verification latency for the metrics endpoint."""
+        return {
+            "cached": len(self._entries),
+            "hits": self.hits,
+            "loads": self.loads,
+            "rejected": self.rejected,
+            "evicted_revoked": self.evicted_revoked,
+            "verify_seconds": self.verify_seconds.snapshot(),
+        }
+
+
+# Singleton instance
+api_key_cache = ApiKeyCache(settings.api_key_cache_ttl, settings.api_key_revocation_sync)
+metrics.register("api_keys", api_key_cache.stats)
@@ -1,60 +1,181 @@
 """
 Authentication middleware for protecting routes.
-Validates JWT tokens and injects user information.
+Validates JWT tokens or API keys and injects user information.
 """
-from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import asyncio
+from typing import Optional
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import APIKeyHeader, HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+import timing
+from config import get_settings
 from database import get_db
+from auth.api_keys import api_key_cache, is_api_key
 from auth.models import User
 from auth.utils import decode_access_token
 
-security = HTTPBearer()
+security = HTTPBearer(auto_error=False)
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
+settings = get_settings()
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """
-    Dependency to get the current authenticated user.
-    
-    Args:
-        credentials: Bearer token from Authorization header
-        db: Database session
-        
-    Returns:
-        User object if authentication successful
-        
-    Raises:
-        HTTPException: If token is invalid or user not found
-    """
-    credentials_exception = HTTPException(
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
-    # Decode token
-    token = credentials.credentials
+
+
+def _not_authenticated() -> HTTPException:
+    # Same response HTTPBearer gives when no credentials are sent
+    return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated")
+
+
+def _user_from_token(token: str, db: Session) -> User:
+    """Resolve a JWT access token to its user."""
     payload = decode_access_token(token)
-    
     if payload is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
     # Extract user ID from token
     user_id_str: str = payload.get("sub")
     if user_id_str is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
     try:
         user_id = int(user_id_str)
     except (ValueError, TypeError):
-        raise credentials_exception
+        raise _credentials_exception()
     
     # Get user from database
     user = db.query(User).filter(User.id == user_id).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    return user
+
+
+def authenticate_token(token: str, db: Session) -> User:
+    """
+    Resolve a JWT access token or an API key (``ha_...``) to its user.
     
+    Raises:
+        HTTPException: If the credentials are invalid or the user is not found
+    """
+    if is_api_key(token):
+        user = api_key_cache.resolve(db, token)
+        if user is None:
+            raise _credentials_exception()
+        return user
+    return _user_from_token(token, db)
+
+
+async def resolve_user(token: str, db: Session) -> User:
+    """
+    ``authenticate_token`` off the event loop, then release the session's connection.
+    
+    Authentication is the only query before the (slow) upstream calls, so
+    the connection goes back to the pool now instead of being held for the
+    whole request; later queries on ``db`` check out a fresh one. The
+    returned user is detached with its attributes loaded.
+    
+    Raises:
+        HTTPException: If the credentials are invalid or the user is not found
+    """
+    try:
+        return await asyncio.to_thread(authenticate_token, token, db)
+    finally:
+        db.close()
+
+
+async def get_current_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    api_key: Optional[str] = Depends(api_key_header),
+    db: Session = Depends(get_db)
+) -> User:
+    """
+    Dependency to get the current authenticated user.
+    
+    Accepts a JWT access token (``Authorization: Bearer <jwt>``) or an API
+    key (``Authorization: Bearer ha_...`` or ``X-API-Key: ha_...``).
+    
+    The user is also left in ``request.state.user`` for middleware (the
+    request profiler checks it for admin rights).
+    
+    Args:
+        request: Incoming request
+        credentials: Bearer credentials from the Authorization header
+        api_key: Value of the X-API-Key header
+        db: Database session
+        
+    Returns:
+        User object if authentication successful
+        
+    Raises:
+        HTTPException: If the credentials are missing or invalid, or the user is not found
+    """
+    with timing.stage("auth"):
+        token = api_key or (credentials.credentials if credentials else None)
+        if not token:
+            raise _not_authenticated()
+        user = await resolve_user(token, db)
+    request.state.user = user
+    return user
+
+
+async def get_token_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    db: Session = Depends(get_db)
+) -> User:
+    """
+    Dependency for routes that require an interactive login (JWT only).
+    
+    Used for API key management, so a leaked key cannot mint or revoke keys.
+    
+    Raises:
+        HTTPException: If no valid JWT access token is supplied
+    """
+    with timing.stage("auth"):
+        if credentials is None:
+            raise _not_authenticated()
+        if is_api_key(credentials.credentials):
+            raise _credentials_exception()
+        user = await resolve_user(credentials.credentials, db)
+    request.state.user = user
     return user
+
+
+def is_admin(user: Optional[User]) -> bool:
+    """Whether a user is listed in ADMIN_USERS."""
+    return user is not None and user.username in settings.admin_users
+
+
+def claims_admin(token: str) -> bool:
+    """
+    Cheap check, without the database, that credentials belong to an admin.
+    
+    Reads the ``username`` claim of a JWT or the user of an API key already
+    cached by this worker. Not authentication: callers must still check
+    the user the request authenticates as.
+    """
+    if not settings.admin_users:
+        return False
+    if is_api_key(token):
+        return is_admin(api_key_cache.peek(token))
+    payload = decode_access_token(token)
+    return payload is not None and payload.get("username") in settings.admin_users
+
+
+async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    """
+    Dependency for admin-only routes (diagnostics).
+    
+    Raises:
+        HTTPException: 403 if the authenticated user is not an admin
+    """
+    if not is_admin(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
@@ -1,8 +1,9 @@
 """
 Database models for authentication.
-Defines User and AnalysisLog tables.
+Defines User, ApiKey, AnalysisLog, StoredText and LabelVocabulary tables.
 """
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, Float, ForeignKey, LargeBinary
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from database import Base
 
@@ -21,18 +22,85 @@ class User(Base):
         return f"<User(id={self.id}, username='{self.username}')>"
 
 
+class ApiKey(Base):
+    """Long-lived API key of a user or service account (see auth/api_keys.py)."""
+    __tablename__ = "api_keys"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    key_id = Column(String(16), unique=True, nullable=False)  # Public part of the key
+    secret_hash = Column(String(64), nullable=False)  # HMAC-SHA256 of the secret part
+    name = Column(String(100), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True))
+    revoked_at = Column(DateTime(timezone=True), index=True)
+    
+    def __repr__(self):
+        return f"<ApiKey(key_id='{self.key_id}', user_id={self.user_id})>"
+
+
 class AnalysisLog(Base):
     """Analysis log model to store analysis history."""
     __tablename__ = "analysis_logs"
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    input_text = Column(Text, nullable=False)
+    text_hash = Column(String(64), index=True)  # Full input in texts (see analysis/texts.py)
+    input_text = Column(Text)  # Truncated copy of the input, only on rows written before texts existed
     category = Column(String(100))
     confidence_score = Column(Float)
     summary = Column(Text)
     tone = Column(String(20))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    model = Column(String(64))  # Gemini model that produced the summary
+    text_fingerprint = Column(BigInteger)  # SimHash of the input (signed 64-bit)
+    label_set = Column(String(32))  # Signature of the candidate labels and latency class
+    score_label_ids = Column(LargeBinary)  # Packed int32 label_vocabulary ids
+    score_values = Column(LargeBinary)  # Packed float16 scores, aligned with score_label_ids
+    # Partition key on PostgreSQL (see migrations/versions/0002)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    stored_text = relationship(
+        "StoredText",
+        primaryjoin="foreign(AnalysisLog.text_hash) == StoredText.hash",
+        viewonly=True
+    )
+    
+    @property
+    def text(self):
+        """Full input text, decompressed on first access (legacy rows: the stored copy)."""
+        if self.stored_text is not None:
+            return self.stored_text.text
+        return self.input_text
     
     def __repr__(self):
         return f"<AnalysisLog(id={self.id}, category='{self.category}')>"
+
+
+class StoredText(Base):
+    """Analyzed input texts, stored once per distinct content and compressed."""
+    __tablename__ = "texts"
+    
+    hash = Column(String(64), primary_key=True)  # SHA-256 of the UTF-8 text
+    codec = Column(String(8), nullable=False)  # zlib or raw
+    size = Column(Integer, nullable=False)  # Uncompressed size in bytes
+    content = deferred(Column(LargeBinary, nullable=False))  # Loaded only when the text is read
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    @property
+    def text(self) -> str:
+        from analysis.texts import decompress_text
+        return decompress_text(self.codec, self.content)
+    
+    def __repr__(self):
+        return f"<StoredText(hash='{self.hash[:12]}', size={self.size})>"
+
+
+class LabelVocabulary(Base):
+    """Candidate labels referenced by packed score vectors in analysis_logs."""
+    __tablename__ = "label_vocabulary"
+    
+    id = Column(Integer, primary_key=True)
+    label = Column(String(100), unique=True, nullable=False)
+    
+    def __repr__(self):
+        return f"<LabelVocabulary(id={self.id}, label='{self.label}')>"
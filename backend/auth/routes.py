@@ -1,12 +1,18 @@
 """
 Authentication routes for user registration and login.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timedelta, timezone
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from loguru import logger
 from database import get_db
-from auth.models import User
-from auth.schemas import UserRegister, UserLogin, TokenResponse, UserResponse
+from auth.api_keys import api_key_cache, generate_api_key
+from auth.middleware import get_token_user
+from auth.models import ApiKey, User
+from auth.schemas import (
+    UserRegister, UserLogin, TokenResponse, UserResponse, ApiKeyCreate, ApiKeyCreated, ApiKeyResponse
+)
 from auth.utils import hash_password, verify_password, create_access_token
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -56,7 +62,7 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     logger.info(f"New user registered: {new_user.username}")
     
     # Create access token
-    access_token = create_access_token(data={"sub": str(new_user.id)})
+    access_token = create_access_token(data={"sub": str(new_user.id), "username": new_user.username})
     
     return TokenResponse(
         access_token=access_token,
@@ -92,9 +98,94 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
     logger.info(f"User logged in: {user.username}")
     
     # Create access token
-    access_token = create_access_token(data={"sub": str(user.id)})
+    access_token = create_access_token(data={"sub": str(user.id), "username": user.username})
     
     return TokenResponse(
         access_token=access_token,
         user=UserResponse.from_orm(user)
     )
+
+
+@router.post("/api-keys", response_model=ApiKeyCreated, status_code=status.HTTP_201_CREATED)
+async def create_api_key(
+    request: ApiKeyCreate,
+    current_user: User = Depends(get_token_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Create an API key for the current user.
+    
+    The full key is returned only in this response; the server keeps a keyed
+    hash of its secret. Requires a JWT access token.
+    
+    Args:
+        request: Key name and optional lifetime
+        current_user: User authenticated with a JWT
+        db: Database session
+        
+    Returns:
+        Key metadata and the full key
+    """
+    key, key_id, secret_hash = generate_api_key()
+    expires_at = None
+    if request.expires_in_days:
+        expires_at = datetime.now(timezone.utc) + timedelta(days=request.expires_in_days)
+    
+    api_key = ApiKey(
+        user_id=current_user.id,
+        key_id=key_id,
+        secret_hash=secret_hash,
+        name=request.name,
+        expires_at=expires_at
+    )
+    db.add(api_key)
+    db.commit()
+    db.refresh(api_key)
+    
+    logger.info(f"API key {key_id} created for user {current_user.username}")
+    
+    return ApiKeyCreated(key=key, **ApiKeyResponse.model_validate(api_key).model_dump())
+
+
+@router.get("/api-keys", response_model=List[ApiKeyResponse])
+async def list_api_keys(current_user: User = Depends(get_token_user), db: Session = Depends(get_db)):
+    """
+    List the current user's API keys, including revoked ones.
+    
+    Args:
+        current_user: User authenticated with a JWT
+        db: Database session
+        
+    Returns:
+        Key metadata, newest first
+    """
+    return db.query(ApiKey).filter(ApiKey.user_id == current_user.id).order_by(ApiKey.id.desc()).all()
+
+
+@router.delete("/api-keys/{key_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_api_key(key_id: str, current_user: User = Depends(get_token_user), db: Session = Depends(get_db)):
+    """
+    Revoke one of the current user's API keys.
+    
+    The key stops working immediately on this worker and within
+    API_KEY_REVOCATION_SYNC seconds on every other worker.
+    
+    Args:
+        key_id: Public id of the key
+        current_user: User authenticated with a JWT
+        db: Database session
+        
+    Raises:
+        HTTPException: If the key does not exist or belongs to another user
+    """
+    api_key = db.query(ApiKey).filter(ApiKey.key_id == key_id, ApiKey.user_id == current_user.id).first()
+    if api_key is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="API key not found")
+    
+    if api_key.revoked_at is None:
+        api_key.revoked_at = datetime.now(timezone.utc)
+        db.commit()
+        logger.info(f"API key {key_id} revoked by user {current_user.username}")
+    api_key_cache.invalidate(key_id)
+    
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
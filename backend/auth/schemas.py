@@ -4,6 +4,7 @@ Provides data validation and serialization.
 """
 from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
+from typing import Optional
 
 
 class UserRegister(BaseModel):
@@ -35,3 +36,26 @@ class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
     user: UserResponse
+
+
+class ApiKeyCreate(BaseModel):
+    """Schema for API key creation request."""
+    name: str = Field(..., min_length=1, max_length=100, description="Label, e.g. the service using the key")
+    expires_in_days: Optional[int] = Field(None, ge=1, le=3650, description="Lifetime (default: no expiry)")
+
+
+class ApiKeyResponse(BaseModel):
+    """Schema for API key metadata (the secret is never returned again)."""
+    key_id: str
+    name: str
+    created_at: datetime
+    expires_at: Optional[datetime] = None
+    revoked_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class ApiKeyCreated(ApiKeyResponse):
+    """Schema for a newly created API key, including the full key."""
+    key: str = Field(..., description="Full API key; shown only once")
@@ -0,0 +1,117 @@
+"""
+Cold-start import report.
+
+Imports the app in a fresh interpreter with ``-X importtime`` and reports the
+wall-clock import cost, the most expensive modules and whether any heavy SDKs
+were loaded eagerly. Output is JSON so cold-start cost can be tracked across
+commits.
+
+Usage (from the backend directory):
+    python -m benchmarks.coldstart
+    python -m benchmarks.coldstart --module vercel_entry --runs 5 --output coldstart.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+from benchmarks.common import run_metadata, write_report
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only load once a request needs them
+HEAVY_MODULES = ("google.generativeai", "google.ai.generativelanguage", "grpc", "numpy", "pyarrow")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = {heavy!r}
+print(json.dumps({{
+    "wall_ms": elapsed * 1000,
+    "modules_loaded": len(sys.modules),
+    "heavy_loaded": sorted(m for m in heavy if m in sys.modules),
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, object]]:
+    """
+    Parse ``-X importtime`` output.
+
+    Returns:
+        One entry per module with self and cumulative time in milliseconds
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|", 1).split("|"))
+            entries.append({
+                "module": name,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+            })
+        except ValueError:
+            continue
+    return entries
+
+
+def probe(module: str) -> Dict[str, object]:
+    """Import ``module`` in a fresh interpreter and collect timings."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    summary = json.loads(result.stdout.strip().splitlines()[-1])
+    summary["imports"] = parse_importtime(result.stderr)
+    return summary
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cold-start import time report")
+    parser.add_argument("--module", default="main", help="Module to import (main, vercel_entry, ...)")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh-interpreter runs")
+    parser.add_argument("--top", type=int, default=20, help="Number of most expensive modules to report")
+    parser.add_argument("--output", default=None, help="Write JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    runs = [probe(args.module) for _ in range(args.runs)]
+
+    # The last run's per-module breakdown is representative once caches are warm
+    imports = runs[-1]["imports"]
+    top = sorted(imports, key=lambda e: e["cumulative_ms"], reverse=True)[:args.top]
+
+    report = {
+        "benchmark": "coldstart",
+        "meta": run_metadata(),
+        "config": {"module": args.module, "runs": args.runs},
+        "results": {
+            "wall_ms": {
+                "median": round(statistics.median(r["wall_ms"] for r in runs), 3),
+                "min": round(min(r["wall_ms"] for r in runs), 3),
+            },
+            "modules_loaded": runs[-1]["modules_loaded"],
+            "heavy_loaded": runs[-1]["heavy_loaded"],
+            "top_imports": top,
+        },
+    }
+    write_report(report, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Shared helpers for benchmark reports.
+Percentiles, run metadata and JSON output used by every benchmark script.
+"""
+import json
+import math
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Compute a percentile with linear interpolation between closest ranks.
+    
+    Args:
+        values: Sample values (need not be sorted)
+        pct: Percentile in the range 0-100
+        
+    Returns:
+        Interpolated percentile, or 0.0 for an empty sample
+    """
+    if not values:
+        return 0.0
+    
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    if lower == upper:
+        return ordered[lower]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize_latencies(latencies_ms: List[float]) -> Dict[str, float]:
+    """Summarize a latency sample (milliseconds) into the standard report fields."""
+    if not latencies_ms:
+        return {"min": 0.0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    
+    return {
+        "min": round(min(latencies_ms), 3),
+        "mean": round(sum(latencies_ms) / len(latencies_ms), 3),
+        "p50": round(percentile(latencies_ms, 50), 3),
+        "p95": round(percentile(latencies_ms, 95), 3),
+        "p99": round(percentile(latencies_ms, 99), 3),
+        "max": round(max(latencies_ms), 3),
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Return the current git commit hash, if available."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def run_metadata() -> Dict[str, Optional[str]]:
+    """Metadata identifying a benchmark run so results can be compared across commits."""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+    }
+
+
+def write_report(report: dict, output: Optional[str] = None) -> None:
+    """
+    Write a benchmark report as JSON.
+    
+    Args:
+        report: Report dictionary
+        output: File path, or None to print to stdout
+    """
+    payload = json.dumps(report, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
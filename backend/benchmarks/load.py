@@ -0,0 +1,286 @@
+"""
+End-to-end load benchmark for POST /analyze.
+
+Starts local stand-ins for the Hugging Face and Gemini APIs, launches the real
+FastAPI app under uvicorn with ``Settings`` pointed at them, then drives
+/analyze with a concurrent async load generator and reports throughput and
+latency percentiles as JSON.
+
+Usage (from the backend directory):
+    python -m benchmarks.load --requests 500 --concurrency 32
+    python -m benchmarks.load --hf-latency lognormal:150:0.4 --gemini-latency lognormal:900:0.5 \\
+        --hf-burst-every 30 --hf-burst-length 3 --output bench.json
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import List, Optional
+
+import httpx
+
+from benchmarks.common import run_metadata, summarize_latencies, write_report
+from benchmarks.stubs import StubProfile, StubServer, create_gemini_stub, create_huggingface_stub, free_port
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_SENTENCES = [
+    "The company reported strong quarterly growth driven by its cloud computing division.",
+    "Lawmakers debated the new budget proposal late into the night without reaching agreement.",
+    "The home team secured a narrow victory after a dramatic finish in the final minutes.",
+    "Researchers published findings suggesting a new treatment could reduce recovery times.",
+    "Critics raised concerns about the risk of rising costs and declining consumer confidence.",
+]
+
+
+def build_text(size: int, index: int) -> str:
+    """Build a deterministic article-like text of roughly ``size`` characters."""
+    words = []
+    length = 0
+    i = index
+    while length < size:
+        sentence = SAMPLE_SENTENCES[i % len(SAMPLE_SENTENCES)]
+        words.append(sentence)
+        length += len(sentence) + 1
+        i += 1
+    return " ".join(words)[:max(size, 10)]
+
+
+class AppProcess:
+    """The FastAPI app running under uvicorn in a subprocess."""
+
+    def __init__(self, env: dict, workers: int = 1, port: Optional[int] = None):
+        self.port = port or free_port()
+        self.env = env
+        self.workers = workers
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 60.0) -> "AppProcess":
+        """Run migrations, launch uvicorn and wait for /health to respond."""
+        subprocess.run(
+            [sys.executable, "migrate.py"],
+            cwd=BACKEND_DIR,
+            env=self.env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "main:app",
+                "--host", "127.0.0.1",
+                "--port", str(self.port),
+                "--workers", str(self.workers),
+                "--log-level", "warning",
+                "--no-access-log",
+            ],
+            cwd=BACKEND_DIR,
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                stderr = self.process.stderr.read().decode(errors="replace")
+                raise RuntimeError(f"App exited during startup:\n{stderr}")
+            try:
+                if httpx.get(f"{self.url}/health", timeout=1.0).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        raise RuntimeError("App did not become healthy in time")
+
+    def stop(self) -> None:
+        """Terminate the app process."""
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def app_environment(args: argparse.Namespace, hf_url: str, gemini_url: str, tmp_dir: str) -> dict:
+    """
+    Environment for the app subprocess: Settings pointed at the stubs.
+
+    The analysis cache and near-duplicate reuse are off unless ``--cache``
+    is given, so runs measure the upstream path; with it, the cache lives
+    in ``tmp_dir`` and starts empty every run.
+    """
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": args.database_url or f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}",
+        "ANALYSIS_CACHE_BACKEND": "sqlite" if args.cache else "none",
+        "ANALYSIS_CACHE_PATH": os.path.join(tmp_dir, "analysis_cache.sqlite3"),
+        "NEAR_DUPLICATE_ENABLED": "true" if args.cache else "false",
+        "JWT_SECRET": "benchmark-secret-key-not-for-production-use",
+        "HUGGINGFACE_API_TOKEN": "hf_benchmark",
+        "HUGGINGFACE_API_URL": f"{hf_url}/models",
+        "GEMINI_API_KEY": "benchmark",
+        "GEMINI_API_ENDPOINT": gemini_url,
+        "GEMINI_TRANSPORT": "rest",
+    })
+    return env
+
+
+async def obtain_token(client: httpx.AsyncClient) -> str:
+    """Register (or log in) the benchmark user and return a bearer token."""
+    credentials = {"username": "benchuser", "password": "benchpassword123"}
+    response = await client.post(
+        "/auth/register",
+        json={**credentials, "email": "bench@example.com"}
+    )
+    if response.status_code == 400:
+        response = await client.post("/auth/login", json=credentials)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_load(base_url: str, args: argparse.Namespace) -> dict:
+    """
+    Drive /analyze with ``args.concurrency`` concurrent workers.
+
+    Returns:
+        Results dictionary with counts, error breakdown, RPS and latency percentiles
+    """
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        token = await obtain_token(client)
+        headers = {"Authorization": f"Bearer {token}"}
+        texts = [build_text(args.text_size, i) for i in range(args.distinct_texts)]
+
+        async def one_request(i: int, latencies: Optional[List[float]], errors: Optional[Counter]):
+            payload = {"text": texts[i % len(texts)]}
+            start = time.perf_counter()
+            try:
+                response = await client.post("/analyze", json=payload, headers=headers)
+                status_key = None if response.status_code == 200 else str(response.status_code)
+            except httpx.HTTPError as e:
+                status_key = type(e).__name__
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if latencies is not None:
+                if status_key is None:
+                    latencies.append(elapsed_ms)
+                else:
+                    errors[status_key] += 1
+
+        async def worker(queue: asyncio.Queue, latencies, errors):
+            while True:
+                try:
+                    i = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await one_request(i, latencies, errors)
+
+        async def run_phase(total: int, latencies, errors) -> float:
+            queue: asyncio.Queue = asyncio.Queue()
+            for i in range(total):
+                queue.put_nowait(i)
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(queue, latencies, errors) for _ in range(args.concurrency)))
+            return time.perf_counter() - start
+
+        if args.warmup:
+            await run_phase(args.warmup, None, None)
+
+        latencies: List[float] = []
+        errors: Counter = Counter()
+        duration = await run_phase(args.requests, latencies, errors)
+
+    completed = len(latencies)
+    return {
+        "requests": args.requests,
+        "succeeded": completed,
+        "failed": sum(errors.values()),
+        "errors": dict(errors),
+        "duration_s": round(duration, 3),
+        "rps": round(args.requests / duration, 3) if duration else 0.0,
+        "success_rps": round(completed / duration, 3) if duration else 0.0,
+        "latency_ms": summarize_latencies(latencies),
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="End-to-end /analyze load benchmark")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent in-flight requests")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured warm-up requests")
+    parser.add_argument("--text-size", type=int, default=2000, help="Characters per request text")
+    parser.add_argument("--distinct-texts", type=int, default=50, help="Number of distinct texts to cycle through")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Client timeout per request (seconds)")
+    parser.add_argument("--database-url", default=None, help="Database URL (default: temporary SQLite file)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Enable the analysis cache and near-duplicate reuse (fresh per run)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for stub behaviour")
+    for name, latency in (("hf", "lognormal:150:0.4"), ("gemini", "lognormal:800:0.4")):
+        parser.add_argument(f"--{name}-latency", default=latency, help="Latency spec, e.g. fixed:50, uniform:20:80")
+        parser.add_argument(f"--{name}-error-rate", type=float, default=0.0, help="Fraction of 500 responses")
+        parser.add_argument(f"--{name}-burst-every", type=float, default=0.0, help="Seconds between 503 bursts")
+        parser.add_argument(f"--{name}-burst-length", type=float, default=0.0, help="Length of each 503 burst (seconds)")
+    parser.add_argument("--output", default=None, help="Write JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    profiles = {
+        name: StubProfile(
+            latency=getattr(args, f"{name}_latency"),
+            error_rate=getattr(args, f"{name}_error_rate"),
+            burst_every=getattr(args, f"{name}_burst_every"),
+            burst_length=getattr(args, f"{name}_burst_length"),
+            seed=args.seed,
+        )
+        for name in ("hf", "gemini")
+    }
+
+    hf_stub = StubServer(create_huggingface_stub(profiles["hf"])).start()
+    gemini_stub = StubServer(create_gemini_stub(profiles["gemini"])).start()
+
+    with tempfile.TemporaryDirectory(prefix="hybrid-bench-") as tmp:
+        env = app_environment(args, hf_stub.url, gemini_stub.url, tmp)
+        app = AppProcess(env, workers=args.workers)
+        try:
+            app.start()
+            results = asyncio.run(run_load(app.url, args))
+        finally:
+            app.stop()
+            hf_stub.stop()
+            gemini_stub.stop()
+
+    report = {
+        "benchmark": "analyze_load",
+        "meta": run_metadata(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "text_size": args.text_size,
+            "distinct_texts": args.distinct_texts,
+            "workers": args.workers,
+            "cache": args.cache,
+            "huggingface": profiles["hf"].describe(),
+            "gemini": profiles["gemini"].describe(),
+        },
+        "results": results,
+    }
+    write_report(report, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+Microbenchmarks for the pure-CPU code that runs on every request.
+
+Covers prompt building, Gemini response parsing, keyword tone detection,
+local extractive summarization, JWT encode/decode, API key verification
+(cache hit), bcrypt hashing and
+AnalyzeRequest validation, with input size sweeps up to the 50k character
+request limit. Logging is disabled while
+timing so results reflect the code itself.
+
+Usage (from the backend directory):
+    python -m benchmarks.micro --save baseline.json
+    python -m benchmarks.micro --compare baseline.json --threshold 0.10
+    python -m benchmarks.micro --filter gemini
+"""
+import argparse
+import json
+import statistics
+import sys
+import timeit
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from benchmarks.common import run_metadata, write_report
+from benchmarks.load import build_text
+
+TEXT_SIZES = (200, 2000, 10000, 50000)
+RESPONSE_SIZES = (200, 1000, 4000)
+
+
+def gemini_response(size: int, well_formed: bool = True) -> str:
+    """Build a Gemini-style response with a summary of roughly ``size`` characters."""
+    summary = build_text(size, 3)
+    if not well_formed:
+        return summary
+    return f"SUMMARY: {summary}\nTONE: neutral"
+
+
+def collect_cases() -> List[Tuple[str, Callable[[], object]]]:
+    """
+    Build the list of benchmark cases.
+
+    Returns:
+        (name, zero-argument callable) pairs; names encode the input size
+    """
+    from analysis.schemas import AnalyzeRequest
+    from analysis.services.gemini import GeminiService
+    from analysis.services.extractive import summarize
+    from auth.api_keys import ApiKeyCache, _CachedKey, generate_api_key
+    from auth.utils import create_access_token, decode_access_token, hash_password, verify_password
+
+    service = GeminiService.__new__(GeminiService)
+    cases: List[Tuple[str, Callable[[], object]]] = []
+
+    for size in TEXT_SIZES:
+        text = build_text(size, 0)
+        cases.append((f"gemini.build_prompt[{size}]", lambda t=text: service._build_prompt(t, "technology")))
+        cases.append((f"gemini.detect_tone_fallback[{size}]", lambda t=text: service._detect_tone_fallback(t)))
+        cases.append((f"extractive.summarize[{size}]", lambda t=text: summarize(t)))
+        payload = {"text": text}
+        payload_json = json.dumps(payload)
+        cases.append((f"schemas.analyze_request[{size}]", lambda p=payload: AnalyzeRequest(**p)))
+        cases.append((
+            f"schemas.analyze_request_json[{size}]",
+            lambda p=payload_json: AnalyzeRequest.model_validate_json(p)
+        ))
+
+    for size in RESPONSE_SIZES:
+        response = gemini_response(size)
+        malformed = gemini_response(size, well_formed=False)
+        cases.append((f"gemini.parse_response[{size}]", lambda r=response: service._parse_response(r)))
+        cases.append((f"gemini.parse_response_fallback[{size}]", lambda r=malformed: service._parse_response(r)))
+
+    token = create_access_token(data={"sub": "42"})
+    cases.append(("auth.create_access_token", lambda: create_access_token(data={"sub": "42"})))
+    cases.append(("auth.decode_access_token", lambda: decode_access_token(token)))
+
+    # Warm cache entry: what every request after the first one for a key costs
+    api_key, key_id, secret_hash = generate_api_key()
+    key_cache = ApiKeyCache(ttl=float("inf"), sync_interval=float("inf"))
+    key_cache._entries[key_id] = _CachedKey(secret_hash, None, object(), 0.0)
+    cases.append(("auth.verify_api_key", lambda: key_cache.resolve(None, api_key)))
+
+    password_hash = hash_password("benchpassword123")
+    cases.append(("auth.hash_password", lambda: hash_password("benchpassword123")))
+    cases.append(("auth.verify_password", lambda: verify_password("benchpassword123", password_hash)))
+
+    return cases
+
+
+def time_case(func: Callable[[], object], repeat: int, min_time: float) -> Dict[str, float]:
+    """
+    Time a callable with timeit.
+
+    The loop count is chosen so each repetition takes at least ``min_time``
+    seconds; the reported figures are per call, in microseconds.
+    """
+    timer = timeit.Timer(func)
+    loops = 1
+    while True:
+        elapsed = timer.timeit(loops)
+        if elapsed >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)))
+
+    samples = [t / loops * 1e6 for t in timer.repeat(repeat=repeat, number=loops)]
+    return {
+        "median_us": round(statistics.median(samples), 3),
+        "min_us": round(min(samples), 3),
+        "stdev_us": round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+        "loops": loops,
+        "repeat": repeat,
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> Dict[str, dict]:
+    """
+    Compare results against a baseline by median time per call.
+
+    Args:
+        results: Current results keyed by case name
+        baseline: Baseline results keyed by case name
+        threshold: Relative change treated as significant (0.10 = 10%)
+
+    Returns:
+        Per-case comparison with ratio and status (regression/improvement/ok)
+    """
+    comparison = {}
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous.get("median_us"):
+            continue
+        ratio = current["median_us"] / previous["median_us"]
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 - threshold:
+            status = "improvement"
+        else:
+            status = "ok"
+        comparison[name] = {
+            "baseline_us": previous["median_us"],
+            "current_us": current["median_us"],
+            "ratio": round(ratio, 3),
+            "status": status,
+        }
+    return comparison
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for per-request CPU hot paths")
+    parser.add_argument("--filter", default=None, help="Only run cases whose name contains this string")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per case")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per repetition")
+    parser.add_argument("--save", default=None, help="Save results as a baseline JSON file")
+    parser.add_argument("--compare", default=None, help="Baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Regression threshold (fraction)")
+    parser.add_argument("--output", default=None, help="Write JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logger.remove()
+
+    results = {}
+    for name, func in collect_cases():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = time_case(func, args.repeat, args.min_time)
+        print(f"{name:<45} {results[name]['median_us']:>14.3f} us", file=sys.stderr)
+
+    report = {
+        "benchmark": "micro",
+        "meta": run_metadata(),
+        "config": {"repeat": args.repeat, "min_time": args.min_time, "filter": args.filter},
+        "results": results,
+    }
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        comparison = compare(results, baseline.get("results", {}), args.threshold)
+        report["comparison"] = {
+            "baseline": args.compare,
+            "baseline_commit": baseline.get("meta", {}).get("git_commit"),
+            "threshold": args.threshold,
+            "cases": comparison,
+        }
+        regressions = [name for name, c in comparison.items() if c["status"] == "regression"]
+        for name in regressions:
+            c = comparison[name]
+            print(f"REGRESSION {name}: {c['baseline_us']} us -> {c['current_us']} us (x{c['ratio']})", file=sys.stderr)
+        if regressions:
+            exit_code = 1
+
+    if args.save:
+        write_report(report, args.save)
+    write_report(report, args.output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
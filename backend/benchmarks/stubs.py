@@ -0,0 +1,233 @@
+"""
+Local stand-in servers for the Hugging Face Inference API and Gemini.
+Used by the load benchmarks so /analyze can be exercised without paid API calls.
+
+Each stub has a configurable latency distribution, random error rate and
+periodic 503 bursts (mimicking "model is loading" / overload windows).
+"""
+import asyncio
+import hashlib
+import random
+import socket
+import threading
+import time
+from typing import List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class LatencySpec:
+    """
+    Latency distribution for a stub server.
+
+    Specs are written as ``name:param[:param]`` (all values in milliseconds):
+        fixed:50             always 50 ms
+        uniform:20:80        uniform between 20 and 80 ms
+        lognormal:120:0.5    log-normal with median 120 ms and sigma 0.5
+        exponential:100      exponential with mean 100 ms
+    """
+
+    DISTRIBUTIONS = ("fixed", "uniform", "lognormal", "exponential")
+
+    def __init__(self, spec: str = "fixed:0"):
+        parts = spec.split(":")
+        self.name = parts[0]
+        try:
+            self.params = [float(p) for p in parts[1:]]
+        except ValueError:
+            raise ValueError(f"Invalid latency spec: {spec}")
+
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2, "exponential": 1}
+        if self.name not in expected or len(self.params) != expected[self.name]:
+            raise ValueError(
+                f"Invalid latency spec: {spec} (expected one of {', '.join(self.DISTRIBUTIONS)})"
+            )
+        self.spec = spec
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw one latency sample in seconds."""
+        if self.name == "fixed":
+            ms = self.params[0]
+        elif self.name == "uniform":
+            ms = rng.uniform(self.params[0], self.params[1])
+        elif self.name == "lognormal":
+            median, sigma = self.params
+            ms = median * rng.lognormvariate(0.0, sigma) if median > 0 else 0.0
+        else:
+            ms = rng.expovariate(1.0 / self.params[0]) if self.params[0] > 0 else 0.0
+        return max(ms, 0.0) / 1000.0
+
+
+class StubProfile:
+    """Behaviour of a stub server: latency, random errors and 503 bursts."""
+
+    def __init__(
+        self,
+        latency: str = "fixed:0",
+        error_rate: float = 0.0,
+        burst_every: float = 0.0,
+        burst_length: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.latency = LatencySpec(latency)
+        self.error_rate = error_rate
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.rng = random.Random(seed)
+        self.started_at = time.monotonic()
+
+    def in_burst(self) -> bool:
+        """Whether the server is currently inside a 503 burst window."""
+        if self.burst_every <= 0 or self.burst_length <= 0:
+            return False
+        return (time.monotonic() - self.started_at) % self.burst_every < self.burst_length
+
+    def should_fail(self) -> bool:
+        """Roll for a random (non-burst) error."""
+        return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+    def describe(self) -> dict:
+        """Profile as a JSON-serializable dictionary for benchmark reports."""
+        return {
+            "latency": self.latency.spec,
+            "error_rate": self.error_rate,
+            "burst_every": self.burst_every,
+            "burst_length": self.burst_length,
+        }
+
+
+def _text_digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _classification(text: str, labels: List[str]) -> dict:
+    offset = _text_digest(text) % len(labels)
+    ordered = labels[offset:] + labels[:offset]
+    weights = [1.0 / (rank + 1) ** 2 for rank in range(len(ordered))]
+    total = sum(weights)
+    return {
+        "sequence": text,
+        "labels": ordered,
+        "scores": [w / total for w in weights]
+    }
+
+
+def create_huggingface_stub(profile: StubProfile) -> FastAPI:
+    """
+    Build a stand-in for the Hugging Face zero-shot classification endpoint.
+
+    Serves ``POST /models/{model}`` with the same response shape as the
+    Inference API: one classification for a string ``inputs``, a list of
+    them for a list (micro-batched requests). The winning label is derived
+    from a hash of the input so repeated texts classify consistently.
+    """
+    app = FastAPI()
+
+    @app.post("/models/{model:path}")
+    async def classify(model: str, request: Request):
+        await asyncio.sleep(profile.latency.sample(profile.rng))
+
+        if profile.in_burst():
+            return JSONResponse(
+                status_code=503,
+                content={"error": f"Model {model} is currently loading", "estimated_time": 20.0}
+            )
+        if profile.should_fail():
+            return JSONResponse(status_code=500, content={"error": "Internal Server Error"})
+
+        payload = await request.json()
+        inputs = payload.get("inputs", "")
+        labels = list(payload.get("parameters", {}).get("candidate_labels", []))
+        if not labels:
+            return JSONResponse(status_code=400, content={"error": "candidate_labels required"})
+
+        if isinstance(inputs, list):
+            return [_classification(str(text), labels) for text in inputs]
+        return _classification(inputs, labels)
+
+    return app
+
+
+def create_gemini_stub(profile: StubProfile) -> FastAPI:
+    """
+    Build a stand-in for the Gemini ``generateContent`` REST endpoint.
+
+    Serves ``POST /v1beta/models/{model}:generateContent`` and answers in the
+    SUMMARY/TONE format requested by ``GeminiService._build_prompt``. Requires
+    the service to use the REST transport (``GEMINI_TRANSPORT=rest``).
+    """
+    app = FastAPI()
+    tones = ("positive", "neutral", "negative")
+
+    @app.post("/v1beta/models/{model_action:path}")
+    async def generate_content(model_action: str, request: Request):
+        await asyncio.sleep(profile.latency.sample(profile.rng))
+
+        if profile.in_burst():
+            return JSONResponse(
+                status_code=503,
+                content={"error": {"code": 503, "message": "The model is overloaded.", "status": "UNAVAILABLE"}}
+            )
+        if profile.should_fail():
+            return JSONResponse(
+                status_code=500,
+                content={"error": {"code": 500, "message": "Internal error.", "status": "INTERNAL"}}
+            )
+
+        payload = await request.json()
+        prompt = ""
+        for content in payload.get("contents", []):
+            for part in content.get("parts", []):
+                prompt += part.get("text", "")
+
+        tone = tones[_text_digest(prompt) % len(tones)]
+        text = f"SUMMARY: Stub summary of a {len(prompt)}-character prompt.\nTONE: {tone}"
+
+        return {
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0
+            }],
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": 20}
+        }
+
+    return app
+
+
+def free_port() -> int:
+    """Find a free local TCP port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StubServer:
+    """Runs an ASGI stub app with uvicorn on a background thread."""
+
+    def __init__(self, app: FastAPI, port: Optional[int] = None):
+        self.port = port or free_port()
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", access_log=False)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 10.0) -> "StubServer":
+        """Start the server and wait until it accepts connections."""
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Stub server on port {self.port} failed to start")
+            time.sleep(0.02)
+        return self
+
+    def stop(self) -> None:
+        """Signal the server to exit and wait for the thread."""
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
@@ -2,19 +2,102 @@
 Database connection and session management.
 Provides SQLAlchemy engine and session factory.
 """
+import os
+import time
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+import metrics
+import timing
 from config import get_settings
 
 settings = get_settings()
 
+
+class PoolMetrics:
+    """Checkout wait times and timeouts for the connection pool."""
+
+    def __init__(self):
+        self.wait_seconds = metrics.Histogram()
+        self.timeouts = 0
+
+
+pool_metrics = PoolMetrics()
+
+
+class _TimedPoolMixin:
+    """Records how long each checkout waits for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        finally:
+            pool_metrics.wait_seconds.observe(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    """QueuePool with checkout wait metrics."""
+
+
+class TimedNullPool(_TimedPoolMixin, NullPool):
+    """NullPool with connect time metrics."""
+
+
+def resolve_pool_profile(profile: str) -> str:
+    """
+    Resolve the configured pool profile.
+
+    'auto' picks 'serverless' on Vercel/Lambda, where each instance would
+    otherwise hold its own pool, and 'server' everywhere else.
+    """
+    if profile == "auto":
+        if os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+            return "serverless"
+        return "server"
+    if profile not in ("serverless", "server"):
+        raise ValueError(f"Unknown database pool profile: {profile}")
+    return profile
+
+
+def engine_options(app_settings) -> dict:
+    """
+    Build create_engine keyword arguments for the configured pool profile.
+
+    serverless: no pooling in-process (NullPool); pair with an external
+        pooler such as PgBouncer or the Neon/Supabase pooled endpoint.
+    server: explicit pool size, overflow, recycle and timeout.
+    """
+    options = {
+        "pool_pre_ping": True,  # Verify connections before using
+        "echo": False  # Set to True for SQL query logging
+    }
+
+    url = app_settings.database_url
+    if url.startswith("sqlite") and ":memory:" in url:
+        return options
+
+    if resolve_pool_profile(app_settings.db_pool_profile) == "serverless":
+        options["poolclass"] = TimedNullPool
+    else:
+        options.update({
+            "poolclass": TimedQueuePool,
+            "pool_size": app_settings.db_pool_size,
+            "max_overflow": app_settings.db_max_overflow,
+            "pool_recycle": app_settings.db_pool_recycle,
+            "pool_timeout": app_settings.db_pool_timeout,
+        })
+    return options
+
+
 # Create SQLAlchemy engine
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,  # Verify connections before using
-    echo=False  # Set to True for SQL query logging
-)
+engine = create_engine(settings.database_url, **engine_options(settings))
+timing.instrument_engine(engine)
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -23,6 +106,34 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def pool_snapshot() -> dict:
+    """Current pool state and checkout wait statistics."""
+    pool = engine.pool
+    snapshot = {
+        "profile": resolve_pool_profile(settings.db_pool_profile),
+        "pool_class": type(pool).__name__,
+        "checkout_wait_seconds": pool_metrics.wait_seconds.snapshot(),
+        "timeouts": pool_metrics.timeouts,
+    }
+
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        checked_out = pool.checkedout()
+        snapshot.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": checked_out,
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "saturation": round(checked_out / capacity, 4) if capacity else 0.0,
+        })
+
+    return snapshot
+
+
+metrics.register("db_pool", pool_snapshot)
+
+
 def get_db():
     """
     Dependency function to get database session.
@@ -0,0 +1,56 @@
+"""
+Command-line export of analysis history.
+Streams analysis_logs to a file (or stdout) without loading them into memory.
+
+Usage (from the backend directory):
+    python export.py --format ndjson --output history.ndjson
+    python export.py --format csv --user-id 42 > user42.csv
+    python export.py --format parquet --since 2024-01-01 --output history.parquet
+    python export.py --include-archived --user-id 42 > user42-all.ndjson
+"""
+import argparse
+import sys
+from datetime import datetime
+from config import get_settings
+from database import SessionLocal
+from analysis.export import EXPORT_FORMATS, iter_history_rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Export analysis history")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--user-id", type=int, default=None, help="Only this user's history")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None, help="ISO date/time (inclusive)")
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None, help="ISO date/time (exclusive)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows fetched per round trip")
+    parser.add_argument("--output", default=None, help="Output file (default: stdout)")
+    parser.add_argument("--include-archived", action="store_true", help="Also read the cold-tier archive (ARCHIVE_DIR)")
+    args = parser.parse_args()
+
+    _, serializer = EXPORT_FORMATS[args.format]
+    if args.format == "parquet" and args.output is None:
+        parser.error("--output is required for parquet")
+
+    db = SessionLocal()
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        archive_dir = get_settings().archive_dir if args.include_archived else None
+        rows = iter_history_rows(
+            db,
+            user_id=args.user_id,
+            since=args.since,
+            until=args.until,
+            batch_size=args.batch_size,
+            archive_dir=archive_dir
+        )
+        for chunk in serializer(rows):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
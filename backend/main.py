@@ -2,14 +2,25 @@
 Main FastAPI application.
 Initializes app, configures middleware, and registers routes.
 """
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from sqlalchemy.orm import Session
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
+import asyncio
 import sys
+import metrics
 from config import get_settings
-from database import init_db
+from database import get_db
+from middleware import ServerTimingMiddleware, StripPrefixMiddleware
+from auth.middleware import claims_admin, get_admin_user, is_admin
+from auth.models import User
 from auth.routes import router as auth_router
 from analysis.routes import router as analysis_router
+from admin.routes import router as admin_router
+from profiling import ProfilingMiddleware, get_profile_store
 
 # Configure logging
 logger.remove()
@@ -31,23 +42,48 @@ except OSError:
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background tasks. Schema creation runs separately via migrate.py."""
+    logger.info("Starting Hybrid-Analyzer API")
+    
+    if settings.near_duplicate_enabled and settings.near_duplicate_rebuild_limit:
+        # Runs in the background so it never delays serving
+        from analysis.similarity import rebuild_near_duplicate_index
+        asyncio.get_running_loop().run_in_executor(None, rebuild_near_duplicate_index)
+    
+    if settings.partition_maintenance_on_startup and settings.database_url.startswith("postgresql"):
+        # Creates upcoming analysis_logs partitions and applies retention
+        from partitions import run_partition_maintenance
+        asyncio.get_running_loop().run_in_executor(None, run_partition_maintenance)
+    
+    warmer = None
+    if settings.huggingface_warmup_enabled:
+        from analysis.services.huggingface import huggingface_service
+        from analysis.warmup import UpstreamWarmer
+        warmer = UpstreamWarmer(huggingface_service, keepalive_interval=settings.huggingface_keepalive_interval)
+        warmer.start()
+        metrics.register("huggingface_warmup", warmer.stats)
+    
+    yield
+    
+    if warmer is not None:
+        await warmer.stop()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Hybrid-Analyzer API",
     description="AI-powered text analysis using Hugging Face and Gemini",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
-# Middleware to strip /api prefix for Vercel routing
-@app.middleware("http")
-async def strip_api_prefix(request: Request, call_next):
-    if request.url.path.startswith("/api"):
-        # Strip /api from the path
-        path = request.url.path[4:]
-        request.scope["path"] = path
-    return await call_next(request)
+# Strip /api prefix for Vercel routing
+app.add_middleware(StripPrefixMiddleware, prefix="/api")
 
 # Configure CORS
 app.add_middleware(
@@ -56,24 +92,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Id"],
 )
 
+# Samples requests sent with X-Profile: 1 (kept for admins only)
+if settings.profiling_enabled:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=get_profile_store(),
+        authorize=is_admin,
+        precheck=claims_admin,
+        interval=settings.profile_interval_ms / 1000,
+        max_concurrent=settings.profile_max_concurrent,
+        max_seconds=settings.profile_max_seconds
+    )
+
+# Outermost, so "total" covers the whole request
+app.add_middleware(ServerTimingMiddleware, allow_origins=settings.cors_origins)
+
 # Register routes
 app.include_router(auth_router)
 app.include_router(analysis_router)
-
-
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database on startup."""
-    logger.info("Starting Hybrid-Analyzer API")
-    logger.info("Initializing database...")
-    try:
-        init_db()
-        logger.info("Database initialized successfully")
-    except Exception as e:
-        logger.error(f"Database initialization failed: {e}")
-        # We don't raise here so the app can still start and return health checks/logs
+app.include_router(admin_router)
 
 
 @app.get("/")
@@ -96,6 +136,51 @@ async def health_check():
     }
 
 
+def _database_reachable(db: Session) -> bool:
+    try:
+        db.execute(text("SELECT 1"))
+        return True
+    except Exception as e:
+        logger.warning(f"Readiness check: database unreachable: {str(e)}")
+        return False
+
+
+@app.get("/ready")
+async def readiness_check(db: Session = Depends(get_db)):
+    """
+    Readiness probe.
+    
+    Checks that the database answers and reports the Hugging Face model
+    state known from recent calls; never calls the upstream APIs. Returns
+    503 when the database is unreachable (or the model is not warm and
+    READY_REQUIRES_WARM_UPSTREAM is set).
+    """
+    from analysis.services.huggingface import huggingface_service
+    
+    database_ok = await asyncio.to_thread(_database_reachable, db)
+    upstream = huggingface_service.warmth(settings.ready_warm_window)
+    ready = database_ok and (upstream["state"] == "warm" or not settings.ready_requires_warm_upstream)
+    
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "database": "ok" if database_ok else "unreachable",
+            "huggingface": upstream
+        }
+    )
+
+
+@app.get("/metrics")
+async def metrics_snapshot(admin: User = Depends(get_admin_user)):
+    """
+    In-process metrics (connection pool, etc.) as JSON.
+    
+    Admin only: it includes per-user scheduler state and cache internals.
+    """
+    return metrics.snapshot()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
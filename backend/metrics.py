@@ -0,0 +1,72 @@
+"""
+In-process metrics registry.
+Components register snapshot callables; GET /metrics returns them as JSON.
+"""
+import math
+import threading
+from collections import deque
+from typing import Callable, Dict
+
+
+class Histogram:
+    """Rolling window of observations with summary percentiles."""
+
+    def __init__(self, window: int = 1024):
+        self._values = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        with self._lock:
+            self._values.append(value)
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Summarize observations.
+
+        Returns:
+            count, mean and max over all observations; p50/p95/p99 over the recent window
+        """
+        with self._lock:
+            ordered = sorted(self._values)
+            count, total, maximum = self.count, self.total, self.max
+
+        def pct(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1)]
+
+        return {
+            "count": count,
+            "mean": round(total / count, 6) if count else 0.0,
+            "p50": round(pct(50), 6),
+            "p95": round(pct(95), 6),
+            "p99": round(pct(99), 6),
+            "max": round(maximum, 6),
+        }
+
+
+_sources: Dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, source: Callable[[], dict]) -> None:
+    """
+    Register a metrics source.
+
+    Args:
+        name: Key under which the snapshot is reported
+        source: Zero-argument callable returning a JSON-serializable dict
+    """
+    _sources[name] = source
+
+
+def snapshot() -> Dict[str, dict]:
+    """Collect snapshots from all registered sources."""
+    return {name: source() for name, source in _sources.items()}
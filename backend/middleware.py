@@ -0,0 +1,74 @@
+"""
+ASGI middleware for the application.
+
+Both classes are plain ASGI callables rather than BaseHTTPMiddleware, so
+they add no extra task or response stream wrapping per request and pass
+streaming responses through untouched.
+"""
+import time
+from typing import Iterable
+import timing
+
+
+class StripPrefixMiddleware:
+    """
+    Serve routes under an extra path prefix (e.g. ``/api`` on Vercel).
+
+    ``/api/analyze`` is routed as ``/analyze``; paths without the prefix
+    are left as they are.
+    """
+
+    def __init__(self, app, prefix: str = "/api"):
+        self.app = app
+        self.prefix = prefix.rstrip("/")
+        self._raw_prefix = self.prefix.encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            path = scope["path"]
+            if path == self.prefix or path.startswith(self.prefix + "/"):
+                scope = dict(scope)
+                scope["path"] = path[len(self.prefix):] or "/"
+                raw_path = scope.get("raw_path")
+                if raw_path and raw_path.startswith(self._raw_prefix):
+                    scope["raw_path"] = raw_path[len(self._raw_prefix):] or b"/"
+        await self.app(scope, receive, send)
+
+
+class ServerTimingMiddleware:
+    """
+    Add a Server-Timing header with the request's stage durations.
+
+    Stages recorded through ``timing.stage()`` before the response starts
+    (auth, classify, summarize, db, ...) are reported along with ``total``.
+
+    Args:
+        app: Wrapped ASGI application
+        allow_origins: Origins allowed to read the timings from the browser
+            (sent as Timing-Allow-Origin)
+    """
+
+    def __init__(self, app, allow_origins: Iterable[str] = ()):
+        self.app = app
+        origins = ", ".join(allow_origins)
+        self._allow_origin = origins.encode("latin-1") if origins else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        begin = time.perf_counter()
+        timings = timing.start()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                value = timing.header_value(timings, time.perf_counter() - begin)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", value.encode("latin-1")))
+                if self._allow_origin:
+                    headers.append((b"timing-allow-origin", self._allow_origin))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
@@ -0,0 +1,49 @@
+"""
+Database migration step.
+Applies the Alembic migrations (backend/migrations) so schema changes stay out
+of the request-serving startup path.
+
+Usage (from the backend directory):
+    python migrate.py
+
+Equivalent to ``alembic upgrade head``. Databases created before migrations
+were introduced are adopted by the baseline revision.
+"""
+import os
+import sys
+from alembic import command
+from alembic.config import Config
+from loguru import logger
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+
+def alembic_config(database_url: str = None) -> Config:
+    """
+    Alembic configuration for this backend.
+
+    Args:
+        database_url: Database to migrate (default: DATABASE_URL from settings)
+    """
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "migrations"))
+    config.attributes["configure_logging"] = False
+    if database_url:
+        config.attributes["database_url"] = database_url
+    return config
+
+
+def main() -> int:
+    """Upgrade the database to the latest revision. Returns a process exit code."""
+    logger.info("Migrating database...")
+    try:
+        command.upgrade(alembic_config(), "head")
+    except Exception as e:
+        logger.error(f"Database migration failed: {e}")
+        return 1
+    logger.info("Database migrated successfully")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Baseline schema
+
+Creates users, label_vocabulary and analysis_logs. Databases created before
+migrations were introduced (by ``Base.metadata.create_all`` or
+``database/schema.sql``) are brought up to date: existing tables are kept and
+only missing columns are added.
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-06-01 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _tables():
+    metadata = sa.MetaData()
+    users = sa.Table(
+        "users", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("username", sa.String(50), unique=True, nullable=False, index=True),
+        sa.Column("email", sa.String(100), unique=True, nullable=False, index=True),
+        sa.Column("password_hash", sa.String(255), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    label_vocabulary = sa.Table(
+        "label_vocabulary", metadata,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("label", sa.String(100), unique=True, nullable=False),
+    )
+    analysis_logs = sa.Table(
+        "analysis_logs", metadata,
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("input_text", sa.Text, nullable=False),
+        sa.Column("category", sa.String(100)),
+        sa.Column("confidence_score", sa.Float),
+        sa.Column("summary", sa.Text),
+        sa.Column("tone", sa.String(20)),
+        sa.Column("model", sa.String(64)),
+        sa.Column("text_fingerprint", sa.BigInteger),
+        sa.Column("label_set", sa.String(32)),
+        sa.Column("score_label_ids", sa.LargeBinary),
+        sa.Column("score_values", sa.LargeBinary),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Index("idx_analysis_logs_user_id", "user_id"),
+        sa.Index("idx_analysis_logs_created_at", "created_at"),
+    )
+    return metadata, [users, label_vocabulary, analysis_logs]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    metadata, tables = _tables()
+
+    for table in tables:
+        if not inspector.has_table(table.name):
+            table.create(bind)
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                # Columns added after the first release are all nullable
+                op.add_column(table.name, sa.Column(column.name, column.type))
+
+
+def downgrade() -> None:
+    op.drop_table("analysis_logs")
+    op.drop_table("label_vocabulary")
+    op.drop_table("users")
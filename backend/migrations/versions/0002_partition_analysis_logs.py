@@ -0,0 +1,119 @@
+"""Partition analysis_logs by month (PostgreSQL)
+
+Turns analysis_logs into a table range-partitioned on created_at with one
+partition per calendar month (analysis_logs_pYYYYMM). Existing rows are
+copied into partitions covering their months, and partitions for the next
+three months are created; partitions.py keeps creating future months and
+applies retention by detaching or dropping whole partitions.
+
+The primary key becomes (id, created_at), as PostgreSQL requires the
+partition key in unique constraints; ids still come from the same sequence
+and remain unique. created_at becomes NOT NULL.
+
+The copy runs in the migration transaction and locks analysis_logs while it
+runs; schedule it with the table's size in mind. Other databases (SQLite in
+development and tests) keep the plain table.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-06-01 00:00:01
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+
+def _relkind(bind, table: str):
+    return bind.exec_driver_sql(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = %(table)s AND n.nspname = current_schema()",
+        {"table": table}
+    ).scalar()
+
+
+def _columns(bind, table: str):
+    return list(bind.exec_driver_sql(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_name = %(table)s AND table_schema = current_schema() ORDER BY ordinal_position",
+        {"table": table}
+    ).scalars())
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or _relkind(bind, "analysis_logs") == "p":
+        return
+
+    op.execute("LOCK TABLE analysis_logs IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE analysis_logs RENAME TO analysis_logs_unpartitioned")
+    # Keep the id sequence when the old table is dropped
+    op.execute("ALTER SEQUENCE IF EXISTS analysis_logs_id_seq OWNED BY NONE")
+
+    # Same columns and defaults (the id default keeps using the sequence)
+    op.execute(
+        "CREATE TABLE analysis_logs (LIKE analysis_logs_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    op.execute("ALTER TABLE analysis_logs ALTER COLUMN created_at SET NOT NULL")
+    op.execute("ALTER SEQUENCE analysis_logs_id_seq OWNED BY analysis_logs.id")
+
+    # One partition per month from the oldest row through MONTHS_AHEAD
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            first_month DATE;
+            last_month DATE := date_trunc('month', now())::date + interval '{MONTHS_AHEAD} months';
+            month DATE;
+        BEGIN
+            SELECT date_trunc('month', COALESCE(min(created_at), now()))::date
+              INTO first_month FROM analysis_logs_unpartitioned;
+            month := first_month;
+            WHILE month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF analysis_logs FOR VALUES FROM (%L) TO (%L)',
+                    'analysis_logs_p' || to_char(month, 'YYYYMM'), month, (month + interval '1 month')::date
+                );
+                month := (month + interval '1 month')::date;
+            END LOOP;
+        END $$
+        """
+    )
+
+    columns = _columns(bind, "analysis_logs_unpartitioned")
+    values = ", ".join("COALESCE(created_at, now())" if column == "created_at" else column for column in columns)
+    op.execute(
+        f"INSERT INTO analysis_logs ({', '.join(columns)}) SELECT {values} FROM analysis_logs_unpartitioned"
+    )
+    op.execute("DROP TABLE analysis_logs_unpartitioned")
+
+    # Keys and indexes are built after the copy (and once the old names are
+    # free); indexes on the parent cover every current and future partition
+    op.execute("ALTER TABLE analysis_logs ADD PRIMARY KEY (id, created_at)")
+    op.execute("ALTER TABLE analysis_logs ADD FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE")
+    op.execute("CREATE INDEX idx_analysis_logs_user_id ON analysis_logs (user_id, created_at)")
+    op.execute("CREATE INDEX idx_analysis_logs_created_at ON analysis_logs (created_at)")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or _relkind(bind, "analysis_logs") != "p":
+        return
+
+    op.execute("ALTER TABLE analysis_logs RENAME TO analysis_logs_partitioned")
+    op.execute("ALTER SEQUENCE analysis_logs_id_seq OWNED BY NONE")
+    op.execute("CREATE TABLE analysis_logs (LIKE analysis_logs_partitioned INCLUDING DEFAULTS)")
+    op.execute("ALTER TABLE analysis_logs ALTER COLUMN created_at DROP NOT NULL")
+    op.execute("ALTER SEQUENCE analysis_logs_id_seq OWNED BY analysis_logs.id")
+    columns = ", ".join(_columns(bind, "analysis_logs_partitioned"))
+    op.execute(f"INSERT INTO analysis_logs ({columns}) SELECT {columns} FROM analysis_logs_partitioned")
+    op.execute("DROP TABLE analysis_logs_partitioned")
+    op.execute("ALTER TABLE analysis_logs ADD PRIMARY KEY (id)")
+    op.execute("ALTER TABLE analysis_logs ADD FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE")
+    op.execute("CREATE INDEX idx_analysis_logs_user_id ON analysis_logs (user_id)")
+    op.execute("CREATE INDEX idx_analysis_logs_created_at ON analysis_logs (created_at)")
@@ -0,0 +1,65 @@
+"""Content-addressed texts table
+
+Adds ``texts`` (one compressed copy of each distinct input, keyed by its
+SHA-256) and ``analysis_logs.text_hash`` referencing it. New logs store the
+full input there instead of a truncated copy in ``input_text``, which
+becomes nullable; existing rows keep their copy and are read as before.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-06-15 00:00:00
+"""
+import zlib
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("texts"):
+        op.create_table(
+            "texts",
+            sa.Column("hash", sa.String(64), primary_key=True),
+            sa.Column("codec", sa.String(8), nullable=False),
+            sa.Column("size", sa.Integer, nullable=False),
+            sa.Column("content", sa.LargeBinary, nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+
+    columns = {column["name"]: column for column in inspector.get_columns("analysis_logs")}
+    with op.batch_alter_table("analysis_logs") as batch:
+        if "text_hash" not in columns:
+            batch.add_column(sa.Column("text_hash", sa.String(64)))
+        if not columns["input_text"]["nullable"]:
+            batch.alter_column("input_text", existing_type=sa.Text, nullable=True)
+
+    indexes = {index["name"] for index in inspector.get_indexes("analysis_logs")}
+    if "ix_analysis_logs_text_hash" not in indexes:
+        op.create_index("ix_analysis_logs_text_hash", "analysis_logs", ["text_hash"])
+
+
+def downgrade() -> None:
+    # Give logs written since the upgrade their text back, truncated as before
+    bind = op.get_bind()
+    rows = bind.execute(sa.text(
+        "SELECT l.id, t.codec, t.content FROM analysis_logs l JOIN texts t ON t.hash = l.text_hash "
+        "WHERE l.input_text IS NULL"
+    )).fetchall()
+    for log_id, codec, content in rows:
+        raw = zlib.decompress(content) if codec == "zlib" else bytes(content)
+        bind.execute(
+            sa.text("UPDATE analysis_logs SET input_text = :text WHERE id = :id"),
+            {"text": raw.decode("utf-8")[:1000], "id": log_id}
+        )
+
+    op.drop_index("ix_analysis_logs_text_hash", table_name="analysis_logs")
+    with op.batch_alter_table("analysis_logs") as batch:
+        batch.drop_column("text_hash")
+        batch.alter_column("input_text", existing_type=sa.Text, nullable=False)
+    op.drop_table("texts")
@@ -0,0 +1,43 @@
+"""DEFAULT partition for analysis_logs (PostgreSQL)
+
+Without it, an insert dated past the last pre-created month fails (and
+with it /analyze, bulk ingestion and analysis sessions) whenever partition
+maintenance has not run in time. Rows that land in analysis_logs_default
+are moved into their monthly partition by the next maintenance run
+(partitions.ensure_partitions). Other databases keep the plain table.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-07-15 00:00:00
+"""
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+DEFAULT_PARTITION = "analysis_logs_default"
+
+
+def _is_partitioned(bind) -> bool:
+    return bind.exec_driver_sql(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = 'analysis_logs' AND n.nspname = current_schema()"
+    ).scalar() == "p"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or not _is_partitioned(bind):
+        return
+    op.execute(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF analysis_logs DEFAULT")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or not _is_partitioned(bind):
+        return
+    if bind.exec_driver_sql(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION})").scalar():
+        raise RuntimeError(f"{DEFAULT_PARTITION} still holds rows; run partitions.py to move them first")
+    op.execute(f"DROP TABLE IF EXISTS {DEFAULT_PARTITION}")
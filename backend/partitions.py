@@ -0,0 +1,295 @@
+"""
+Monthly partition maintenance for analysis_logs (PostgreSQL).
+
+Migration 0002 range-partitions analysis_logs on created_at, one partition
+per calendar month named analysis_logs_pYYYYMM. This module keeps
+partitions for upcoming months in place and applies retention: partitions
+entirely older than the retention window are detached (and dropped, unless
+the mode is "detach"), which is a metadata operation regardless of how
+many rows they hold.
+
+Rows dated past the last created month go to the DEFAULT partition
+(analysis_logs_default, migration 0005) instead of failing; maintenance
+creates the partitions for their months and moves them there.
+
+Runs at startup (PARTITION_MAINTENANCE_ON_STARTUP) and should also run
+daily from cron so partitions exist even if the API is not restarted:
+
+    python partitions.py
+    python partitions.py --dry-run --today 2025-01-01
+"""
+import argparse
+import re
+import sys
+from datetime import date
+from typing import List, Optional, Tuple
+from loguru import logger
+from sqlalchemy import text
+from config import get_settings
+
+PARENT_TABLE = "analysis_logs"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+RETENTION_MODES = ("drop", "detach")
+
+# Serializes maintenance across workers and cron
+ADVISORY_LOCK_ID = 0x616C6F67  # "alog"
+
+_PARTITION_RE = re.compile(rf"^{PARENT_TABLE}_p(\d{{4}})(\d{{2}})$")
+
+settings = get_settings()
+
+
+def month_start(day: date) -> date:
+    """First day of the month containing ``day``."""
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month ``months`` after (or before, if negative) ``month``."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Name of the partition holding ``month``."""
+    return f"{PARENT_TABLE}_p{month.year:04d}{month.month:02d}"
+
+
+def parse_partition_name(name: str) -> Optional[date]:
+    """Month covered by a partition, or None for tables not named by this module."""
+    match = _PARTITION_RE.match(name)
+    if match is None:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def is_partitioned(conn) -> bool:
+    """Whether analysis_logs is a partitioned table on this connection's database."""
+    if conn.dialect.name != "postgresql":
+        return False
+    relkind = conn.execute(
+        text(
+            "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relname = :table AND n.nspname = current_schema()"
+        ),
+        {"table": PARENT_TABLE}
+    ).scalar()
+    return relkind == "p"
+
+
+def list_partitions(conn) -> List[Tuple[date, str]]:
+    """
+    Attached monthly partitions of analysis_logs.
+
+    Returns:
+        (month, table name) pairs, oldest first
+    """
+    names = conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "JOIN pg_namespace n ON n.oid = parent.relnamespace "
+            "WHERE parent.relname = :table AND n.nspname = current_schema()"
+        ),
+        {"table": PARENT_TABLE}
+    ).scalars()
+    partitions = [(parse_partition_name(name), name) for name in names]
+    return sorted(partition for partition in partitions if partition[0] is not None)
+
+
+def default_partition_months(conn) -> Optional[List[date]]:
+    """
+    Months of the rows held by the DEFAULT partition.
+
+    Returns:
+        Months, oldest first, or None if there is no DEFAULT partition
+    """
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar() is None:
+        return None
+    months = conn.execute(
+        text(f"SELECT DISTINCT date_trunc('month', created_at)::date FROM \"{DEFAULT_PARTITION}\"")
+    ).scalars()
+    return sorted(months)
+
+
+def _create_partition(conn, month: date, move_default_rows: bool) -> None:
+    """Create one monthly partition, first taking its rows out of the DEFAULT partition."""
+    start, end = month.isoformat(), add_months(month, 1).isoformat()
+    if move_default_rows:
+        # PostgreSQL refuses the new partition while the DEFAULT one holds
+        # rows in its range; detaching locks the parent until commit
+        conn.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{DEFAULT_PARTITION}"'))
+    conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(month)}" PARTITION OF {PARENT_TABLE} '
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    ))
+    if move_default_rows:
+        in_month = f"created_at >= '{start}' AND created_at < '{end}'"
+        conn.execute(text(f'INSERT INTO {PARENT_TABLE} SELECT * FROM "{DEFAULT_PARTITION}" WHERE {in_month}'))
+        conn.execute(text(f'DELETE FROM "{DEFAULT_PARTITION}" WHERE {in_month}'))
+        conn.execute(text(f'ALTER TABLE {PARENT_TABLE} ATTACH PARTITION "{DEFAULT_PARTITION}" DEFAULT'))
+
+
+def ensure_partitions(conn, months_ahead: int, today: Optional[date] = None, dry_run: bool = False) -> List[str]:
+    """
+    Create missing partitions from the current month through ``months_ahead``.
+
+    Months with rows in the DEFAULT partition (maintenance did not run in
+    time) also get their partition, and those rows are moved into it.
+
+    Args:
+        conn: Connection inside a transaction
+        months_ahead: Future months to cover beyond the current one
+        today: Reference date (default: today)
+        dry_run: Only report what would be created
+
+    Returns:
+        Names of the partitions created
+    """
+    current = month_start(today or date.today())
+    existing = {month for month, _ in list_partitions(conn)}
+    stranded = set(default_partition_months(conn) or [])
+    wanted = {add_months(current, offset) for offset in range(max(months_ahead, 0) + 1)} | stranded
+    created = []
+    for month in sorted(wanted - existing):
+        if not dry_run:
+            _create_partition(conn, month, move_default_rows=month in stranded)
+        created.append(partition_name(month))
+    if stranded and not dry_run:
+        logger.warning(f"Moved rows out of {DEFAULT_PARTITION} for {len(stranded)} month(s)")
+    return created
+
+
+def apply_retention(
+    conn,
+    retention_months: int,
+    mode: str = "drop",
+    today: Optional[date] = None,
+    dry_run: bool = False
+) -> List[str]:
+    """
+    Detach (and drop) partitions older than the retention window.
+
+    A partition is removed once every row it can hold is older than
+    ``retention_months`` full months before the current month.
+
+    Args:
+        conn: Connection inside a transaction
+        retention_months: Months of history to keep (0 disables retention)
+        mode: "drop" to delete expired partitions, "detach" to keep them as
+            standalone tables for archiving
+        today: Reference date (default: today)
+        dry_run: Only report what would be removed
+
+    Returns:
+        Names of the partitions removed
+
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    if mode not in RETENTION_MODES:
+        raise ValueError(f"Unknown retention mode: {mode}")
+    if retention_months <= 0:
+        return []
+
+    cutoff = add_months(month_start(today or date.today()), -retention_months)
+    expired = [name for month, name in list_partitions(conn) if month < cutoff]
+    if dry_run or not expired:
+        return expired
+
+    # Fail fast instead of queueing behind long queries on the parent
+    conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+    for name in expired:
+        conn.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{name}"'))
+        if mode == "drop":
+            conn.execute(text(f'DROP TABLE "{name}"'))
+    return expired
+
+
+def maintain(
+    engine,
+    months_ahead: Optional[int] = None,
+    retention_months: Optional[int] = None,
+    mode: Optional[str] = None,
+    today: Optional[date] = None,
+    dry_run: bool = False
+) -> dict:
+    """
+    Create upcoming partitions and apply retention in one transaction.
+
+    Settings are used for any argument left as None. Does nothing when
+    analysis_logs is not partitioned (SQLite, or migrations not applied).
+
+    Returns:
+        {"partitioned": bool, "created": [...], "removed": [...]}
+    """
+    months_ahead = settings.analysis_log_partitions_ahead if months_ahead is None else months_ahead
+    retention_months = settings.analysis_log_retention_months if retention_months is None else retention_months
+    mode = mode or settings.analysis_log_retention_mode
+
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return {"partitioned": False, "created": [], "removed": []}
+        conn.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": ADVISORY_LOCK_ID})
+        created = ensure_partitions(conn, months_ahead, today=today, dry_run=dry_run)
+        removed = apply_retention(conn, retention_months, mode=mode, today=today, dry_run=dry_run)
+
+    if removed and mode == "drop" and not dry_run:
+        # Texts only referenced by dropped partitions are no longer needed
+        from sqlalchemy.orm import Session
+        from analysis.texts import delete_unreferenced_texts
+
+        with Session(bind=engine) as db:
+            delete_unreferenced_texts(db)
+    return {"partitioned": True, "created": created, "removed": removed}
+
+
+def run_partition_maintenance() -> None:
+    """Startup hook: run maintenance with the app engine, logging instead of raising."""
+    from database import engine
+
+    try:
+        result = maintain(engine)
+    except Exception as e:
+        logger.error(f"Partition maintenance failed: {e}")
+        return
+    if result["created"] or result["removed"]:
+        logger.info(f"Partition maintenance: created={result['created']} removed={result['removed']}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Maintain analysis_logs partitions")
+    parser.add_argument("--months-ahead", type=int, default=None, help="Future months to create")
+    parser.add_argument("--retention-months", type=int, default=None, help="Months of history to keep (0 = all)")
+    parser.add_argument("--mode", choices=RETENTION_MODES, default=None, help="What to do with expired partitions")
+    parser.add_argument("--today", type=date.fromisoformat, default=None, help="Reference date (ISO)")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without applying them")
+    args = parser.parse_args()
+
+    from database import engine
+
+    try:
+        result = maintain(
+            engine,
+            months_ahead=args.months_ahead,
+            retention_months=args.retention_months,
+            mode=args.mode,
+            today=args.today,
+            dry_run=args.dry_run
+        )
+    except Exception as e:
+        logger.error(f"Partition maintenance failed: {e}")
+        return 1
+
+    if not result["partitioned"]:
+        logger.info(f"{PARENT_TABLE} is not partitioned; nothing to do")
+        return 0
+    prefix = "Would " if args.dry_run else ""
+    logger.info(f"{prefix}create: {result['created'] or 'none'}")
+    logger.info(f"{prefix}{'remove' if args.dry_run else 'removed'}: {result['removed'] or 'none'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,413 @@
+"""
+On-demand sampling profiler for single requests.
+
+A request sent with ``X-Profile: 1`` is sampled by a background thread
+every PROFILE_INTERVAL_MS while it runs: each sample records the request's
+stack, either the frames executing on the event loop thread (on CPU) or,
+while the request is suspended, the chain of coroutines it is awaiting,
+including tasks started through asyncio.wait_for or gather (waiting on
+Hugging Face, Gemini, a scheduler slot, ...). Frames above the
+middleware (server and loop internals) and samples of other requests
+sharing the loop are left out, so the profile covers auth, orchestrator
+and service code of that request only.
+
+Sampling only starts if the request's credentials claim an admin (the
+JWT's ``username`` claim or a cached API key, see
+``auth.middleware.claims_admin``), and the profile is stored only if the
+request then authenticates as an admin (``auth.middleware.is_admin``);
+anyone else's header is ignored. Profiles are kept as JSON in
+PROFILE_DIR (newest PROFILE_MAX_STORED) and served by the admin routes as
+a call tree or as collapsed stacks for flamegraph.pl / speedscope.
+"""
+import asyncio
+import inspect
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+from config import get_settings
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+AUTHORIZATION_HEADER = b"authorization"
+API_KEY_HEADER = b"x-api-key"
+
+# Guards the walk down chains of awaited coroutines and tasks
+MAX_AWAIT_DEPTH = 256
+
+_PROFILE_ID_RE = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+
+settings = get_settings()
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _await_label(awaited) -> str:
+    """Leaf name for time spent suspended on ``awaited``."""
+    if awaited is None:
+        return "[await]"
+    name = type(awaited).__name__
+    # ``await future`` suspends on the future's C iterator
+    return "[await Future]" if name == "FutureIter" else f"[await {name}]"
+
+
+def _child_task(awaitable, frame) -> Optional[asyncio.Task]:
+    """Task doing the work a coroutine is waiting for, when it can be found."""
+    if isinstance(awaitable, asyncio.Task):
+        return awaitable
+    # asyncio.gather
+    for child in getattr(awaitable, "_children", None) or ():
+        if isinstance(child, asyncio.Task) and not child.done():
+            return child
+    # asyncio.wait_for runs its argument in a task of its own
+    if frame is not None and frame.f_code.co_name == "wait_for":
+        fut = frame.f_locals.get("fut")
+        if isinstance(fut, asyncio.Task) and not fut.done():
+            return fut
+    return None
+
+
+def _await_chain(coro, stop_frame) -> Tuple[List[Any], Any]:
+    """
+    Frames of a coroutine and everything it is awaiting, from ``stop_frame`` down.
+
+    Follows awaited coroutines and the tasks behind asyncio.wait_for,
+    asyncio.gather and awaited tasks.
+
+    Returns:
+        (frames, innermost awaited object that is not a coroutine, e.g. a
+        Future; None if the innermost coroutine is running)
+    """
+    frames = []
+    recording = False
+    awaitable = coro
+    for _ in range(MAX_AWAIT_DEPTH):
+        if awaitable is None:
+            break
+        frame = (
+            getattr(awaitable, "cr_frame", None)
+            or getattr(awaitable, "gi_frame", None)
+            or getattr(awaitable, "ag_frame", None)
+        )
+        if frame is None:
+            task = _child_task(awaitable, frames[-1] if frames else None)
+            if task is None:
+                break
+            awaitable = task.get_coro()
+            continue
+        if frame is stop_frame:
+            recording = True
+        if recording:
+            frames.append(frame)
+        awaitable = (
+            getattr(awaitable, "cr_await", None)
+            or getattr(awaitable, "gi_yieldfrom", None)
+            or getattr(awaitable, "ag_await", None)
+        )
+    return frames, awaitable
+
+
+class ProfileSession:
+    """
+    Samples one request until stopped.
+
+    Args:
+        task: Task running the request
+        root_frame: Frame of the middleware call wrapping the request;
+            only frames below it are recorded
+        interval: Seconds between samples
+        max_seconds: Sampling stops after this long
+    """
+
+    def __init__(self, task: asyncio.Task, root_frame, interval: float, max_seconds: float = 120.0):
+        self.task = task
+        self.root_frame = root_frame
+        self.thread_id = threading.get_ident()
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks: Dict[str, int] = {}
+        self.running = 0
+        self.waiting = 0
+        self.started = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Begin sampling in a background thread."""
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread."""
+        self.duration = time.perf_counter() - self.started
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if time.perf_counter() - self.started > self.max_seconds:
+                break
+            self.sample()
+
+    def sample(self) -> None:
+        """Record the request's current stack."""
+        if self.task.done():
+            return
+        frames, awaited = _await_chain(self.task.get_coro(), self.root_frame)
+        if not frames:
+            return
+
+        # Running if the innermost coroutine is on the loop thread's stack:
+        # add the plain function calls below it
+        below = []
+        frame = sys._current_frames().get(self.thread_id)
+        while frame is not None and frame is not frames[-1]:
+            below.append(frame)
+            frame = frame.f_back
+
+        names = [_frame_name(f) for f in frames]
+        if frame is not None:
+            names += [_frame_name(f) for f in reversed(below)]
+            self.running += 1
+        else:
+            names.append(_await_label(awaited))
+            self.waiting += 1
+        key = ";".join(names)
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+
+
+def collapsed_stacks(stacks: Dict[str, int]) -> str:
+    """Stacks in the collapsed format read by flamegraph.pl and speedscope."""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+
+def call_tree(stacks: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Merge stacks into a call tree.
+
+    Returns:
+        Nested nodes with 'name', 'samples' (including callees), 'self'
+        and 'children' (most samples first)
+    """
+    root = {"name": "request", "samples": 0, "self": 0, "children": {}}
+    for stack, count in stacks.items():
+        node = root
+        node["samples"] += count
+        for name in stack.split(";"):
+            child = node["children"].get(name)
+            if child is None:
+                child = node["children"][name] = {"name": name, "samples": 0, "self": 0, "children": {}}
+            child["samples"] += count
+            node = child
+        node["self"] += count
+
+    def finish(node):
+        children = sorted(node["children"].values(), key=lambda child: child["samples"], reverse=True)
+        return {**node, "children": [finish(child) for child in children]}
+
+    return finish(root)
+
+
+class ProfileStore:
+    """
+    Bounded on-disk store of request profiles (one JSON file each).
+
+    Args:
+        directory: Where profiles are written
+        max_profiles: Newest profiles kept; older ones are deleted
+    """
+
+    def __init__(self, directory: str, max_profiles: int = 50):
+        self.directory = directory
+        self.max_profiles = max(max_profiles, 1)
+
+    @staticmethod
+    def new_id() -> str:
+        """Sortable, unguessable profile id."""
+        return f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{secrets.token_hex(4)}"
+
+    def _path(self, profile_id: str) -> Optional[str]:
+        if not _PROFILE_ID_RE.match(profile_id):
+            return None
+        return os.path.join(self.directory, f"{profile_id}.json")
+
+    def save(self, profile: Dict[str, Any]) -> None:
+        """Write a profile and drop the oldest ones beyond the limit."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(profile["id"])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(profile, f)
+        os.replace(tmp_path, path)
+        for stale in self._ids()[:-self.max_profiles]:
+            try:
+                os.remove(self._path(stale))
+            except OSError:
+                pass
+
+    def _ids(self) -> List[str]:
+        """Stored profile ids, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        ids = [name[:-5] for name in os.listdir(self.directory) if name.endswith(".json")]
+        return sorted(profile_id for profile_id in ids if _PROFILE_ID_RE.match(profile_id))
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Metadata of stored profiles, newest first."""
+        profiles = []
+        for profile_id in reversed(self._ids()):
+            profile = self.load(profile_id)
+            if profile is not None:
+                profile.pop("stacks", None)
+                profiles.append(profile)
+        return profiles
+
+    def load(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """A stored profile, or None if there is no such profile."""
+        path = self._path(profile_id)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests that carry ``X-Profile: 1``, keeping only admins' profiles.
+
+    Requests whose credentials fail ``precheck`` are not sampled. The user
+    is read from ``request.state.user``, which authentication sets;
+    requests that never authenticate are not stored. At most
+    ``max_concurrent`` requests are sampled at once (extra ones run
+    unprofiled), and an admin's response carries ``X-Profile-Id``.
+
+    Args:
+        app: Wrapped ASGI application
+        store: Where kept profiles are written
+        authorize: Whether a user may profile requests
+        precheck: Cheap test of the request's credentials (Bearer token or
+            X-API-Key) run before sampling starts; None samples every
+            request that asks
+        interval: Seconds between samples
+        max_concurrent: Requests sampled at the same time
+        max_seconds: Longest sampling per request
+    """
+
+    def __init__(
+        self,
+        app,
+        store: ProfileStore,
+        authorize: Callable[[Any], bool],
+        precheck: Optional[Callable[[str], bool]] = None,
+        interval: float = 0.005,
+        max_concurrent: int = 2,
+        max_seconds: float = 120.0
+    ):
+        self.app = app
+        self.store = store
+        self.authorize = authorize
+        self.precheck = precheck
+        self.interval = interval
+        self.max_concurrent = max_concurrent
+        self.max_seconds = max_seconds
+        self.active = 0
+
+    def _requested(self, scope) -> bool:
+        for name, value in scope.get("headers", []):
+            if name == PROFILE_HEADER:
+                return value.strip().lower() in (b"1", b"true", b"yes")
+        return False
+
+    def _prechecked(self, scope) -> bool:
+        if self.precheck is None:
+            return True
+        headers = dict(scope.get("headers", []))
+        token = headers.get(API_KEY_HEADER, b"").decode("latin-1").strip()
+        if not token:
+            scheme, _, credentials = headers.get(AUTHORIZATION_HEADER, b"").decode("latin-1").partition(" ")
+            token = credentials.strip() if scheme.lower() == "bearer" else ""
+        try:
+            return bool(token) and bool(self.precheck(token))
+        except Exception:
+            return False
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http" or self.active >= self.max_concurrent
+            or not self._requested(scope) or not self._prechecked(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        # Created here so later copies of the scope share it
+        state = scope.setdefault("state", {})
+        profile_id = self.store.new_id()
+        status_code = None
+
+        def allowed() -> bool:
+            try:
+                return bool(self.authorize(state.get("user")))
+            except Exception:
+                return False
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if allowed():
+                    headers = list(message.get("headers", []))
+                    headers.append((PROFILE_ID_HEADER, profile_id.encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        session = ProfileSession(asyncio.current_task(), inspect.currentframe(), self.interval, self.max_seconds)
+        self.active += 1
+        session.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            session.stop()
+            self.active -= 1
+            if allowed():
+                user = state.get("user")
+                profile = {
+                    "id": profile_id,
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "method": scope.get("method"),
+                    "path": scope.get("path"),
+                    "status": status_code,
+                    "user": getattr(user, "username", None),
+                    "duration_ms": round(session.duration * 1000, 1),
+                    "interval_ms": round(self.interval * 1000, 3),
+                    "samples": session.running + session.waiting,
+                    "running_samples": session.running,
+                    "waiting_samples": session.waiting,
+                    "stacks": session.stacks,
+                }
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, self.store.save, profile)
+                    logger.info(f"Stored profile {profile_id} of {profile['method']} {profile['path']}")
+                except OSError as e:
+                    logger.error(f"Could not store profile {profile_id}: {e}")
+
+
+@lru_cache()
+def get_profile_store() -> ProfileStore:
+    """Profile store configured by PROFILE_DIR and PROFILE_MAX_STORED."""
+    return ProfileStore(settings.profile_dir, settings.profile_max_stored)
@@ -1,18 +1,34 @@
 """
 Pytest configuration and fixtures.
 """
+import os
+
+# Keep test runs out of the on-disk analysis cache and near-duplicate index
+os.environ.setdefault("ANALYSIS_CACHE_BACKEND", "none")
+os.environ.setdefault("NEAR_DUPLICATE_ENABLED", "false")
+# No upstream calls or PostgreSQL maintenance when the app starts; the
+# warm-up tests turn it on with a stubbed HTTP client
+os.environ.setdefault("HUGGINGFACE_WARMUP_ENABLED", "false")
+os.environ.setdefault("PARTITION_MAINTENANCE_ON_STARTUP", "false")
+# Off by default; the profiler tests need the middleware installed
+os.environ.setdefault("PROFILING_ENABLED", "true")
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+import timing
 from database import Base, get_db
 from main import app
 from auth.models import User
 from auth.utils import hash_password
+from analysis.score_vectors import label_vocabulary
+from auth.api_keys import api_key_cache
 
 # Test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+timing.instrument_engine(engine)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -20,6 +36,8 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engin
 def db_session():
     """Create a fresh database for each test."""
     Base.metadata.create_all(bind=engine)
+    label_vocabulary.clear()
+    api_key_cache.clear()
     db = TestingSessionLocal()
     try:
         yield db
@@ -31,19 +31,26 @@ class MockHuggingFaceService:
         """Mock classification."""
         return {
             "category": "technology",
-            "score": 0.95
+            "score": 0.95,
+            "scores": {label: (0.95 if i == 0 else 0.05 / max(len(candidate_labels) - 1, 1))
+                       for i, label in enumerate(candidate_labels)}
         }
 
 
 class MockGeminiService:
     """Mock Gemini service for testing."""
     
-    async def analyze(self, text, category):
+    async def analyze(self, text, category, latency_class=None):
         """Mock analysis."""
         return {
             "summary": "This is a test summary about technology.",
-            "tone": "positive"
+            "tone": "positive",
+            "model": "gemini-test"
         }
+    
+    async def analyze_packed(self, text, category, latency_class=None):
+        """Mock packed analysis."""
+        return await self.analyze(text, category, latency_class)
 
 
 class MockHuggingFaceServiceError:
@@ -57,6 +64,10 @@ class MockHuggingFaceServiceError:
 class MockGeminiServiceError:
     """Mock Gemini service that raises errors."""
     
-    async def analyze(self, text, category):
+    async def analyze(self, text, category, latency_class=None):
         """Mock analysis that fails."""
         raise Exception("Gemini API error")
+    
+    async def analyze_packed(self, text, category, latency_class=None):
+        """Mock packed analysis that fails."""
+        raise Exception("Gemini API error")
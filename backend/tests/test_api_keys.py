@@ -0,0 +1,91 @@
+"""
+Tests for API key authentication.
+"""
+import time
+from datetime import datetime, timezone
+from unittest.mock import patch
+from auth.api_keys import ApiKeyCache, generate_api_key, hash_secret, parse_api_key
+from auth.models import ApiKey
+from tests.mocks import MockHuggingFaceService, MockGeminiService
+
+
+def create_key(client, auth_headers, **body):
+    response = client.post("/auth/api-keys", headers=auth_headers, json={"name": "ingest-service", **body})
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_generated_keys_parse_and_hash():
+    """Test key format and that only the keyed hash of the secret is stored."""
+    key, key_id, secret_hash = generate_api_key()
+
+    assert key.startswith(f"ha_{key_id}_")
+    parsed_id, secret = parse_api_key(key)
+    assert parsed_id == key_id and hash_secret(secret) == secret_hash
+    assert secret not in secret_hash
+    assert parse_api_key("ha_short") is None and parse_api_key("eyJhbGciOi") is None
+
+
+@patch('analysis.orchestrator.huggingface_service', new_callable=lambda: MockHuggingFaceService())
+@patch('analysis.orchestrator.gemini_service', new_callable=lambda: MockGeminiService())
+def test_api_key_authenticates_analyze(mock_gemini, mock_hf, client, auth_headers, db_session):
+    """Test keys work as Bearer credentials and in X-API-Key; secrets are not stored."""
+    created = create_key(client, auth_headers)
+    body = {"text": "This is a test article about technology."}
+
+    assert client.post("/analyze", headers={"Authorization": f"Bearer {created['key']}"}, json=body).status_code == 200
+    assert client.post("/analyze", headers={"X-API-Key": created["key"]}, json=body).status_code == 200
+
+    stored = db_session.query(ApiKey).one()
+    assert created["key"].split("_", 2)[2] not in stored.secret_hash
+
+    tampered = created["key"][:-2] + ("AA" if not created["key"].endswith("AA") else "BB")
+    assert client.post("/analyze", headers={"X-API-Key": tampered}, json=body).status_code == 401
+
+
+def test_revoked_and_expired_keys_are_rejected(client, auth_headers, db_session):
+    """Test revocation takes effect immediately and expired keys fail."""
+    created = create_key(client, auth_headers)
+    headers = {"X-API-Key": created["key"]}
+    assert client.get("/analyze/history/export", headers=headers).status_code == 200
+
+    assert client.delete(f"/auth/api-keys/{created['key_id']}", headers=auth_headers).status_code == 204
+    assert client.get("/analyze/history/export", headers=headers).status_code == 401
+
+    listed = client.get("/auth/api-keys", headers=auth_headers).json()
+    assert listed[0]["key_id"] == created["key_id"] and listed[0]["revoked_at"] is not None
+    assert "key" not in listed[0]
+
+    expiring = create_key(client, auth_headers, expires_in_days=1)
+    key = db_session.query(ApiKey).filter(ApiKey.key_id == expiring["key_id"]).one()
+    key.expires_at = key.created_at.replace(year=2000)
+    db_session.commit()
+    assert client.get("/analyze/history/export", headers={"X-API-Key": expiring["key"]}).status_code == 401
+
+
+def test_key_management_requires_jwt(client, auth_headers):
+    """Test an API key cannot create or revoke keys."""
+    created = create_key(client, auth_headers)
+
+    response = client.post("/auth/api-keys", headers={"Authorization": f"Bearer {created['key']}"}, json={"name": "x"})
+    assert response.status_code == 401
+    assert client.delete(f"/auth/api-keys/{created['key_id']}", headers={"X-API-Key": created["key"]}).status_code == 403
+
+
+def test_cache_serves_hits_and_syncs_revocations(db_session, test_user):
+    """Test hits skip the database and revocations by other workers propagate."""
+    key, key_id, secret_hash = generate_api_key()
+    db_session.add(ApiKey(user_id=test_user.id, key_id=key_id, secret_hash=secret_hash, name="svc"))
+    db_session.commit()
+
+    cache = ApiKeyCache(ttl=300, sync_interval=0.05)
+    assert cache.resolve(db_session, key).id == test_user.id
+    assert cache.resolve(db_session, key).username == "testuser"
+    assert (cache.loads, cache.hits) == (1, 1)
+
+    # Revoked elsewhere: picked up by the next sync
+    db_session.query(ApiKey).filter(ApiKey.key_id == key_id).update({"revoked_at": datetime.now(timezone.utc)})
+    db_session.commit()
+    time.sleep(0.06)
+    assert cache.resolve(db_session, key) is None
+    assert cache.stats()["evicted_revoked"] == 1
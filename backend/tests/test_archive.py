@@ -0,0 +1,104 @@
+"""
+Tests for cold-tier archival of analysis logs.
+"""
+import json
+import os
+import pytest
+from datetime import datetime, timezone
+from auth.models import AnalysisLog, User
+from analysis.archive import archive_cutoff, archive_logs, archived_parts, iter_archived_rows
+from analysis.export import iter_history_rows
+from config import get_settings
+
+CUTOFF = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def old_history(db_session, test_user):
+    """Logs for two users spread over January-April 2024."""
+    other = User(username="other", email="other@example.com", password_hash="x")
+    db_session.add(other)
+    db_session.commit()
+    for month in (1, 2, 3, 4):
+        for day in (5, 20):
+            db_session.add(AnalysisLog(
+                user_id=test_user.id, input_text=f"Text {month}-{day}", category="technology",
+                summary=f"Summary {month}-{day}", tone="neutral", score_values=b"\x00\x3c",
+                created_at=datetime(2024, month, day, 12)
+            ))
+    db_session.add(AnalysisLog(
+        user_id=other.id, input_text="Other", category="sports", tone="positive",
+        created_at=datetime(2024, 1, 10)
+    ))
+    db_session.commit()
+    return other
+
+
+@pytest.mark.parametrize("format", ["parquet", "ndjson.gz"])
+def test_archive_moves_old_rows_into_month_user_files(db_session, test_user, old_history, tmp_path, format):
+    """Test rows before the cutoff are written per user and month, then deleted."""
+    if format == "parquet":
+        pytest.importorskip("pyarrow")
+
+    result = archive_logs(db_session, str(tmp_path), CUTOFF, format=format, batch_size=2)
+
+    assert result == {"files": 3, "rows": 5, "already_archived": 0, "deleted": 5, "texts_deleted": 0}
+    assert sorted(os.listdir(tmp_path)) == ["month=2024-01", "month=2024-02"]
+    assert sorted(os.listdir(tmp_path / "month=2024-01")) == [f"user_id={test_user.id}", f"user_id={old_history.id}"]
+    assert db_session.query(AnalysisLog).count() == 4
+
+    rows = list(iter_archived_rows(str(tmp_path), user_id=test_user.id))
+    assert [row["input_text"] for row in rows] == ["Text 1-5", "Text 1-20", "Text 2-5", "Text 2-20"]
+    assert rows[0]["score_values"] == b"\x00\x3c"
+    assert rows[0]["created_at"] == datetime(2024, 1, 5, 12, tzinfo=timezone.utc)
+
+
+def test_archive_read_path_prunes_and_filters(db_session, test_user, old_history, tmp_path):
+    """Test month/user pruning and time filters on archived rows (default format, no pyarrow needed)."""
+    archive_logs(db_session, str(tmp_path), CUTOFF)
+
+    since = datetime(2024, 2, 1)
+    assert [path for _, _, path in archived_parts(str(tmp_path), since=since)][0].startswith(
+        str(tmp_path / "month=2024-02")
+    )
+    assert all(path.endswith(".ndjson.gz") for _, _, path in archived_parts(str(tmp_path)))
+    rows = list(iter_archived_rows(str(tmp_path), since=datetime(2024, 1, 15), until=since, columns=["id", "user_id"]))
+    assert rows == [{"id": rows[0]["id"], "user_id": test_user.id}]
+
+
+def test_archive_is_idempotent_and_keep_rows(db_session, test_user, old_history, tmp_path):
+    """Test rows kept by a copy-only run are not archived twice, even when new rows join their month."""
+    archive_logs(db_session, str(tmp_path), CUTOFF, format="ndjson.gz", delete=False)
+    history = [row["id"] for row in iter_history_rows(db_session, archive_dir=str(tmp_path))]
+    assert len(history) == len(set(history)) == 9
+    db_session.add(AnalysisLog(
+        user_id=test_user.id, input_text="Late", category="technology", tone="neutral",
+        created_at=datetime(2024, 1, 25, 12)
+    ))
+    db_session.commit()
+    result = archive_logs(db_session, str(tmp_path), CUTOFF, format="ndjson.gz")
+
+    assert (result["files"], result["rows"], result["already_archived"], result["deleted"]) == (1, 1, 5, 6)
+    assert len(archived_parts(str(tmp_path))) == 4
+    ids = [row["id"] for row in iter_archived_rows(str(tmp_path))]
+    assert len(ids) == len(set(ids)) == 6
+
+
+def test_archive_cutoff_is_month_aligned():
+    from datetime import date
+
+    assert archive_cutoff(12, today=date(2024, 6, 18)) == datetime(2023, 6, 1, tzinfo=timezone.utc)
+
+
+def test_export_includes_archived_rows(client, auth_headers, db_session, test_user, old_history, tmp_path, monkeypatch):
+    """Test the history export reads archived rows before database rows."""
+    archive_logs(db_session, str(tmp_path), CUTOFF, format="ndjson.gz")
+    monkeypatch.setattr(get_settings(), "archive_dir", str(tmp_path))
+
+    response = client.get("/analyze/history/export?format=ndjson&include_archived=true", headers=auth_headers)
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["input_text"] for row in rows][:5] == ["Text 1-5", "Text 1-20", "Text 2-5", "Text 2-20", "Text 3-5"]
+    assert len(rows) == 8
+
+    response = client.get("/analyze/history/export?format=ndjson", headers=auth_headers)
+    assert len(response.text.splitlines()) == 4
@@ -0,0 +1,119 @@
+"""
+Tests for micro-batching of concurrent Hugging Face classifications.
+"""
+import asyncio
+import json
+import httpx
+import pytest
+from unittest.mock import patch
+from analysis.batching import MicroBatcher
+from analysis.cache import SQLiteAnalysisCache
+from analysis.label_scores import LabelScoreStore
+from analysis.services.huggingface import HuggingFaceService
+
+
+class RecordingSend:
+    """Batch callback that records batches and fails items containing 'bad'."""
+
+    def __init__(self, fail_batch=False):
+        self.batches = []
+        self.fail_batch = fail_batch
+
+    async def __call__(self, key, items):
+        self.batches.append((key, list(items)))
+        if self.fail_batch:
+            raise Exception("upstream down")
+        return [Exception(f"bad item {item}") if "bad" in item else f"{key}:{item}" for item in items]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submissions_share_a_batch_per_key():
+    """Test items with the same key are sent together and results are scattered back."""
+    send = RecordingSend()
+    batcher = MicroBatcher(send, window=0.01, max_size=10)
+
+    results = await asyncio.gather(
+        batcher.submit("a", "x"),
+        batcher.submit("b", "y"),
+        batcher.submit("a", "z"),
+    )
+
+    assert results == ["a:x", "b:y", "a:z"]
+    assert sorted(send.batches) == [("a", ["x", "z"]), ("b", ["y"])]
+    stats = batcher.stats()
+    assert (stats["batches"], stats["items"]) == (2, 3)
+    assert stats["fill_rate"] == pytest.approx(3 / 20)
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_sent_without_waiting_for_the_window():
+    """Test reaching max_size flushes at once."""
+    send = RecordingSend()
+    batcher = MicroBatcher(send, window=10, max_size=2)
+
+    results = await asyncio.wait_for(asyncio.gather(batcher.submit("k", "1"), batcher.submit("k", "2")), 1)
+
+    assert results == ["k:1", "k:2"]
+    assert batcher.stats()["full_batches"] == 1
+
+
+@pytest.mark.asyncio
+async def test_item_and_batch_failures_reach_their_callers():
+    """Test a failed item only fails its caller and a failed call fails every caller."""
+    batcher = MicroBatcher(RecordingSend(), window=0.01, max_size=10)
+    good, bad = await asyncio.gather(batcher.submit("k", "ok"), batcher.submit("k", "bad"), return_exceptions=True)
+    assert good == "k:ok"
+    assert str(bad) == "bad item bad"
+
+    failing = MicroBatcher(RecordingSend(fail_batch=True), window=0.01, max_size=10)
+    errors = await asyncio.gather(failing.submit("k", "1"), failing.submit("k", "2"), return_exceptions=True)
+    assert [str(error) for error in errors] == ["upstream down", "upstream down"]
+    assert failing.stats()["failed_batches"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_callers_are_left_out_of_the_batch():
+    """Test a caller that gave up before the flush is not sent upstream."""
+    send = RecordingSend()
+    batcher = MicroBatcher(send, window=0.02, max_size=10)
+
+    waiting = asyncio.ensure_future(batcher.submit("k", "gone"))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    assert await batcher.submit("k", "kept") == "k:kept"
+    assert send.batches == [("k", ["kept"])]
+
+
+@pytest.mark.asyncio
+async def test_service_sends_concurrent_classifications_as_one_list_request(tmp_path):
+    """Test HuggingFaceService batches texts with the same labels into one list-input call."""
+    service = HuggingFaceService()
+    service._label_scores = LabelScoreStore(SQLiteAnalysisCache(str(tmp_path / "cache.sqlite3")), "model")
+    # Label score lookups hop through a thread, so allow for scheduling jitter
+    service.batcher.window = 0.2
+    payloads = []
+
+    def handler(request):
+        payload = json.loads(request.content)
+        payloads.append(payload)
+        return httpx.Response(200, json=[
+            {"sequence": text, "labels": ["sports", "technology"] if "match" in text else ["technology", "sports"],
+             "scores": [0.9, 0.1]}
+            for text in payload["inputs"]
+        ])
+
+    real_client = httpx.AsyncClient
+    with patch(
+        "analysis.services.huggingface.httpx.AsyncClient",
+        lambda *args, **kwargs: real_client(transport=httpx.MockTransport(handler))
+    ):
+        results = await asyncio.gather(
+            service.classify("new phone released", ["technology", "sports"]),
+            service.classify("football match tonight", ["technology", "sports"]),
+        )
+
+    assert len(payloads) == 1
+    assert sorted(payloads[0]["inputs"]) == ["football match tonight", "new phone released"]
+    assert payloads[0]["parameters"]["candidate_labels"] == ["technology", "sports"]
+    assert [result["category"] for result in results] == ["technology", "sports"]
+    assert service.warmth(60)["state"] == "warm"
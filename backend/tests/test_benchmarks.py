@@ -0,0 +1,111 @@
+"""
+Tests for benchmark helpers and stub servers.
+"""
+import random
+import pytest
+from fastapi.testclient import TestClient
+from benchmarks.common import percentile, summarize_latencies
+from benchmarks.load import app_environment, parse_args
+from benchmarks.stubs import LatencySpec, StubProfile, create_huggingface_stub, create_gemini_stub
+
+
+def test_percentile_interpolates():
+    """Test percentile interpolation between ranks."""
+    values = [10.0, 20.0, 30.0, 40.0]
+    
+    assert percentile(values, 0) == 10.0
+    assert percentile(values, 50) == 25.0
+    assert percentile(values, 100) == 40.0
+    assert percentile([], 99) == 0.0
+    assert summarize_latencies([5.0])["p99"] == 5.0
+
+
+def test_latency_spec_parsing():
+    """Test latency spec parsing and sampling."""
+    rng = random.Random(0)
+    
+    assert LatencySpec("fixed:50").sample(rng) == 0.05
+    assert 0.02 <= LatencySpec("uniform:20:80").sample(rng) <= 0.08
+    
+    with pytest.raises(ValueError):
+        LatencySpec("gaussian:10")
+    with pytest.raises(ValueError):
+        LatencySpec("uniform:10")
+
+
+def test_huggingface_stub_response_shape():
+    """Test that the HF stub answers in the Inference API format."""
+    client = TestClient(create_huggingface_stub(StubProfile()))
+    labels = ["technology", "politics", "sports"]
+    
+    response = client.post(
+        "/models/facebook/bart-large-mnli",
+        json={"inputs": "Some text", "parameters": {"candidate_labels": labels}}
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert sorted(data["labels"]) == sorted(labels)
+    assert data["scores"] == sorted(data["scores"], reverse=True)
+
+
+
+def test_huggingface_stub_classifies_batches():
+    """Test that a list of inputs gets one classification per text, in order."""
+    client = TestClient(create_huggingface_stub(StubProfile()))
+    labels = ["technology", "politics", "sports"]
+    texts = ["First text", "Second text", "Third text"]
+    
+    response = client.post(
+        "/models/facebook/bart-large-mnli",
+        json={"inputs": texts, "parameters": {"candidate_labels": labels}}
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["sequence"] for item in data] == texts
+    for item in data:
+        assert sorted(item["labels"]) == sorted(labels)
+    
+    single = client.post(
+        "/models/facebook/bart-large-mnli",
+        json={"inputs": texts[1], "parameters": {"candidate_labels": labels}}
+    ).json()
+    assert data[1] == single
+
+def test_stub_burst_returns_503():
+    """Test that stubs return 503 inside a burst window."""
+    profile = StubProfile(burst_every=60, burst_length=60)
+    client = TestClient(create_gemini_stub(profile))
+    
+    response = client.post(
+        "/v1beta/models/gemini-2.5-flash:generateContent",
+        json={"contents": [{"parts": [{"text": "hello"}]}]}
+    )
+    
+    assert response.status_code == 503
+
+
+def test_micro_compare_flags_regressions():
+    """Test baseline comparison statuses."""
+    from benchmarks.micro import compare
+    
+    baseline = {"a": {"median_us": 10.0}, "b": {"median_us": 10.0}, "c": {"median_us": 10.0}}
+    results = {"a": {"median_us": 12.0}, "b": {"median_us": 8.0}, "c": {"median_us": 10.5}, "d": {"median_us": 1.0}}
+    
+    comparison = compare(results, baseline, threshold=0.10)
+    
+    assert comparison["a"]["status"] == "regression"
+    assert comparison["b"]["status"] == "improvement"
+    assert comparison["c"]["status"] == "ok"
+    assert "d" not in comparison
+
+
+def test_load_environment_isolates_cache(tmp_path):
+    """Test load runs bypass the analysis cache unless asked, and never share it."""
+    env = app_environment(parse_args([]), "http://hf", "http://gemini", str(tmp_path))
+    assert (env["ANALYSIS_CACHE_BACKEND"], env["NEAR_DUPLICATE_ENABLED"]) == ("none", "false")
+
+    env = app_environment(parse_args(["--cache"]), "http://hf", "http://gemini", str(tmp_path))
+    assert env["ANALYSIS_CACHE_BACKEND"] == "sqlite"
+    assert env["ANALYSIS_CACHE_PATH"].startswith(str(tmp_path))
@@ -0,0 +1,149 @@
+"""
+Tests for bulk file ingestion.
+"""
+import asyncio
+import io
+import json
+import threading
+import pytest
+from unittest.mock import patch
+from auth.models import AnalysisLog
+from analysis.bulk import BulkIngestion, iter_csv_items, iter_jsonl_items
+from tests.mocks import MockHuggingFaceService, MockGeminiService
+
+
+def reader(data: bytes, size: int = 7):
+    """Async read() over bytes, returning small chunks to exercise line splitting."""
+    stream = io.BytesIO(data)
+
+    async def read(n):
+        return stream.read(min(n, size))
+    return read
+
+
+async def collect(items):
+    return [item async for item in items]
+
+
+@pytest.mark.asyncio
+async def test_jsonl_parsing_reports_bad_lines():
+    """Test that invalid lines become per-item errors."""
+    data = b'{"id": "a", "text": "first text"}\n\nnot json\n{"text": "last \xc3\xa9"}'
+
+    items = await collect(iter_jsonl_items(reader(data)))
+
+    assert [index for index, _ in items] == [0, 1, 2]
+    assert items[0][1]["id"] == "a"
+    assert isinstance(items[1][1], ValueError)
+    assert items[2][1]["text"] == "last é"
+
+
+@pytest.mark.asyncio
+async def test_csv_parsing_handles_multiline_fields_and_labels():
+    """Test CSV records with quoted newlines and label lists."""
+    data = b'id,text,candidate_labels\r\n1,"line one\nline two, ""quoted""",a;b\r\n2,plain text,\r\n'
+
+    items = await collect(iter_csv_items(reader(data)))
+
+    assert items[0][1] == {"id": "1", "text": 'line one\nline two, "quoted"', "candidate_labels": ["a", "b"]}
+    assert items[1][1]["candidate_labels"] is None
+
+
+@pytest.mark.asyncio
+async def test_ingestion_bounds_concurrency_and_orders(db_session, test_user):
+    """Test bounded concurrency, ordered output and batched log writes."""
+    active = 0
+    peak = 0
+
+    async def analyze(text, labels, latency_class=None):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        # Later items finish first
+        await asyncio.sleep(0.001 * (20 - int(text.split()[-1])))
+        active -= 1
+        if text.endswith(" 5"):
+            raise Exception("upstream failed")
+        return {"category": "technology", "score": 0.9, "summary": "s", "tone": "neutral"}
+
+    data = "".join(json.dumps({"id": i, "text": f"Sample text number {i}"}) + "\n" for i in range(12))
+    ingestion = BulkIngestion(db_session, test_user.id, analyze, concurrency=3, log_batch_size=4, ordered=True)
+
+    lines = [json.loads(line) for line in await collect(ingestion.run(iter_jsonl_items(reader(data.encode(), 4096))))]
+
+    assert peak <= 3
+    assert [line["index"] for line in lines[:-1]] == list(range(12))
+    assert lines[5]["status"] == "error" and lines[5]["error"] == "upstream failed"
+    assert lines[-1]["status"] == "complete"
+    assert (lines[-1]["succeeded"], lines[-1]["failed"], lines[-1]["logged"]) == (11, 1, 11)
+    logs = db_session.query(AnalysisLog).filter(AnalysisLog.user_id == test_user.id).all()
+    assert len(logs) == 11
+    assert sorted(log.text for log in logs)[0] == "Sample text number 0"
+
+
+@pytest.mark.asyncio
+async def test_ordered_ingestion_bounds_buffered_results(db_session, test_user):
+    """Test a slow first item stops workers from racing ahead of the reorder window."""
+    started = []
+    started_before_first_done = None
+
+    async def analyze(text, labels, latency_class=None):
+        nonlocal started_before_first_done
+        number = int(text.split()[-1])
+        started.append(number)
+        if number == 0:
+            await asyncio.sleep(0.05)
+            started_before_first_done = len(started)
+        return {"category": "technology", "score": 0.9, "summary": "s", "tone": "neutral"}
+
+    data = "".join(json.dumps({"text": f"Sample text number {i}"}) + "\n" for i in range(50))
+    ingestion = BulkIngestion(db_session, test_user.id, analyze, concurrency=2, ordered=True, reorder_window=5)
+
+    lines = [json.loads(line) for line in await collect(ingestion.run(iter_jsonl_items(reader(data.encode(), 4096))))]
+
+    assert started_before_first_done == 5
+    assert [line["index"] for line in lines[:-1]] == list(range(50))
+
+
+@pytest.mark.asyncio
+async def test_log_batches_are_written_off_the_event_loop(db_session, test_user):
+    """Test batch writes (pool checkout, commit) never block the event loop thread."""
+    from analysis import bulk
+    writer_threads = []
+    store_texts = bulk.store_texts
+
+    def recording_store_texts(db, texts):
+        writer_threads.append(threading.current_thread())
+        return store_texts(db, texts)
+
+    async def analyze(text, labels, latency_class=None):
+        return {"category": "technology", "score": 0.9, "summary": "s", "tone": "neutral"}
+
+    data = "".join(json.dumps({"text": f"Sample text number {i}"}) + "\n" for i in range(5))
+    ingestion = BulkIngestion(db_session, test_user.id, analyze, concurrency=2, log_batch_size=2)
+    with patch("analysis.bulk.store_texts", recording_store_texts):
+        lines = [json.loads(line) for line in await collect(ingestion.run(iter_jsonl_items(reader(data.encode(), 4096))))]
+
+    assert lines[-1]["logged"] == 5
+    assert len(writer_threads) == 3
+    assert threading.main_thread() not in writer_threads
+
+
+@patch('analysis.orchestrator.huggingface_service', new_callable=lambda: MockHuggingFaceService())
+@patch('analysis.orchestrator.gemini_service', new_callable=lambda: MockGeminiService())
+def test_bulk_endpoint_streams_results(mock_gemini, mock_hf, client, auth_headers):
+    """Test the upload endpoint with a CSV file containing an invalid row."""
+    content = b"id,text\nok-1,This is a test article about technology.\nbad,Short\n"
+
+    response = client.post(
+        "/analyze/bulk",
+        headers=auth_headers,
+        files={"file": ("batch.csv", content, "text/csv")}
+    )
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    by_id = {line.get("id"): line for line in lines[:-1]}
+    assert by_id["ok-1"]["result"]["category"] == "technology"
+    assert by_id["bad"]["status"] == "error"
+    assert lines[-1]["succeeded"] == 1 and lines[-1]["failed"] == 1
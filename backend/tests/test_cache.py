@@ -0,0 +1,115 @@
+"""
+Tests for the persistent analysis cache.
+"""
+import pytest
+from unittest.mock import patch
+import threading
+from analysis.cache import AnalysisCache, SQLiteAnalysisCache, cache_key
+from tests.mocks import MockHuggingFaceService, MockGeminiService
+
+
+def test_cache_key_ignores_label_order():
+    """Test that label order does not change the key but models do."""
+    models = {"classifier": "a", "generator": "b"}
+    
+    assert cache_key("text", ["x", "y"], models) == cache_key("text", ["y", "x"], models)
+    assert cache_key("text", ["x", "y"], models) != cache_key("text", ["x", "y"], {**models, "generator": "c"})
+    assert cache_key("text", ["x"], models) != cache_key("text2", ["x"], models)
+
+
+def test_sqlite_cache_roundtrip_across_instances(tmp_path):
+    """Test that results written by one instance are visible to another."""
+    path = str(tmp_path / "cache.sqlite3")
+    writer = SQLiteAnalysisCache(path)
+    reader = SQLiteAnalysisCache(path)
+    
+    writer.set("k", {"category": "technology", "score": 0.9})
+    
+    assert reader.get("k") == {"category": "technology", "score": 0.9}
+    assert reader.get("missing") is None
+    assert reader.hits == 1 and reader.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_async_lookup_runs_off_the_event_loop(tmp_path):
+    """Test aget reads SQLite from a worker thread."""
+    cache = SQLiteAnalysisCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("k", {"a": 1})
+    threads = []
+    original_get = cache.get
+    
+    def recording_get(key):
+        threads.append(threading.current_thread())
+        return original_get(key)
+    
+    cache.get = recording_get
+    
+    assert await cache.aget("k") == {"a": 1}
+    assert threads != [threading.main_thread()]
+
+
+def test_cache_interface_is_abstract():
+    """Test backends must implement get and set."""
+    with pytest.raises(TypeError):
+        AnalysisCache()
+
+
+def test_sqlite_cache_ttl(tmp_path):
+    """Test that expired entries are misses."""
+    cache = SQLiteAnalysisCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=1)
+    cache.set("k", {"a": 1})
+    
+    with patch("analysis.cache.time.time", return_value=10**12):
+        assert cache.get("k") is None
+
+
+def test_sqlite_cache_evicts_least_recently_used(tmp_path):
+    """Test size-bounded eviction."""
+    cache = SQLiteAnalysisCache(str(tmp_path / "cache.sqlite3"), max_bytes=200, evict_every=1000)
+    for i in range(10):
+        cache.set(f"k{i}", {"summary": "x" * 40})
+    
+    removed = cache.evict()
+    
+    assert removed > 0
+    assert cache.stats()["bytes"] <= 200
+    assert cache.get("k9") is not None
+    assert cache.get("k0") is None
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_serves_repeat_from_cache(tmp_path):
+    """Test that a repeated request does not call upstream services again."""
+    from analysis.orchestrator import AnalysisOrchestrator
+    
+    orchestrator = AnalysisOrchestrator(cache=SQLiteAnalysisCache(str(tmp_path / "cache.sqlite3")))
+    hf = MockHuggingFaceService()
+    
+    with patch('analysis.orchestrator.huggingface_service', hf):
+        with patch('analysis.orchestrator.gemini_service', MockGeminiService()):
+            with patch.object(hf, 'classify', wraps=hf.classify) as classify:
+                first = await orchestrator.analyze("Test article about AI", ["technology", "science"])
+                second = await orchestrator.analyze("Test article about AI", ["science", "technology"])
+    
+    assert first == second
+    assert classify.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_is_separate_per_latency_class(tmp_path):
+    """Test a quality request is not served a cached fast-tier result."""
+    from analysis.orchestrator import AnalysisOrchestrator
+    
+    orchestrator = AnalysisOrchestrator(cache=SQLiteAnalysisCache(str(tmp_path / "cache.sqlite3")))
+    gemini = MockGeminiService()
+    
+    with patch('analysis.orchestrator.huggingface_service', MockHuggingFaceService()):
+        with patch('analysis.orchestrator.gemini_service', gemini):
+            with patch.object(gemini, 'analyze', wraps=gemini.analyze) as analyze:
+                await orchestrator.analyze("Test article about AI", ["technology"], latency_class="fast")
+                await orchestrator.analyze("Test article about AI", ["technology"], latency_class="quality")
+                await orchestrator.analyze("Test article about AI", ["technology"], latency_class="quality")
+                await orchestrator.analyze("Test article about AI", ["technology"])
+                await orchestrator.analyze("Test article about AI", ["technology"], latency_class="standard")
+    
+    assert analyze.call_count == 3
@@ -0,0 +1,57 @@
+"""
+Tests for connection pool profiles and metrics.
+"""
+import pytest
+from sqlalchemy import create_engine, text
+from config import Settings
+from database import engine_options, resolve_pool_profile, pool_metrics, TimedNullPool, TimedQueuePool
+
+
+def test_pool_profile_auto(monkeypatch):
+    """Test that 'auto' resolves by deployment environment."""
+    monkeypatch.delenv("VERCEL", raising=False)
+    monkeypatch.delenv("AWS_LAMBDA_FUNCTION_NAME", raising=False)
+    assert resolve_pool_profile("auto") == "server"
+    
+    monkeypatch.setenv("VERCEL", "1")
+    assert resolve_pool_profile("auto") == "serverless"
+    
+    with pytest.raises(ValueError):
+        resolve_pool_profile("huge")
+
+
+def test_engine_options_profiles():
+    """Test engine options for serverless and server profiles."""
+    url = "postgresql://u:p@db:5432/app"
+    
+    serverless = engine_options(Settings(database_url=url, db_pool_profile="serverless"))
+    assert serverless["poolclass"] is TimedNullPool
+    assert "pool_size" not in serverless
+    
+    server = engine_options(Settings(database_url=url, db_pool_profile="server", db_pool_size=20, db_max_overflow=5))
+    assert server["poolclass"] is TimedQueuePool
+    assert server["pool_size"] == 20
+    assert server["max_overflow"] == 5
+
+
+def test_pool_records_checkout_wait(tmp_path):
+    """Test that checkouts from a timed pool are recorded."""
+    engine = create_engine(f"sqlite:///{tmp_path}/pool.db", poolclass=TimedQueuePool, pool_size=1)
+    before = pool_metrics.wait_seconds.count
+    
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    
+    assert pool_metrics.wait_seconds.count == before + 1
+
+
+def test_metrics_endpoint_reports_pool(client, auth_headers, monkeypatch):
+    """Test that /metrics exposes pool state to admins only."""
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers=auth_headers).status_code == 403
+    
+    monkeypatch.setattr("auth.middleware.settings.admin_users", ["testuser"])
+    response = client.get("/metrics", headers=auth_headers)
+    
+    assert response.status_code == 200
+    assert "checkout_wait_seconds" in response.json()["db_pool"]
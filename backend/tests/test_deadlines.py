@@ -0,0 +1,105 @@
+"""
+Tests for client deadlines and degraded partial results.
+"""
+import asyncio
+import time
+import pytest
+from unittest.mock import patch
+from analysis.orchestrator import UNKNOWN_CATEGORY, AnalysisOrchestrator
+from analysis.cache import NullAnalysisCache
+from analysis.similarity import NearDuplicateIndex
+from analysis.services.extractive import MODEL_NAME
+from tests.mocks import MockHuggingFaceService, MockGeminiService
+
+TEXT = "Shares of the chipmaker rose after strong quarterly results. Analysts expect further growth."
+
+
+class SlowService:
+    """Stand-in for either upstream service that hangs until cancelled."""
+
+    def __init__(self):
+        self.cancelled = False
+
+    async def _hang(self):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+    async def classify(self, text, candidate_labels):
+        await self._hang()
+
+    async def analyze(self, text, category, latency_class=None):
+        await self._hang()
+
+
+@pytest.mark.asyncio
+async def test_slow_summary_returns_classification_with_local_summary():
+    """Test a deadline during summarization cancels Gemini and keeps the classification."""
+    orchestrator = AnalysisOrchestrator(cache=NullAnalysisCache(), near_duplicates=NearDuplicateIndex())
+    gemini = SlowService()
+
+    started = time.monotonic()
+    with patch('analysis.orchestrator.huggingface_service', new_callable=lambda: MockHuggingFaceService()):
+        with patch('analysis.orchestrator.gemini_service', gemini):
+            result = await orchestrator.analyze(TEXT, ["technology", "sports"], deadline=started + 0.3)
+
+    assert time.monotonic() - started < 1
+    assert gemini.cancelled
+    assert result["degraded"] is True
+    assert result["deadline_exceeded"] == "summarize"
+    assert result["category"] == "technology"
+    assert result["model"] == MODEL_NAME
+    assert result["tone"] == "positive"
+    # The client's deadline is not held against Gemini
+    assert orchestrator.fallback.consecutive_failures == 0
+    assert orchestrator.deadlines.stats()["exceeded"]["summarize"] == 1
+    assert result["fingerprint"] is None
+    assert orchestrator.near_duplicates.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_classification_returns_unknown_category():
+    """Test a deadline during classification still returns a well-formed result."""
+    orchestrator = AnalysisOrchestrator(cache=NullAnalysisCache())
+    hf = SlowService()
+
+    with patch('analysis.orchestrator.huggingface_service', hf):
+        with patch('analysis.orchestrator.gemini_service', new_callable=lambda: MockGeminiService()):
+            result = await orchestrator.analyze(TEXT, ["technology"], deadline=time.monotonic() + 0.2)
+
+    assert hf.cancelled
+    assert (result["category"], result["score"]) == (UNKNOWN_CATEGORY, 0.0)
+    assert result["deadline_exceeded"] == "classify"
+    assert result["summary"]
+
+
+@pytest.mark.asyncio
+async def test_result_within_deadline_is_not_degraded():
+    """Test fast upstreams are unaffected by a deadline."""
+    orchestrator = AnalysisOrchestrator(cache=NullAnalysisCache())
+
+    with patch('analysis.orchestrator.huggingface_service', new_callable=lambda: MockHuggingFaceService()):
+        with patch('analysis.orchestrator.gemini_service', new_callable=lambda: MockGeminiService()):
+            result = await orchestrator.analyze(TEXT, ["technology"], deadline=time.monotonic() + 5)
+
+    assert "degraded" not in result
+    assert result["model"] == "gemini-test"
+
+
+def test_deadline_header_gives_degraded_response(client, auth_headers, db_session):
+    """Test the endpoint answers 200 with a degraded result instead of failing."""
+    with patch('analysis.orchestrator.huggingface_service', new_callable=lambda: MockHuggingFaceService()):
+        with patch('analysis.orchestrator.gemini_service', SlowService()):
+            response = client.post(
+                "/analyze",
+                json={"text": TEXT, "candidate_labels": ["technology", "sports"]},
+                headers={**auth_headers, "X-Deadline-Ms": "300"}
+            )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["degraded"] is True
+    assert data["deadline_exceeded"] == "summarize"
+    assert data["category"] == "technology"
@@ -0,0 +1,72 @@
+"""
+Tests for streaming history export.
+"""
+import csv
+import io
+import json
+import pytest
+from auth.models import AnalysisLog, User
+from analysis.export import iter_log_rows, ndjson_chunks, csv_chunks, parquet_chunks
+
+
+@pytest.fixture
+def history(db_session, test_user):
+    """Create analysis logs for the test user and another user."""
+    other = User(username="other", email="other@example.com", password_hash="x")
+    db_session.add(other)
+    db_session.commit()
+    for i in range(25):
+        db_session.add(AnalysisLog(
+            user_id=test_user.id, input_text=f'Text {i}, with "quotes"', category="technology",
+            confidence_score=0.5 + i / 100, summary=f"Summary {i}", tone="neutral"
+        ))
+    db_session.add(AnalysisLog(user_id=other.id, input_text="Other", category="sports", tone="positive"))
+    db_session.commit()
+
+
+def test_iter_rows_streams_in_batches(db_session, test_user, history):
+    """Test that rows come back in id order for one user across batches."""
+    rows = list(iter_log_rows(db_session, user_id=test_user.id, batch_size=4))
+    
+    assert len(rows) == 25
+    assert [r["summary"] for r in rows[:2]] == ["Summary 0", "Summary 1"]
+
+
+def test_ndjson_and_csv_serialization(db_session, test_user, history):
+    """Test NDJSON and CSV output."""
+    ndjson = b"".join(ndjson_chunks(iter_log_rows(db_session, user_id=test_user.id))).decode()
+    lines = [json.loads(line) for line in ndjson.splitlines()]
+    assert len(lines) == 25 and lines[3]["input_text"] == 'Text 3, with "quotes"'
+    
+    text = b"".join(csv_chunks(iter_log_rows(db_session, user_id=test_user.id))).decode()
+    records = list(csv.DictReader(io.StringIO(text)))
+    assert len(records) == 25 and records[3]["input_text"] == 'Text 3, with "quotes"'
+
+
+def test_parquet_row_groups(db_session, test_user, history):
+    """Test Parquet output is written in row-group batches."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    
+    data = b"".join(parquet_chunks(iter_log_rows(db_session, user_id=test_user.id), row_group_size=10))
+    parquet_file = pq.ParquetFile(io.BytesIO(data))
+    
+    assert parquet_file.metadata.num_rows == 25
+    assert parquet_file.metadata.num_row_groups == 3
+
+
+def test_export_endpoint_only_returns_own_history(client, auth_headers, history):
+    """Test the export endpoint streams only the caller's rows."""
+    response = client.get("/analyze/history/export?format=ndjson", headers=auth_headers)
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 25
+    assert {row["category"] for row in rows} == {"technology"}
+
+
+def test_export_endpoint_rejects_unknown_format(client, auth_headers):
+    """Test format validation."""
+    response = client.get("/analyze/history/export?format=xml", headers=auth_headers)
+    
+    assert response.status_code == 422
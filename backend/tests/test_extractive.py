@@ -0,0 +1,81 @@
+"""
+Tests for the local extractive summarizer and the Gemini fallback.
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+from analysis.orchestrator import AnalysisOrchestrator, SummaryFallback
+from analysis.cache import NullAnalysisCache
+from analysis.services.extractive import MODEL_NAME, detect_tone, split_sentences, summarize
+from tests.mocks import MockHuggingFaceService, MockGeminiService, MockGeminiServiceError
+
+ARTICLE = (
+    "The central bank raised interest rates to slow inflation. "
+    "Markets fell sharply after the central bank announced the interest rate increase. "
+    "A local bakery won a regional award for its sourdough bread. "
+    "Economists said higher interest rates from the central bank could slow inflation over the next year. "
+    "The weather was mild on Tuesday. "
+    "Mortgage lenders expect interest rates to stay high while inflation remains above target."
+)
+
+
+class SlowGeminiService:
+    """Gemini stand-in that never answers in time."""
+
+    async def analyze(self, text, category, latency_class=None):
+        await asyncio.sleep(5)
+
+
+def test_summarize_selects_central_sentences():
+    """Test that off-topic sentences are left out of the summary."""
+    summary = summarize(ARTICLE, sentence_count=2)
+
+    assert len(split_sentences(summary)) == 2
+    assert "bakery" not in summary and "weather" not in summary
+    assert summary.index("raised") < summary.index("Economists")
+
+
+def test_summarize_short_text_and_word_limit():
+    """Test short texts are returned as-is and long summaries are capped."""
+    assert summarize("Just one sentence here.") == "Just one sentence here."
+    assert summarize(" ".join(["word"] * 500) + ".", max_words=20).endswith("...")
+    assert detect_tone("Strong growth and record profit") == "positive"
+
+
+@pytest.mark.asyncio
+async def test_instant_class_uses_local_summary():
+    """Test the instant latency class never calls Gemini."""
+    orchestrator = AnalysisOrchestrator(cache=NullAnalysisCache())
+
+    with patch('analysis.orchestrator.huggingface_service', new_callable=lambda: MockHuggingFaceService()):
+        with patch('analysis.orchestrator.gemini_service', new_callable=lambda: MockGeminiServiceError()):
+            result = await orchestrator.analyze(ARTICLE, ["economy", "sports"], latency_class="instant")
+
+    assert result["model"] == MODEL_NAME
+    assert "interest" in result["summary"]
+    assert orchestrator.fallback.fallbacks == 0
+
+
+@pytest.mark.asyncio
+async def test_fallback_on_gemini_error_and_timeout():
+    """Test Gemini failures fall back locally and open the circuit."""
+    orchestrator = AnalysisOrchestrator(cache=NullAnalysisCache(), fallback=SummaryFallback(failure_threshold=2))
+
+    with patch('analysis.orchestrator.huggingface_service', new_callable=lambda: MockHuggingFaceService()):
+        with patch('analysis.orchestrator.gemini_service', new_callable=lambda: MockGeminiServiceError()):
+            result = await orchestrator.analyze(ARTICLE, ["economy"])
+        assert result["model"] == MODEL_NAME
+
+        with patch('analysis.orchestrator.settings.summary_fallback_timeout', 0.01):
+            with patch('analysis.orchestrator.gemini_service', new_callable=lambda: SlowGeminiService()):
+                result = await orchestrator.analyze(ARTICLE, ["economy"])
+        assert result["model"] == MODEL_NAME
+
+        # Circuit is open: Gemini is skipped even though it would succeed now
+        with patch('analysis.orchestrator.gemini_service', new_callable=lambda: MockGeminiService()):
+            result = await orchestrator.analyze(ARTICLE, ["economy"])
+        assert result["model"] == MODEL_NAME
+
+    assert orchestrator.fallback.stats() == {
+        "fallbacks": 3, "timeouts": 1, "errors": 1, "consecutive_failures": 2, "open": True
+    }
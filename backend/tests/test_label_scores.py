@@ -0,0 +1,69 @@
+"""
+Tests for label-set-aware classification reuse.
+"""
+import math
+import pytest
+from analysis.cache import SQLiteAnalysisCache
+from analysis.label_scores import LabelScoreStore, merge_scores, distribution
+from analysis.services.huggingface import HuggingFaceService
+
+# Entailment logits of a hypothetical text for each label
+LOGITS = {"technology": 2.0, "science": 1.2, "business": 0.3, "sports": -1.5, "health": -0.2}
+
+
+def softmax(labels):
+    """What the zero-shot API returns for the given labels, sorted by score."""
+    weights = {label: math.exp(LOGITS[label]) for label in labels}
+    total = sum(weights.values())
+    ordered = sorted(labels, key=weights.get, reverse=True)
+    return {"labels": ordered, "scores": [weights[label] / total for label in ordered]}
+
+
+def test_subset_distribution_is_exact():
+    """Test renormalizing stored scores over a subset of labels."""
+    full = softmax(list(LOGITS))
+    log_scores = merge_scores({}, dict(zip(full["labels"], full["scores"])))
+    
+    subset = distribution(log_scores, ["sports", "business"])
+    expected = softmax(["sports", "business"])
+    
+    for label, score in zip(expected["labels"], expected["scores"]):
+        assert subset[label] == pytest.approx(score)
+
+
+def test_merge_with_anchor_aligns_scales():
+    """Test merging a partial upstream response through a shared anchor label."""
+    first = softmax(["technology", "science"])
+    known = merge_scores({}, dict(zip(first["labels"], first["scores"])))
+    second = softmax(["health", "technology"])
+    merged = merge_scores(known, dict(zip(second["labels"], second["scores"])), anchor="technology")
+    
+    combined = distribution(merged, ["science", "health", "technology"])
+    expected = softmax(["science", "health", "technology"])
+    
+    for label, score in zip(expected["labels"], expected["scores"]):
+        assert combined[label] == pytest.approx(score)
+
+
+@pytest.mark.asyncio
+async def test_classify_only_requests_missing_labels(tmp_path):
+    """Test that HuggingFaceService sends only unseen labels upstream."""
+    service = HuggingFaceService()
+    service._label_scores = LabelScoreStore(SQLiteAnalysisCache(str(tmp_path / "cache.sqlite3")), "model")
+    requested = []
+    
+    async def fake_request(text, labels):
+        requested.append(list(labels))
+        return softmax(labels)
+    
+    service._request = fake_request
+    
+    first = await service.classify("some text", ["technology", "science", "business"])
+    reordered = await service.classify("some text", ["business", "technology"])
+    extended = await service.classify("some text", ["science", "sports"])
+    
+    assert requested == [["technology", "science", "business"], ["sports", "technology"]]
+    assert first["category"] == "technology"
+    assert reordered["score"] == pytest.approx(softmax(["business", "technology"])["scores"][0])
+    assert extended["category"] == "science"
+    assert extended["scores"]["sports"] == pytest.approx(softmax(["science", "sports"])["scores"][1])
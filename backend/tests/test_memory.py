@@ -0,0 +1,118 @@
+"""
+Tests for the tracemalloc memory diagnostics and their admin routes.
+"""
+import os
+import time
+import tracemalloc
+import pytest
+from admin.memory import APP_DIR, MemoryDiagnostics, memory_diagnostics, module_name, package_name
+
+# Kept alive between snapshots so the diff has something to find
+_retained = []
+
+
+def _allocate():
+    _retained.append([str(i) * 10 for i in range(20000)])
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr("auth.middleware.settings.admin_users", ["testuser"])
+    yield
+    memory_diagnostics.stop()
+    _retained.clear()
+
+
+def test_snapshot_diff_by_module(client, auth_headers, admin):
+    """Test start, snapshots and a diff that points at the allocating module."""
+    started = client.post("/admin/memory/start", headers=auth_headers).json()
+    assert started["tracing"] is True
+    assert started["frames"] == 1
+
+    assert client.post("/admin/memory/snapshots?name=before", headers=auth_headers).status_code == 201
+    _allocate()
+    assert client.post("/admin/memory/snapshots?name=after", headers=auth_headers).status_code == 201
+
+    diff = client.get(
+        "/admin/memory/diff?base=before&target=after&group_by=module", headers=auth_headers
+    ).json()
+    assert diff[0]["site"] == "tests.test_memory"
+    assert diff[0]["size_diff_bytes"] > 500_000
+
+    top = client.get("/admin/memory/top?snapshot=after&group_by=package", headers=auth_headers).json()
+    assert "tests" in [entry["site"] for entry in top]
+
+    status = client.get("/admin/memory", headers=auth_headers).json()
+    assert [snapshot["name"] for snapshot in status["snapshots"]] == ["before", "after"]
+    assert status["traced_bytes"] > 0
+
+    stopped = client.post("/admin/memory/stop", headers=auth_headers).json()
+    assert stopped["tracing"] is False
+    assert stopped["snapshots"] == []
+
+
+def test_errors(client, auth_headers, admin):
+    """Test snapshots need tracing and unknown snapshots are 404."""
+    assert client.post("/admin/memory/snapshots?name=a", headers=auth_headers).status_code == 409
+    assert client.post("/admin/memory/snapshots?name=../a", headers=auth_headers).status_code == 422
+
+    client.post("/admin/memory/start", headers=auth_headers)
+    assert client.get("/admin/memory/diff?base=missing", headers=auth_headers).status_code == 404
+    assert client.delete("/admin/memory/snapshots/missing", headers=auth_headers).status_code == 404
+
+
+def test_object_counts(client, auth_headers, admin):
+    """Test key types are always reported, even without tracing."""
+    data = client.get("/admin/memory/objects?limit=5", headers=auth_headers).json()
+
+    assert set(data["key_types"]) >= {"httpx.AsyncClient", "auth.models.User"}
+    assert len(data["top"]) == 5
+    assert data["total"] >= data["top"][0]["count"]
+
+
+def test_memory_routes_require_admin(client, auth_headers):
+    """Test regular users cannot start tracing."""
+    assert client.post("/admin/memory/start", headers=auth_headers).status_code == 403
+    assert client.get("/admin/memory/objects", headers=auth_headers).status_code == 403
+
+
+def test_tracing_stops_after_max_seconds():
+    """Test a forgotten trace is switched off."""
+    diagnostics = MemoryDiagnostics(max_snapshots=1, max_seconds=60)
+    diagnostics.start()
+    try:
+        diagnostics.take_snapshot("a")
+        diagnostics.take_snapshot("b")
+        assert [s["name"] for s in diagnostics.status()["snapshots"]] == ["b"]
+
+        diagnostics.started_at = time.monotonic() - 61
+        assert diagnostics.tracing is False
+    finally:
+        diagnostics.stop()
+
+
+def test_tracing_stop_is_scheduled():
+    """Test tracing is switched off on time without reading its status."""
+    diagnostics = MemoryDiagnostics(max_snapshots=1, max_seconds=0.1)
+    diagnostics.start()
+    try:
+        deadline = time.monotonic() + 5
+        while tracemalloc.is_tracing() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert not tracemalloc.is_tracing()
+        assert diagnostics.started_at is None
+    finally:
+        diagnostics.stop()
+
+
+def test_module_names():
+    """Test files map to dotted modules and packages."""
+    roots = [APP_DIR]
+    gemini = os.path.join(APP_DIR, "analysis", "services", "gemini.py")
+    package_init = os.path.join(APP_DIR, "auth", "__init__.py")
+
+    assert module_name(gemini, roots) == "analysis.services.gemini"
+    assert package_name(gemini, roots) == "analysis.services"
+    assert package_name(package_init, roots) == "auth"
+    assert package_name(os.path.join(APP_DIR, "main.py"), roots) == "main"
+    assert module_name("<frozen abc>", roots) == "<frozen abc>"
@@ -0,0 +1,68 @@
+"""
+Tests for the ASGI middleware.
+"""
+import pytest
+from unittest.mock import patch
+from middleware import StripPrefixMiddleware
+from tests.mocks import MockHuggingFaceService, MockGeminiService
+
+
+def parse_server_timing(value):
+    """Server-Timing header -> {name: milliseconds}."""
+    entries = {}
+    for entry in value.split(","):
+        name, duration = entry.strip().split(";dur=")
+        entries[name] = float(duration)
+    return entries
+
+
+@pytest.mark.asyncio
+async def test_strip_prefix_rewrites_path():
+    """Test /api prefixed paths are routed without the prefix."""
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append((scope["path"], scope["raw_path"]))
+
+    middleware = StripPrefixMiddleware(app, prefix="/api")
+    for path in ["/api/analyze", "/api", "/apiary", "/health"]:
+        await middleware({"type": "http", "path": path, "raw_path": path.encode()}, None, None)
+
+    assert seen == [
+        ("/analyze", b"/analyze"),
+        ("/", b"/"),
+        ("/apiary", b"/apiary"),
+        ("/health", b"/health"),
+    ]
+
+
+def test_api_prefix_routes(client):
+    """Test that prefixed requests reach the app routes."""
+    response = client.get("/api/health")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "healthy"
+
+
+@patch('analysis.orchestrator.huggingface_service', new_callable=lambda: MockHuggingFaceService())
+@patch('analysis.orchestrator.gemini_service', new_callable=lambda: MockGeminiService())
+def test_server_timing_breakdown(mock_gemini, mock_hf, client, auth_headers):
+    """Test the Server-Timing header reports the analysis stages."""
+    response = client.post(
+        "/api/analyze",
+        headers=auth_headers,
+        json={"text": "This is a test article about artificial intelligence."}
+    )
+
+    assert response.status_code == 200
+    entries = parse_server_timing(response.headers["server-timing"])
+    assert {"auth", "classify", "summarize", "db", "total"} <= set(entries)
+    assert entries["total"] >= entries["classify"] + entries["summarize"]
+
+
+def test_server_timing_on_streaming_response(client, auth_headers):
+    """Test streaming responses pass through with the header."""
+    response = client.get("/analyze/history/export", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert "auth" in parse_server_timing(response.headers["server-timing"])
@@ -0,0 +1,64 @@
+"""
+Tests for Gemini model routing.
+"""
+import pytest
+from unittest.mock import patch
+from analysis.services.model_router import ModelRouter, ModelTier
+from tests.mocks import MockHuggingFaceService, MockGeminiService
+
+
+@pytest.fixture
+def router():
+    """Router with a lite tier for short inputs and an unlimited pro tier."""
+    return ModelRouter(
+        [ModelTier("lite", "lite-model", 1000), ModelTier("flash", "flash-model", 20000), ModelTier("pro", "pro-model")],
+        budgets={"fast": 1.0, "standard": 5.0}
+    )
+
+
+def test_route_by_length_and_class(router):
+    """Test tier selection by input length and latency class."""
+    assert router.route(200).model == "lite-model"
+    assert router.route(5000).model == "flash-model"
+    assert router.route(50000).model == "pro-model"
+    assert router.route(200, "quality").model == "pro-model"
+
+    with pytest.raises(ValueError):
+        router.route(200, "instant")
+
+
+def test_route_around_slow_model(router):
+    """Test that a model over the latency budget is avoided."""
+    router.observe("lite-model", 2.0)
+    router.observe("flash-model", 0.5)
+
+    assert router.route(200, "fast").model == "flash-model"
+    # Within the standard budget, the cheapest fitting tier is kept
+    assert router.route(200, "standard").model == "lite-model"
+    # Nothing else fits a long input
+    assert router.route(50000, "fast").model == "pro-model"
+
+    # The slow model is probed again after probe_every skips
+    routed = [router.route(200, "fast").model for _ in range(router.probe_every)]
+    assert routed.count("lite-model") == 1
+
+    stats = router.stats()
+    assert stats["flash-model"]["routed"] == router.probe_every
+    assert stats["lite-model"]["ewma_seconds"] == 2.0
+
+
+@patch('analysis.orchestrator.huggingface_service', new_callable=lambda: MockHuggingFaceService())
+@patch('analysis.orchestrator.gemini_service', new_callable=lambda: MockGeminiService())
+def test_serving_model_recorded(mock_gemini, mock_hf, client, auth_headers, db_session):
+    """Test the serving model is returned and stored in the analysis log."""
+    from auth.models import AnalysisLog
+
+    response = client.post(
+        "/analyze",
+        headers=auth_headers,
+        json={"text": "This is a test article about technology.", "latency_class": "fast"}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["model"] == "gemini-test"
+    assert db_session.query(AnalysisLog).one().model == "gemini-test"
@@ -0,0 +1,97 @@
+"""
+Tests for multi-document prompt packing in the Gemini service.
+"""
+import asyncio
+import re
+import pytest
+from analysis.services.gemini import PACK_DOCUMENT_TOKENS, PACK_PROMPT_TOKENS, GeminiService, pack_documents
+from analysis.services.model_router import ModelRouter, ModelTier
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Answers packed prompts with numbered blocks, skipping documents listed in ``omit``."""
+
+    def __init__(self, omit=()):
+        self.prompts = []
+        self.omit = set(omit)
+
+    def generate_content(self, prompt):
+        self.prompts.append(prompt)
+        numbers = [int(number) for number in re.findall(r"=== DOCUMENT (\d+)", prompt)]
+        if not numbers:
+            return FakeResponse("SUMMARY: Single summary.\nTONE: neutral")
+        # Blocks deliberately out of order
+        blocks = [
+            f"### DOCUMENT {number}\nSUMMARY: Summary {number}.\nTONE: positive"
+            for number in reversed(numbers) if number not in self.omit
+        ]
+        return FakeResponse("\n\n".join(blocks))
+
+
+def make_service(model):
+    service = GeminiService(router=ModelRouter([ModelTier("only", "fake-model")]))
+    service._models["fake-model"] = model
+    return service
+
+
+def test_pack_documents_respects_budget_and_size():
+    """Test packs close at the token budget or document limit, and big documents go alone."""
+    per_document = PACK_DOCUMENT_TOKENS + 100
+    budget = PACK_PROMPT_TOKENS + 2 * per_document
+
+    assert pack_documents([100, 100, 100], budget, max_documents=8) == [[0, 1], [2]]
+    assert pack_documents([100, 100, 100], 100000, max_documents=2) == [[0, 1], [2]]
+    assert pack_documents([100, 100000, 100], budget, max_documents=8) == [[0], [1], [2]]
+
+
+def test_packed_response_parsing_keeps_documents_apart():
+    """Test blocks are matched by number and incomplete blocks are rejected."""
+    service = make_service(FakeModel())
+    text = (
+        "### DOCUMENT 2\nSUMMARY: Second.\nTONE: Negative\n"
+        "### DOCUMENT 1\nSUMMARY: First.\n"
+        "### DOCUMENT 3\nSUMMARY: Third.\nTONE: neutral"
+    )
+
+    assert service._parse_packed_response(text, 3) == [
+        None,
+        {"summary": "Second.", "tone": "negative"},
+        {"summary": "Third.", "tone": "neutral"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_analyze_many_packs_and_falls_back_per_document():
+    """Test one packed call covers short texts and unparseable documents are retried alone."""
+    model = FakeModel(omit={2})
+    service = make_service(model)
+    documents = [("Great launch.", "technology"), ("Stocks fell.", "business"), ("Calm day.", "news")]
+
+    results = await service.analyze_many(documents)
+
+    assert [result["summary"] for result in results] == ["Summary 1.", "Single summary.", "Summary 3."]
+    assert {result["model"] for result in results} == {"fake-model"}
+    assert len(model.prompts) == 2
+    assert 'categorized as "business"' in model.prompts[0]
+    assert service.packing_stats()["parse_fallbacks"] == 1
+
+
+@pytest.mark.asyncio
+async def test_packed_requests_share_one_call():
+    """Test concurrent analyze_packed calls are collected into one prompt."""
+    model = FakeModel()
+    service = make_service(model)
+    service.packer.window = 0.02
+
+    results = await asyncio.gather(
+        service.analyze_packed("First text.", "technology"),
+        service.analyze_packed("Second text.", "sports"),
+    )
+
+    assert len(model.prompts) == 1
+    assert [result["summary"] for result in results] == ["Summary 1.", "Summary 2."]
@@ -0,0 +1,109 @@
+"""
+Tests for analysis_logs partition maintenance and migrations.
+"""
+import pytest
+from datetime import date
+from sqlalchemy import create_engine, inspect
+import partitions
+from migrate import alembic_config
+
+
+def test_add_months_crosses_years():
+    assert partitions.add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert partitions.add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert partitions.add_months(date(2024, 3, 1), -14) == date(2023, 1, 1)
+
+
+def test_partition_names_round_trip():
+    name = partitions.partition_name(date(2024, 7, 1))
+    assert name == "analysis_logs_p202407"
+    assert partitions.parse_partition_name(name) == date(2024, 7, 1)
+    assert partitions.parse_partition_name("analysis_logs_archive") is None
+
+
+class _FakeConn:
+    """Records statements; lists a fixed set of partitions (and DEFAULT partition rows)."""
+
+    def __init__(self, months, default_months=None):
+        self.months = months
+        self.default_months = default_months
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+
+
+@pytest.fixture
+def fake_partitions(monkeypatch):
+    def install(months, default_months=None):
+        conn = _FakeConn(months, default_months)
+        monkeypatch.setattr(
+            partitions, "list_partitions",
+            lambda c: [(month, partitions.partition_name(month)) for month in c.months]
+        )
+        monkeypatch.setattr(partitions, "default_partition_months", lambda c: c.default_months)
+        return conn
+    return install
+
+
+def test_ensure_partitions_creates_missing_months(fake_partitions):
+    conn = fake_partitions([date(2024, 6, 1)])
+    created = partitions.ensure_partitions(conn, months_ahead=2, today=date(2024, 6, 15))
+
+    assert created == ["analysis_logs_p202407", "analysis_logs_p202408"]
+    assert "FROM ('2024-08-01') TO ('2024-09-01')" in conn.statements[-1]
+
+
+def test_ensure_partitions_moves_rows_out_of_the_default_partition(fake_partitions):
+    """Test months that only exist in the DEFAULT partition get their own, with the rows moved."""
+    conn = fake_partitions([date(2024, 6, 1)], default_months=[date(2024, 4, 1)])
+    created = partitions.ensure_partitions(conn, months_ahead=1, today=date(2024, 6, 15))
+
+    assert created == ["analysis_logs_p202404", "analysis_logs_p202407"]
+    statements = conn.statements
+    assert 'DETACH PARTITION "analysis_logs_default"' in statements[0]
+    assert '"analysis_logs_p202404"' in statements[1]
+    assert "created_at >= '2024-04-01' AND created_at < '2024-05-01'" in statements[2]
+    assert statements[3].startswith('DELETE FROM "analysis_logs_default"')
+    assert statements[4].endswith('ATTACH PARTITION "analysis_logs_default" DEFAULT')
+    # The current and upcoming months have no stranded rows: plain CREATE only
+    assert len(statements) == 6 and "FROM ('2024-07-01') TO ('2024-08-01')" in statements[5]
+
+
+def test_retention_removes_whole_expired_months(fake_partitions):
+    months = [date(2024, m, 1) for m in range(1, 7)]
+    conn = fake_partitions(months)
+    removed = partitions.apply_retention(conn, retention_months=3, mode="detach", today=date(2024, 6, 10))
+
+    # Keeps March onwards: the current month plus three full months of history
+    assert removed == ["analysis_logs_p202401", "analysis_logs_p202402"]
+    assert not any("DROP TABLE" in statement for statement in conn.statements)
+    assert sum("DETACH PARTITION" in statement for statement in conn.statements) == 2
+
+
+def test_retention_disabled_and_dry_run(fake_partitions):
+    conn = fake_partitions([date(2020, 1, 1)])
+    assert partitions.apply_retention(conn, retention_months=0, today=date(2024, 6, 1)) == []
+    assert partitions.apply_retention(conn, retention_months=1, today=date(2024, 6, 1), dry_run=True) == [
+        "analysis_logs_p202001"
+    ]
+    assert conn.statements == []
+
+    with pytest.raises(ValueError):
+        partitions.apply_retention(conn, retention_months=1, mode="archive")
+
+
+def test_migrations_upgrade_sqlite(tmp_path):
+    """The migration chain runs on SQLite, where the table stays unpartitioned."""
+    from alembic import command
+
+    url = f"sqlite:///{tmp_path / 'migrate.db'}"
+    command.upgrade(alembic_config(url), "head")
+
+    engine = create_engine(url)
+    inspector = inspect(engine)
+    assert {"users", "label_vocabulary", "analysis_logs", "texts", "alembic_version"} <= set(inspector.get_table_names())
+    columns = {column["name"]: column for column in inspector.get_columns("analysis_logs")}
+    assert "model" in columns and "text_hash" in columns
+    assert columns["input_text"]["nullable"]
+    assert partitions.maintain(engine) == {"partitioned": False, "created": [], "removed": []}
@@ -0,0 +1,114 @@
+"""
+Tests for the per-request sampling profiler and its admin routes.
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+from auth.api_keys import api_key_cache, generate_api_key
+from auth.middleware import claims_admin
+from auth.models import ApiKey
+from auth.utils import create_access_token
+from profiling import ProfileStore, call_tree, collapsed_stacks, get_profile_store
+from tests.mocks import MockHuggingFaceService
+
+TEXT = "The new smartphone ships with a faster chip and a bigger battery."
+
+
+class SlowGeminiService:
+    """Gemini stand-in that takes long enough to be sampled."""
+
+    async def analyze(self, text, category, latency_class=None):
+        await asyncio.sleep(0.15)
+        return {"summary": "A phone launch.", "tone": "positive", "model": "gemini-test"}
+
+
+@pytest.fixture
+def profile_store(tmp_path, monkeypatch):
+    store = get_profile_store()
+    monkeypatch.setattr(store, "directory", str(tmp_path))
+    return store
+
+
+def profiled_analyze(client, headers):
+    with patch('analysis.orchestrator.huggingface_service', new_callable=lambda: MockHuggingFaceService()):
+        with patch('analysis.orchestrator.gemini_service', SlowGeminiService()):
+            return client.post("/analyze", json={"text": TEXT}, headers={**headers, "X-Profile": "1"})
+
+
+def test_admin_profile_is_stored_and_downloadable(client, auth_headers, profile_store, monkeypatch):
+    """Test an admin's profiled request is stored and served as tree and collapsed stacks."""
+    monkeypatch.setattr("auth.middleware.settings.admin_users", ["testuser"])
+
+    response = profiled_analyze(client, auth_headers)
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    listing = client.get("/admin/profiles", headers=auth_headers).json()
+    assert [profile["id"] for profile in listing] == [profile_id]
+    assert listing[0]["path"] == "/analyze"
+    assert listing[0]["user"] == "testuser"
+    assert listing[0]["waiting_samples"] > 0
+    assert "stacks" not in listing[0]
+
+    collapsed = client.get(f"/admin/profiles/{profile_id}?format=collapsed", headers=auth_headers).text
+    assert "analysis.orchestrator.AnalysisOrchestrator.analyze" in collapsed
+    assert "SlowGeminiService.analyze" in collapsed
+    # Server and event loop frames above the middleware are not recorded
+    assert all(line.startswith("profiling.ProfilingMiddleware.__call__") for line in collapsed.splitlines())
+
+    tree = client.get(f"/admin/profiles/{profile_id}", headers=auth_headers).json()["tree"]
+    assert tree["samples"] == listing[0]["samples"]
+
+
+def test_non_admin_profile_is_discarded(client, auth_headers, profile_store):
+    """Test the header is ignored for regular users and admin routes are forbidden."""
+    with patch("profiling.ProfileSession", side_effect=AssertionError("sampled")):
+        response = profiled_analyze(client, auth_headers)
+
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert profile_store.list() == []
+    assert client.get("/admin/profiles", headers=auth_headers).status_code == 403
+
+
+def test_profile_store_is_bounded(tmp_path):
+    """Test old profiles are dropped and ids cannot escape the directory."""
+    store = ProfileStore(str(tmp_path), max_profiles=2)
+    ids = [f"2025010{day}T000000-0000000{day}" for day in (1, 2, 3)]
+    for profile_id in ids:
+        store.save({"id": profile_id, "stacks": {"a;b": 1}})
+
+    assert [profile["id"] for profile in store.list()] == ids[:0:-1]
+    assert store.load(ids[0]) is None
+    assert store.load("../secrets") is None
+
+
+def test_stack_formats():
+    """Test collapsed output and call tree aggregation."""
+    stacks = {"a;b": 3, "a;c": 1, "a": 2}
+
+    assert collapsed_stacks(stacks) == "a 2\na;b 3\na;c 1\n"
+    tree = call_tree(stacks)
+    node = tree["children"][0]
+    assert (tree["samples"], node["name"], node["samples"], node["self"]) == (6, "a", 6, 2)
+    assert [child["name"] for child in node["children"]] == ["b", "c"]
+
+
+def test_admin_precheck_needs_no_database(client, auth_headers, db_session, test_user, monkeypatch):
+    """Test the pre-sampling check reads the token claim or an already verified API key."""
+    monkeypatch.setattr("auth.middleware.settings.admin_users", ["testuser"])
+    token = auth_headers["Authorization"].split(" ", 1)[1]
+    key, key_id, secret_hash = generate_api_key()
+    db_session.add(ApiKey(user_id=test_user.id, key_id=key_id, secret_hash=secret_hash, name="svc"))
+    db_session.commit()
+
+    assert claims_admin(token)
+    assert not claims_admin(create_access_token(data={"sub": str(test_user.id)}))
+    assert not claims_admin(key)
+    api_key_cache.resolve(db_session, key)
+    assert claims_admin(key)
+    assert not claims_admin(key[:-1] + ("x" if key[-1] != "x" else "y"))
+
+    monkeypatch.setattr("auth.middleware.settings.admin_users", ["someone-else"])
+    assert not claims_admin(token)
+    assert not claims_admin(key)
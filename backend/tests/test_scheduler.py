@@ -0,0 +1,85 @@
+"""
+Tests for weighted fair scheduling of upstream calls.
+"""
+import asyncio
+import pytest
+from types import SimpleNamespace
+from analysis.scheduler import FairScheduler, weight_resolver
+
+
+async def run_jobs(scheduler, jobs, order):
+    """Run (user, label) jobs that each hold a slot briefly, recording dispatch order."""
+    async def job(user, label):
+        async with scheduler.slot(user):
+            order.append(label)
+            await asyncio.sleep(0.001)
+
+    tasks = []
+    for user, label in jobs:
+        tasks.append(asyncio.create_task(job(user, label)))
+        # Let each task enqueue before the next one is created
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_burst_does_not_starve_other_users():
+    """Test that a late user is served ahead of another user's backlog."""
+    scheduler = FairScheduler(capacity=1)
+    order = []
+
+    jobs = [("heavy", f"h{i}") for i in range(8)] + [("light", "l0"), ("light", "l1")]
+    await run_jobs(scheduler, jobs, order)
+
+    assert order.index("l0") <= 2
+    assert order.index("l1") <= 4
+    assert scheduler.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_weights_share_capacity():
+    """Test that dispatch rates follow user weights while both are backlogged."""
+    scheduler = FairScheduler(capacity=1, weight_for=lambda user: 2.0 if user == "pro" else 1.0)
+    order = []
+
+    jobs = [("free", f"f{i}") for i in range(6)] + [("pro", f"p{i}") for i in range(6)]
+    await run_jobs(scheduler, jobs, order)
+
+    first_nine = order[:9]
+    assert sum(label.startswith("p") for label in first_nine) >= 5
+
+    stats = scheduler.stats()["users"]
+    assert stats["pro"]["weight"] == 2.0
+    assert stats["pro"]["dispatched"] == 6 and stats["pro"]["queued"] == 0
+    assert stats["free"]["wait_seconds"]["count"] == 6
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_releases_nothing():
+    """Test that cancelling a queued request does not leak or lose a slot."""
+    scheduler = FairScheduler(capacity=1)
+
+    await scheduler.acquire("a")
+    waiter = asyncio.create_task(scheduler.acquire("b"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    scheduler.release("a")
+
+    assert scheduler.stats()["in_flight"] == 0
+    assert await asyncio.wait_for(scheduler.acquire("c"), timeout=1) == 0.0
+    assert scheduler.stats()["queued"] == 0
+
+
+def test_weight_resolver_precedence():
+    """Test user weights override plan weights, which override the default."""
+    settings = SimpleNamespace(
+        scheduler_user_weights={"1": 5},
+        scheduler_user_plans={"1": "pro", "2": "pro"},
+        scheduler_plan_weights={"pro": 3},
+        scheduler_default_weight=1.0
+    )
+    weight_for = weight_resolver(settings)
+
+    assert (weight_for(1), weight_for(2), weight_for(3)) == (5.0, 3.0, 1.0)
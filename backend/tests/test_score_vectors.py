@@ -0,0 +1,55 @@
+"""
+Tests for packed score vector storage.
+"""
+import math
+import numpy as np
+from unittest.mock import patch
+from analysis.score_vectors import pack_scores, unpack_scores, decode_score_matrix, load_score_matrix
+from auth.models import AnalysisLog
+from tests.mocks import MockHuggingFaceService, MockGeminiService
+
+
+def test_pack_roundtrip():
+    """Test packing is compact and lossless within float16 precision."""
+    ids_blob, values_blob = pack_scores([3, 1, 7], [0.7, 0.2, 0.1])
+    
+    assert len(ids_blob) == 12 and len(values_blob) == 6
+    ids, values = unpack_scores(ids_blob, values_blob)
+    assert ids.tolist() == [3, 1, 7]
+    assert np.allclose(values, [0.7, 0.2, 0.1], atol=1e-3)
+
+
+def test_decode_matrix_with_mixed_label_sets():
+    """Test decoding rows with different label sets into one matrix."""
+    rows = [pack_scores([1, 2], [0.9, 0.1]), pack_scores([3, 1], [0.6, 0.4]), (None, None)]
+    
+    columns, matrix = decode_score_matrix([r[0] for r in rows], [r[1] for r in rows])
+    
+    assert columns.tolist() == [1, 2, 3]
+    assert matrix.shape == (3, 3)
+    assert math.isclose(matrix[1, 0], 0.4, abs_tol=1e-3)
+    assert np.isnan(matrix[0, 2]) and np.isnan(matrix[2]).all()
+    
+    columns, matrix = decode_score_matrix([r[0] for r in rows], [r[1] for r in rows], label_ids=[3])
+    assert columns.tolist() == [3] and matrix.shape == (3, 1)
+
+
+@patch('analysis.orchestrator.huggingface_service', new_callable=lambda: MockHuggingFaceService())
+@patch('analysis.orchestrator.gemini_service', new_callable=lambda: MockGeminiService())
+def test_analyze_stores_score_vectors(mock_gemini, mock_hf, client, auth_headers, db_session):
+    """Test that /analyze logs the distribution and it loads as a matrix."""
+    for labels in (["technology", "science"], ["science", "sports", "technology"]):
+        response = client.post(
+            "/analyze",
+            headers=auth_headers,
+            json={"text": "This is a test article about technology.", "candidate_labels": labels}
+        )
+        assert response.status_code == 200
+    
+    log_ids, names, matrix = load_score_matrix(db_session)
+    
+    assert len(log_ids) == 2
+    assert sorted(names) == ["science", "sports", "technology"]
+    assert math.isclose(matrix[0, names.index("technology")], 0.95, abs_tol=1e-3)
+    assert np.isnan(matrix[0, names.index("sports")])
+    assert db_session.query(AnalysisLog).first().score_values is not None
@@ -0,0 +1,148 @@
+"""
+Tests for interactive analysis sessions over WebSocket.
+"""
+import asyncio
+from datetime import timedelta
+import pytest
+from unittest.mock import patch
+from starlette.websockets import WebSocketDisconnect
+from auth.models import AnalysisLog
+from auth.utils import create_access_token
+from tests.mocks import MockHuggingFaceService, MockGeminiService
+
+TEXT = "The new smartphone ships with a faster chip and a bigger battery."
+
+
+class HangingGeminiService:
+    """Gemini stand-in that never answers until cancelled."""
+
+    def __init__(self):
+        self.cancelled = False
+
+    async def analyze(self, text, category, latency_class=None):
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+def receive_until(ws, message_type, request_id):
+    """Messages up to and including the first of ``message_type`` for ``request_id``."""
+    messages = []
+    while True:
+        message = ws.receive_json()
+        messages.append(message)
+        if message["type"] == message_type and message["id"] == request_id:
+            return messages
+
+
+@pytest.fixture
+def services():
+    with patch('analysis.orchestrator.huggingface_service', new_callable=lambda: MockHuggingFaceService()):
+        with patch('analysis.orchestrator.gemini_service', new_callable=lambda: MockGeminiService()):
+            yield
+
+
+def test_multiplexed_analyses_push_stages_and_results(client, auth_headers, db_session, services):
+    """Test two tagged requests on one connection each get stages, a result and a log."""
+    with client.websocket_connect("/analyze/ws", headers=auth_headers) as ws:
+        assert ws.receive_json() == {"type": "ready", "user": "testuser"}
+        ws.send_json({"type": "analyze", "id": "a", "text": TEXT})
+        ws.send_json({"type": "analyze", "id": 2, "text": TEXT, "candidate_labels": ["sports", "technology"]})
+
+        messages = receive_until(ws, "result", "a")
+        if not any(m["type"] == "result" and m["id"] == 2 for m in messages):
+            messages += receive_until(ws, "result", 2)
+
+    for request_id in ("a", 2):
+        own = [m for m in messages if m["id"] == request_id]
+        assert [m.get("stage", m["type"]) for m in own] == ["classify", "summarize", "result"]
+        assert own[0]["category"] == "technology"
+        assert own[1]["tone"] == "positive"
+        assert own[2]["result"]["summary"] == own[1]["summary"]
+    assert db_session.query(AnalysisLog).count() == 2
+
+
+def test_auth_message_and_rejection(client, test_user, services):
+    """Test browsers authenticate with a first message and bad tokens are closed."""
+    response = client.post("/auth/login", json={"username": "testuser", "password": "testpassword123"})
+    token = response.json()["access_token"]
+
+    with client.websocket_connect("/analyze/ws") as ws:
+        ws.send_json({"type": "auth", "token": token})
+        assert ws.receive_json()["type"] == "ready"
+        ws.send_json({"type": "ping", "id": 1})
+        assert ws.receive_json() == {"type": "pong", "id": 1}
+
+    with client.websocket_connect("/analyze/ws") as ws:
+        ws.send_json({"type": "auth", "token": "not-a-token"})
+        assert ws.receive_json()["detail"] == "Could not validate credentials"
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1008
+
+
+def test_cancel_in_flight_analysis(client, auth_headers, db_session):
+    """Test a cancel message stops the upstream call and nothing is logged."""
+    gemini = HangingGeminiService()
+    with patch('analysis.orchestrator.huggingface_service', new_callable=lambda: MockHuggingFaceService()):
+        with patch('analysis.orchestrator.gemini_service', gemini):
+            with client.websocket_connect("/analyze/ws", headers=auth_headers) as ws:
+                ws.receive_json()
+                ws.send_json({"type": "analyze", "id": "slow", "text": TEXT})
+                assert ws.receive_json()["stage"] == "classify"
+                ws.send_json({"type": "cancel", "id": "slow"})
+                assert ws.receive_json() == {"type": "cancelled", "id": "slow"}
+
+                ws.send_json({"type": "cancel", "id": "slow"})
+                assert ws.receive_json()["type"] == "error"
+
+    assert gemini.cancelled
+    assert db_session.query(AnalysisLog).count() == 0
+
+
+def test_invalid_messages_keep_the_session_open(client, auth_headers, services):
+    """Test bad messages get an error reply instead of closing the connection."""
+    with client.websocket_connect("/analyze/ws", headers=auth_headers) as ws:
+        ws.receive_json()
+        ws.send_text("not json")
+        assert ws.receive_json() == {"type": "error", "id": None, "detail": "Invalid JSON message"}
+        ws.send_json({"type": "analyze", "text": TEXT})
+        assert ws.receive_json()["id"] is None
+        ws.send_json({"type": "analyze", "id": "short", "text": "too short"})
+        assert "text" in ws.receive_json()["detail"]
+        ws.send_json({"type": "upload", "id": "x"})
+        assert ws.receive_json()["detail"] == "Unknown message type: upload"
+
+        ws.send_json({"type": "analyze", "id": "ok", "text": TEXT})
+        assert receive_until(ws, "result", "ok")[-1]["result"]["category"] == "technology"
+
+
+def test_session_closes_when_the_token_expires(client, test_user, services):
+    """Test an expired JWT ends the session instead of being trusted until disconnect."""
+    token = create_access_token(data={"sub": str(test_user.id)}, expires_delta=timedelta(seconds=1))
+
+    with client.websocket_connect("/analyze/ws", headers={"Authorization": f"Bearer {token}"}) as ws:
+        assert ws.receive_json()["type"] == "ready"
+        assert ws.receive_json() == {"type": "error", "id": None, "detail": "Credentials expired or revoked"}
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1008
+
+
+def test_session_closes_when_the_api_key_is_revoked(client, auth_headers, services, monkeypatch):
+    """Test revoking the key a session authenticated with closes it."""
+    monkeypatch.setattr("analysis.routes.settings.api_key_revocation_sync", 0.05)
+    created = client.post("/auth/api-keys", headers=auth_headers, json={"name": "ws"}).json()
+
+    with client.websocket_connect("/analyze/ws", headers={"X-API-Key": created["key"]}) as ws:
+        assert ws.receive_json()["type"] == "ready"
+        ws.send_json({"type": "analyze", "id": "before", "text": TEXT})
+        assert receive_until(ws, "result", "before")[-1]["result"]["category"] == "technology"
+
+        assert client.delete(f"/auth/api-keys/{created['key_id']}", headers=auth_headers).status_code == 204
+        assert ws.receive_json()["detail"] == "Credentials expired or revoked"
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1008
@@ -0,0 +1,127 @@
+"""
+Tests for near-duplicate detection and reuse.
+"""
+import pytest
+from unittest.mock import patch
+from analysis.similarity import (
+    NearDuplicateIndex, fingerprint, similarity, labels_signature, to_signed64, from_signed64
+)
+from auth.models import AnalysisLog
+from tests.mocks import MockHuggingFaceService, MockGeminiService
+
+ARTICLE = (
+    "The central bank held interest rates steady on Wednesday, citing persistent inflation "
+    "and a resilient labour market. Officials signalled that cuts remain possible later in "
+    "the year if price growth continues to cool. Markets rallied modestly after the decision, "
+    "with technology shares leading gains. Read more: https://news.example.com/rates?utm_source=newsletter"
+)
+VARIANT = (
+    "By Staff Reporter\n\n" + ARTICLE.replace("utm_source=newsletter", "utm_source=twitter&ref=home")
+    .replace(". ", ".   ")
+)
+UNRELATED = (
+    "The home side came from two goals down to win in extra time, sending the crowd into "
+    "raptures. The coach praised the squad's determination and singled out the young striker, "
+    "who scored twice in the final ten minutes of a thrilling and chaotic cup tie."
+)
+RESULT = {"category": "business", "score": 0.8, "summary": "Rates held.", "tone": "neutral"}
+
+
+def test_fingerprint_tolerates_trivial_differences():
+    """Test that tracking params, whitespace and bylines barely move the fingerprint."""
+    assert similarity(fingerprint(ARTICLE), fingerprint(VARIANT)) >= 0.95
+    assert similarity(fingerprint(ARTICLE), fingerprint(UNRELATED)) < 0.9
+    assert fingerprint("too short to fingerprint") is None
+
+
+def test_signed_conversion_roundtrip():
+    """Test storage conversion for BIGINT columns."""
+    for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        assert from_signed64(to_signed64(value)) == value
+        assert -(1 << 63) <= to_signed64(value) < (1 << 63)
+
+
+def test_index_lookup_respects_threshold_and_labels():
+    """Test lookups within distance and label set."""
+    index = NearDuplicateIndex(threshold=0.95)
+    labels = labels_signature(["business", "sports"])
+    fp = fingerprint(ARTICLE)
+    index.add(fp, labels, RESULT)
+    
+    match = index.lookup(fp ^ 0b101, labels)
+    assert match is not None and match[0] == RESULT
+    assert index.lookup(fp ^ 0xFFFF, labels) is None
+    assert index.lookup(fp, labels_signature(["business"])) is None
+    assert labels == labels_signature(["sports", "business"])
+    # Other latency classes route to other models and are not reused
+    assert index.lookup(fp, labels_signature(["business", "sports"], "quality")) is None
+    assert labels == labels_signature(["business", "sports"], "standard")
+
+
+def test_index_is_bounded():
+    """Test oldest-first eviction at capacity."""
+    index = NearDuplicateIndex(threshold=1.0, capacity=2)
+    for fp in (1, 2, 3):
+        index.add(fp, "l", {"n": fp})
+    
+    assert index.lookup(1, "l") is None
+    assert index.lookup(3, "l")[0] == {"n": 3}
+    assert index.stats()["entries"] == 2
+
+
+def test_index_rebuild_from_logs(db_session, test_user):
+    """Test rebuilding the index from analysis_logs."""
+    labels = labels_signature(["business", "sports"])
+    db_session.add(AnalysisLog(
+        user_id=test_user.id, input_text=ARTICLE[:1000], text_fingerprint=to_signed64(fingerprint(ARTICLE)),
+        label_set=labels, category="business", confidence_score=0.8, summary="Rates held.", tone="neutral"
+    ))
+    db_session.commit()
+    
+    index = NearDuplicateIndex()
+    assert index.rebuild(db_session, limit=100) == 1
+    assert index.lookup(fingerprint(VARIANT), labels)[0]["summary"] == "Rates held."
+
+
+def test_local_and_degraded_results_are_not_reindexed(db_session, test_user):
+    """Test fallback summaries and partial results are not fingerprinted or rebuilt."""
+    from analysis.routes import log_analysis
+    from analysis.schemas import AnalyzeRequest
+    from analysis.services.extractive import MODEL_NAME
+    
+    request = AnalyzeRequest(text=ARTICLE, candidate_labels=["business", "sports"])
+    fp = fingerprint(ARTICLE)
+    base = {"category": "business", "score": 0.8, "summary": "Rates held.", "tone": "neutral", "fingerprint": fp}
+    log_analysis(db_session, test_user.id, request, {**base, "model": MODEL_NAME})
+    log_analysis(db_session, test_user.id, request, {**base, "model": "gemini-test", "degraded": True})
+    # Logged before fingerprints were limited to reusable results
+    db_session.add(AnalysisLog(
+        user_id=test_user.id, text_fingerprint=to_signed64(fp), label_set=labels_signature(["business", "sports"]),
+        category="business", confidence_score=0.8, summary="Local.", tone="neutral", model=MODEL_NAME
+    ))
+    db_session.commit()
+    
+    assert db_session.query(AnalysisLog).filter(AnalysisLog.text_fingerprint.isnot(None)).count() == 1
+    assert NearDuplicateIndex().rebuild(db_session, limit=100) == 0
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_reuses_near_duplicate():
+    """Test that a near-duplicate request is answered from the index and marked."""
+    from analysis.orchestrator import AnalysisOrchestrator
+    from analysis.cache import NullAnalysisCache
+    
+    orchestrator = AnalysisOrchestrator(cache=NullAnalysisCache(), near_duplicates=NearDuplicateIndex())
+    hf = MockHuggingFaceService()
+    
+    with patch('analysis.orchestrator.huggingface_service', hf):
+        with patch('analysis.orchestrator.gemini_service', MockGeminiService()):
+            with patch.object(hf, 'classify', wraps=hf.classify) as classify:
+                first = await orchestrator.analyze(ARTICLE, ["business", "sports"])
+                second = await orchestrator.analyze(VARIANT, ["business", "sports"])
+    
+    assert classify.call_count == 1
+    assert "near_duplicate" not in first
+    assert second["near_duplicate"] is True
+    assert second["summary"] == first["summary"]
+    assert second["similarity"] >= 0.95
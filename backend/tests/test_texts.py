@@ -0,0 +1,74 @@
+"""
+Tests for content-addressed input text storage.
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from sqlalchemy import inspect
+from auth.models import AnalysisLog, StoredText
+from analysis.export import iter_log_rows
+from analysis.texts import (
+    compress_text, decompress_text, delete_unreferenced_texts, load_text, store_texts, text_hash
+)
+from tests.mocks import MockHuggingFaceService, MockGeminiService
+
+LONG_TEXT = "Markets rallied as technology shares climbed on strong earnings. " * 50
+
+
+def test_compress_roundtrip_and_raw_fallback():
+    """Test long texts are compressed and short ones kept raw."""
+    codec, content = compress_text(LONG_TEXT)
+    assert codec == "zlib" and len(content) < len(LONG_TEXT) // 10
+    assert decompress_text(codec, content) == LONG_TEXT
+
+    assert compress_text("Short é")[0] == "raw"
+    assert decompress_text(*compress_text("Short é")) == "Short é"
+
+
+def test_store_texts_deduplicates(db_session):
+    """Test each distinct text is stored once and hashes keep input order."""
+    hashes = store_texts(db_session, [LONG_TEXT, "other text", LONG_TEXT])
+    db_session.commit()
+    store_texts(db_session, [LONG_TEXT])
+    db_session.commit()
+
+    assert hashes[0] == hashes[2] == text_hash(LONG_TEXT)
+    assert db_session.query(StoredText).count() == 2
+    assert load_text(db_session, hashes[1]) == "other text"
+    assert load_text(db_session, "0" * 64) is None
+
+
+@patch('analysis.orchestrator.huggingface_service', new_callable=lambda: MockHuggingFaceService())
+@patch('analysis.orchestrator.gemini_service', new_callable=lambda: MockGeminiService())
+def test_analyze_keeps_full_text_once(mock_gemini, mock_hf, client, auth_headers, db_session, test_user):
+    """Test repeated analyses share one stored copy of the full input."""
+    for _ in range(3):
+        response = client.post("/analyze", headers=auth_headers, json={"text": LONG_TEXT})
+        assert response.status_code == 200
+
+    logs = db_session.query(AnalysisLog).all()
+    assert len(logs) == 3 and {log.text_hash for log in logs} == {text_hash(LONG_TEXT)}
+    assert logs[0].input_text is None
+    assert db_session.query(StoredText).count() == 1
+
+    # Content is deferred until the text is read
+    stored = logs[0].stored_text
+    assert "content" in inspect(stored).unloaded
+    assert logs[0].text == LONG_TEXT
+
+    rows = list(iter_log_rows(db_session, user_id=test_user.id))
+    assert [row["input_text"] for row in rows] == [LONG_TEXT] * 3
+
+
+def test_legacy_rows_and_pruning(db_session, test_user):
+    """Test rows without a stored text fall back to input_text; orphans are pruned."""
+    db_session.add(AnalysisLog(user_id=test_user.id, input_text="Legacy copy"))
+    referenced, orphan = store_texts(db_session, ["kept text", "orphaned text"])
+    db_session.add(AnalysisLog(user_id=test_user.id, text_hash=referenced))
+    db_session.commit()
+
+    assert [row["input_text"] for row in iter_log_rows(db_session)] == ["Legacy copy", "kept text"]
+
+    assert delete_unreferenced_texts(db_session) == 0  # within the grace period
+    assert delete_unreferenced_texts(db_session, datetime.now(timezone.utc) + timedelta(minutes=1)) == 1
+    assert load_text(db_session, orphan) is None
+    assert load_text(db_session, referenced) == "kept text"
@@ -0,0 +1,126 @@
+"""
+Tests for upstream warm-up, keep-alive and the readiness probe.
+"""
+import asyncio
+import json
+import time
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from analysis.services.huggingface import HuggingFaceService
+from analysis.warmup import UpstreamWarmer
+
+
+def mock_client(handler):
+    """httpx.AsyncClient factory that routes requests to ``handler``."""
+    real_client = httpx.AsyncClient
+    return lambda *args, **kwargs: real_client(transport=httpx.MockTransport(handler))
+
+
+class FakeService:
+    """Records warm-up calls and reports a configurable idle time."""
+
+    def __init__(self, failures=0):
+        self.calls = 0
+        self.failures = failures
+        self.idle = None
+
+    async def warm_up(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise Exception("model loading")
+        self.idle = 0.0
+
+    def seconds_since_success(self):
+        return self.idle
+
+
+@pytest.mark.asyncio
+async def test_warmth_tracks_upstream_outcomes():
+    """Test warmth states follow upstream responses."""
+    service = HuggingFaceService()
+    responses = [httpx.Response(503, json={"error": "loading"}), httpx.Response(200, json={"labels": ["a"], "scores": [1.0]})]
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return responses.pop(0)
+
+    assert service.warmth(60)["state"] == "unknown"
+    with patch("analysis.services.huggingface.httpx.AsyncClient", mock_client(handler)):
+        with pytest.raises(Exception):
+            await service._request("text", ["a"])
+        assert service.warmth(60)["state"] == "loading"
+
+        await service.warm_up()
+
+    assert requests[1]["options"] == {"wait_for_model": True}
+    assert service.warmth(60)["state"] == "warm"
+    assert service.warmth(0)["state"] == "cold"
+
+
+@pytest.mark.asyncio
+async def test_warmer_retries_then_keeps_alive():
+    """Test the warmer retries failed warm-ups and idles while traffic is recent."""
+    service = FakeService(failures=1)
+    warmer = UpstreamWarmer(service, keepalive_interval=0.05, retry_interval=0.01)
+
+    warmer.start()
+    await asyncio.sleep(0.03)
+    assert (service.calls, warmer.failures, warmer.warmups) == (2, 1, 1)
+
+    # Simulate ongoing traffic: no keep-alive needed
+    service.idle = 0.0
+    await asyncio.sleep(0.03)
+    assert service.calls == 2
+
+    # Quiet period: keep-alive is sent
+    service.idle = 1.0
+    await asyncio.sleep(0.08)
+    assert service.calls >= 3
+
+    await warmer.stop()
+    assert warmer.stats()["running"] is False
+
+
+def test_startup_warms_up_when_enabled(monkeypatch):
+    """Test app startup sends a warm-up request when HUGGINGFACE_WARMUP_ENABLED is on."""
+    import main
+    monkeypatch.setattr(main.settings, "huggingface_warmup_enabled", True)
+    monkeypatch.setattr(main.settings, "huggingface_keepalive_interval", 0)
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, json={"labels": ["a"], "scores": [1.0]})
+
+    with patch("analysis.services.huggingface.httpx.AsyncClient", mock_client(handler)):
+        with TestClient(main.app):
+            deadline = time.monotonic() + 5
+            while not requests and time.monotonic() < deadline:
+                time.sleep(0.02)
+
+    assert requests and requests[0]["options"] == {"wait_for_model": True}
+
+
+def test_ready_reports_database_and_cached_warmth(client):
+    """Test /ready checks the database without calling upstream."""
+    with patch("analysis.services.huggingface.httpx.AsyncClient") as client_factory:
+        response = client.get("/ready")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ready"
+    assert data["database"] == "ok"
+    assert data["huggingface"]["state"] in {"unknown", "warm", "cold", "loading", "failing"}
+    client_factory.assert_not_called()
+
+
+def test_ready_fails_without_database(client):
+    """Test /ready returns 503 when the database is unreachable."""
+    with patch("main._database_reachable", return_value=False):
+        response = client.get("/ready")
+
+    assert response.status_code == 503
+    assert response.json()["database"] == "unreachable"
@@ -0,0 +1,82 @@
+"""
+Per-request stage timings for the Server-Timing response header.
+
+ServerTimingMiddleware (see middleware.py) starts a fresh timing record for
+each request in a context variable. Code on the request path adds to it
+with ``stage()``; SQL statements are timed automatically once
+``instrument_engine`` has been called. Outside a request the calls are
+no-ops, so the same code runs unchanged in scripts and background tasks.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+# Stage name -> accumulated seconds for the current request
+_current: ContextVar[Optional[Dict[str, float]]] = ContextVar("server_timing", default=None)
+
+
+def start() -> Dict[str, float]:
+    """Begin timing a request in the current context."""
+    timings: Dict[str, float] = {}
+    _current.set(timings)
+    return timings
+
+
+def current() -> Optional[Dict[str, float]]:
+    """Timings of the request being served, or None outside a request."""
+    return _current.get()
+
+
+def record(name: str, seconds: float) -> None:
+    """Add a duration to a stage of the current request."""
+    timings = _current.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time a block as part of a named stage.
+
+    Repeated or concurrent blocks of the same stage within one request are
+    summed.
+    """
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - begin)
+
+
+def header_value(timings: Dict[str, float], total: Optional[float] = None) -> str:
+    """
+    Format timings as a Server-Timing header value (milliseconds).
+
+    Args:
+        timings: Stage name -> seconds
+        total: Overall request time in seconds, reported as ``total``
+
+    Returns:
+        e.g. ``auth;dur=1.2, classify;dur=310.4, total;dur=702.9``
+    """
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def instrument_engine(engine) -> None:
+    """Time every SQL statement run through ``engine`` as the ``db`` stage."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("server_timing_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("server_timing_start")
+        if starts:
+            record("db", time.perf_counter() - starts.pop())
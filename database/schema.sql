@@ -14,25 +14,100 @@ CREATE TABLE IF NOT EXISTS users (
 CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 
--- Create analysis_logs table
-CREATE TABLE IF NOT EXISTS analysis_logs (
+-- Create api_keys table (long-lived keys for machine clients; only a keyed
+-- hash of each secret is stored)
+CREATE TABLE IF NOT EXISTS api_keys (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    key_id VARCHAR(16) UNIQUE NOT NULL,
+    secret_hash VARCHAR(64) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP WITH TIME ZONE,
+    revoked_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS ix_api_keys_user_id ON api_keys(user_id);
+CREATE INDEX IF NOT EXISTS ix_api_keys_revoked_at ON api_keys(revoked_at);
+
+-- Create label_vocabulary table (labels referenced by packed score vectors)
+CREATE TABLE IF NOT EXISTS label_vocabulary (
     id SERIAL PRIMARY KEY,
+    label VARCHAR(100) UNIQUE NOT NULL
+);
+
+-- Create texts table (each distinct input once, compressed, keyed by SHA-256)
+CREATE TABLE IF NOT EXISTS texts (
+    hash VARCHAR(64) PRIMARY KEY,
+    codec VARCHAR(8) NOT NULL,
+    size INTEGER NOT NULL,
+    content BYTEA NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Create analysis_logs table, range-partitioned by month on created_at.
+-- The partition key must be part of the primary key; ids stay unique
+-- because they all come from one sequence.
+CREATE TABLE IF NOT EXISTS analysis_logs (
+    id SERIAL,
     user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-    input_text TEXT NOT NULL,
+    text_hash VARCHAR(64),
+    input_text TEXT,
     category VARCHAR(100),
     confidence_score FLOAT,
     summary TEXT,
     tone VARCHAR(20),
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-);
+    model VARCHAR(64),
+    text_fingerprint BIGINT,
+    label_set VARCHAR(32),
+    score_label_ids BYTEA,
+    score_values BYTEA,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Partitions for the current and next three months; backend/partitions.py
+-- creates later months and applies retention
+DO $$
+DECLARE
+    month DATE := date_trunc('month', now())::date;
+BEGIN
+    FOR i IN 0..3 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF analysis_logs FOR VALUES FROM (%L) TO (%L)',
+            'analysis_logs_p' || to_char(month, 'YYYYMM'), month, (month + interval '1 month')::date
+        );
+        month := (month + interval '1 month')::date;
+    END LOOP;
+END $$;
+
+-- Columns added after the initial release
+ALTER TABLE analysis_logs ADD COLUMN IF NOT EXISTS text_fingerprint BIGINT;
+ALTER TABLE analysis_logs ADD COLUMN IF NOT EXISTS label_set VARCHAR(32);
+ALTER TABLE analysis_logs ADD COLUMN IF NOT EXISTS score_label_ids BYTEA;
+ALTER TABLE analysis_logs ADD COLUMN IF NOT EXISTS score_values BYTEA;
+ALTER TABLE analysis_logs ADD COLUMN IF NOT EXISTS model VARCHAR(64);
+ALTER TABLE analysis_logs ADD COLUMN IF NOT EXISTS text_hash VARCHAR(64);
+ALTER TABLE analysis_logs ALTER COLUMN input_text DROP NOT NULL;
 
--- Create index on user_id for faster queries
-CREATE INDEX IF NOT EXISTS idx_analysis_logs_user_id ON analysis_logs(user_id);
+-- Create indexes for per-user history and time range queries
+CREATE INDEX IF NOT EXISTS idx_analysis_logs_user_id ON analysis_logs(user_id, created_at);
 CREATE INDEX IF NOT EXISTS idx_analysis_logs_created_at ON analysis_logs(created_at);
+CREATE INDEX IF NOT EXISTS ix_analysis_logs_text_hash ON analysis_logs(text_hash);
 
 -- Add comments for documentation
 COMMENT ON TABLE users IS 'Stores user authentication information';
 COMMENT ON TABLE analysis_logs IS 'Stores history of text analysis requests and results';
 COMMENT ON COLUMN users.password_hash IS 'Bcrypt hashed password';
+COMMENT ON COLUMN api_keys.secret_hash IS 'HMAC-SHA256 of the key secret, keyed with API_KEY_PEPPER';
 COMMENT ON COLUMN analysis_logs.confidence_score IS 'Hugging Face classification confidence (0-1)';
 COMMENT ON COLUMN analysis_logs.tone IS 'Detected tone: positive, neutral, or negative';
+COMMENT ON TABLE texts IS 'Analyzed input texts, one compressed copy per distinct content';
+COMMENT ON COLUMN texts.codec IS 'zlib, or raw when compression does not help';
+COMMENT ON COLUMN analysis_logs.text_hash IS 'SHA-256 of the full input text, key into texts';
+COMMENT ON COLUMN analysis_logs.input_text IS 'First 1000 characters of the input (rows written before texts existed)';
+COMMENT ON COLUMN analysis_logs.model IS 'Gemini model that produced the summary (chosen by the model router)';
+COMMENT ON COLUMN analysis_logs.text_fingerprint IS 'SimHash of the input text, used to rebuild the near-duplicate index';
+COMMENT ON COLUMN analysis_logs.label_set IS 'Signature of the candidate labels used for classification';
+COMMENT ON COLUMN analysis_logs.score_label_ids IS 'Little-endian int32 label_vocabulary ids of the classification distribution';
+COMMENT ON COLUMN analysis_logs.score_values IS 'Little-endian float16 scores aligned with score_label_ids';
@@ -10,7 +10,7 @@ const LOADING_MESSAGES = [
     'Generating summary...',
 ];
 
-export const LoadingSpinner = () => {
+export const LoadingSpinner = ({ message = '' }) => {
     const [messageIndex, setMessageIndex] = useState(0);
 
     useEffect(() => {
@@ -24,7 +24,7 @@ export const LoadingSpinner = () => {
     return (
         <div className="loading-spinner">
             <div className="spinner"></div>
-            <p>{LOADING_MESSAGES[messageIndex]}</p>
+            <p>{message || LOADING_MESSAGES[messageIndex]}</p>
         </div>
     );
 };
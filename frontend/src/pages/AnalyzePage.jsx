@@ -19,6 +19,7 @@ export const AnalyzePage = () => {
     const [lastRequest, setLastRequest] = useState(null);
     const [toast, setToast] = useState('');
     const [historyKey, setHistoryKey] = useState(0);
+    const [stageMessage, setStageMessage] = useState('');
     const { user, logout } = useAuth();
     const navigate = useNavigate();
 
@@ -27,16 +28,21 @@ export const AnalyzePage = () => {
         setLoading(true);
         setResults(null);
         setToast('');
+        setStageMessage('');
         setLastRequest({ text, customLabels });
 
         try {
-            const data = await analysisService.analyzeText(text, customLabels);
+            const data = await analysisService.analyzeText(text, customLabels, (event) => {
+                if (event.stage === 'classify') {
+                    setStageMessage(`Classified as ${event.category}, generating summary...`);
+                }
+            });
             setResults(data);
             saveToHistory(data);
             setHistoryKey(k => k + 1); // Force history refresh
             setToast('Analysis complete');
         } catch (err) {
-            setError(err.response?.data?.detail || 'Analysis failed. Please try again.');
+            setError(err.response?.data?.detail || err.detail || 'Analysis failed. Please try again.');
         } finally {
             setLoading(false);
         }
@@ -91,7 +97,7 @@ export const AnalyzePage = () => {
 
                     <AnalysisForm onAnalyze={handleAnalyze} loading={loading} />
 
-                    {loading && <LoadingSpinner />}
+                    {loading && <LoadingSpinner message={stageMessage} />}
 
                     {results && <ResultsDisplay results={results} />}
 
@@ -2,18 +2,27 @@
  * Analysis service for text analysis API calls.
  */
 import api from './api';
+import { analysisSession } from './analysisSession';
 
 export const analysisService = {
   /**
    * Analyze text using the backend API
+   *
+   * Uses the WebSocket session (authenticated once, with stage events
+   * passed to onStage) and falls back to HTTP if it cannot connect.
    */
-  async analyzeText(text, candidateLabels = null) {
+  async analyzeText(text, candidateLabels = null, onStage = null) {
     const payload = { text };
     
     if (candidateLabels && candidateLabels.length > 0) {
       payload.candidate_labels = candidateLabels;
     }
 
+    const connected = await analysisSession.connect().then(() => true, () => false);
+    if (connected) {
+      return analysisSession.analyze(payload, onStage).result;
+    }
+
     const response = await api.post('/analyze', payload);
     return response.data;
   },
@@ -0,0 +1,103 @@
+/**
+ * WebSocket session for interactive analysis (/analyze/ws).
+ *
+ * Authenticates once per connection and multiplexes analysis requests
+ * over it, each tagged with an id; stage events arrive before the result.
+ */
+import { API_BASE_URL } from './api';
+import { tokenManager } from '../utils/tokenManager';
+
+const WS_URL = `${API_BASE_URL.replace(/^http/, 'ws')}/analyze/ws`;
+
+const sessionError = (detail) => Object.assign(new Error(detail), { detail });
+
+class AnalysisSession {
+  constructor() {
+    this.socket = null;
+    this.connecting = null;
+    this.pending = new Map();
+    this.nextId = 1;
+  }
+
+  /**
+   * Open and authenticate the connection (once; later calls reuse it)
+   */
+  connect() {
+    if (!this.connecting) {
+      this.connecting = new Promise((resolve, reject) => {
+        const socket = new WebSocket(WS_URL);
+
+        socket.onopen = () => {
+          socket.send(JSON.stringify({ type: 'auth', token: tokenManager.getToken() }));
+        };
+
+        socket.onmessage = (event) => {
+          const message = JSON.parse(event.data);
+          if (message.type === 'ready') {
+            this.socket = socket;
+            resolve(socket);
+          } else {
+            this.dispatch(message);
+          }
+        };
+
+        socket.onclose = () => {
+          reject(sessionError('Connection closed'));
+          this.pending.forEach(({ reject: fail }) => fail(sessionError('Connection closed')));
+          this.pending.clear();
+          this.socket = null;
+          this.connecting = null;
+        };
+      });
+    }
+    return this.connecting;
+  }
+
+  dispatch(message) {
+    const request = this.pending.get(message.id);
+    if (!request) {
+      return;
+    }
+    if (message.type === 'stage') {
+      request.onStage?.(message);
+      return;
+    }
+    this.pending.delete(message.id);
+    if (message.type === 'result') {
+      request.resolve(message.result);
+    } else {
+      request.reject(sessionError(message.type === 'cancelled' ? 'Analysis cancelled' : message.detail));
+    }
+  }
+
+  /**
+   * Analyze over the open connection
+   * @returns {{ id: string, result: Promise<object> }}
+   */
+  analyze(payload, onStage = null) {
+    const id = String(this.nextId++);
+    const result = new Promise((resolve, reject) => {
+      this.pending.set(id, { resolve, reject, onStage });
+      this.socket.send(JSON.stringify({ type: 'analyze', id, ...payload }));
+    });
+    return { id, result };
+  }
+
+  /**
+   * Cancel an analysis still in flight
+   */
+  cancel(id) {
+    if (this.socket && this.pending.has(id)) {
+      this.socket.send(JSON.stringify({ type: 'cancel', id }));
+    }
+  }
+
+  /**
+   * Close the connection (on logout, so it is not reused by the next user)
+   */
+  close() {
+    this.socket?.close();
+  }
+}
+
+export const analysisSession = new AnalysisSession();
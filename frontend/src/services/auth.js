@@ -2,6 +2,7 @@
  * Authentication service for login and registration.
  */
 import api from './api';
+import { analysisSession } from './analysisSession';
 import { tokenManager } from '../utils/tokenManager';
 
 export const authService = {
@@ -46,6 +47,7 @@ export const authService = {
    * Logout user
    */
   logout() {
+    analysisSession.close();
     tokenManager.clearAuth();
   },
 